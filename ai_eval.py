@@ -1,28 +1,34 @@
 import os
 import logging
 import time
-from dotenv import load_dotenv
-import anthropic
+import inspect
 import asyncio
+from llm_scheduler import get_scheduler
+from text_store import get_paper_text
+from summarizer import summarize_with_claude
+from embedding import count_tokens, truncate_to_tokens
+import metrics
 
-# log 디렉토리 생성
-log_dir = "log"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, 'ai_eval.log')),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+EVAL_MODEL = "claude-3-5-haiku-20241022"
+
+# 참고 논문 원본 PDF 디렉토리
+PAPERS_DIR = "data/papers"
+
+# 동시에 실행할 개별 평가 수
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "3"))
+
+# 평가 방식
+# - "separate": 참고 논문마다 개별 평가 후 최종 종합 (참고 논문 N개 → 요청 N+1개)
+# - "combined": 사용자 논문과 모든 참고 논문 요약을 한 요청에 담아 한 번에 평가 (요청 1개)
+EVAL_MODE = os.getenv("EVAL_MODE", "separate")
+
+# combined 모드의 입력 토큰 예산 (tiktoken 기준 추정치라 Claude 토큰 수와 약간 다를 수 있음)
+EVAL_CONTEXT_BUDGET = int(os.getenv("EVAL_CONTEXT_BUDGET", "12000"))
+# 예산 우선순위 비중: 사용자 논문 / 참고 논문 요약 전체 (참고 논문끼리는 똑같이 나눔)
+EVAL_USER_WEIGHT = 0.5
+EVAL_REFERENCES_WEIGHT = 0.5
 
 # 개별 논문 평가를 위한 프롬프트
 INDIVIDUAL_PAPER_PROMPT = """
@@ -75,11 +81,110 @@ FINAL_EVAL_PROMPT = """
             [개별 평가 결과를 종합하여 전체적인 평가와 구체적인 개선 방향을 제시합니다.]
             """
 
-async def evaluate_single_paper(user_text, reference_paper, attempt=0):
-    """단일 논문 평가 함수"""
-    max_retries = 3
-    retry_delay = 15
+# 한 번의 요청으로 모든 참고 논문을 비교하는 프롬프트 (사용자 논문은 뒤에 캐시 블록으로 붙음)
+COMBINED_EVAL_PROMPT = """
+            # 지시문
+            당신은 논문 평가 전문가 '김논평'입니다. 사용자의 논문을 함께 제시되는 여러 참고 논문과 비교하여 참고 논문별 개선 제안과 최종 종합 평가를 하는 것이 당신의 역할입니다.
+
+            # 제약조건
+            - **모든 출력은 Markdown을 적극 활용**하여 작성합니다.
+            - 코드 블록은 사용하지 않습니다.
+            - 참고 논문의 핵심 내용과 전략을 파악하여 사용자 논문의 개선점을 제시합니다.
+            - 순서 서식을 사용하지 않고 최대한 문장의 형식으로 출력해야 합니다.
+
+            # 출력 형태
+            ### 참고 논문별 개선 제안
+            [참고 논문마다 "#### 참고 논문 번호: 제목" 아래에 해당 논문의 어떤 내용을 기준으로 했는지 밝히며 사용자 논문의 개선점을 제시합니다.]
+
+            ### 최종 논문 분석 및 개선 방향 제안
+            [참고 논문별 제안을 종합하여 전체적인 평가와 구체적인 개선 방향을 제시합니다.]
+            """
+
+def allocate_token_budget(lengths, weights, budget):
+    """구역별 토큰 수(`lengths`)를 비중(`weights`)에 따라 예산 안에서 나눕니다.
+
+    예산보다 짧은 구역이 남긴 몫은 아직 잘리는 구역에 비중대로 다시 나눠 줍니다.
+    """
+    allocation = [0] * len(lengths)
+    remaining = max(0, budget)
+    active = [i for i, length in enumerate(lengths) if length > 0]
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active)
+        shares = {i: int(remaining * weights[i] / total_weight) for i in active}
+        satisfied = [i for i in active if lengths[i] - allocation[i] <= shares[i]]
+        if not satisfied:
+            for i in active:
+                allocation[i] += shares[i]
+            break
+        for i in satisfied:
+            remaining -= lengths[i] - allocation[i]
+            allocation[i] = lengths[i]
+        active = [i for i in active if i not in satisfied]
+    return allocation
+
+def pack_evaluation_context(user_text, reference_summaries, budget=EVAL_CONTEXT_BUDGET):
+    """사용자 논문과 참고 논문 요약을 토큰 예산 안에 들어가도록 줄입니다.
+
+    고정 프롬프트를 뺀 예산을 사용자 논문과 참고 논문 요약에 비중대로 나누고,
+    각 구역은 앞에서부터 할당된 토큰 수만큼 남깁니다. (사용자 논문, 요약 목록)을 반환합니다.
+    """
+    available = budget - count_tokens(COMBINED_EVAL_PROMPT)
+    sections = [user_text, *reference_summaries]
+    lengths = [count_tokens(text) for text in sections]
+    reference_weight = EVAL_REFERENCES_WEIGHT / max(1, len(reference_summaries))
+    weights = [EVAL_USER_WEIGHT] + [reference_weight] * len(reference_summaries)
+    allocation = allocate_token_budget(lengths, weights, available)
+    packed = [truncate_to_tokens(text, tokens) for text, tokens in zip(sections, allocation)]
+    logger.info("평가 입력 토큰 배분: " + ", ".join(
+        f"{used}/{length}" for used, length in zip(allocation, lengths)) + f" (예산 {available})")
+    return packed[0], packed[1:]
 
+@metrics.timed("eval.combined")
+async def generate_combined_evaluation(user_text, reference_summaries, titles=None, on_text=None,
+                                       budget=EVAL_CONTEXT_BUDGET):
+    """사용자 논문과 모든 참고 논문 요약을 한 번의 요청으로 평가합니다.
+
+    지시문과 사용자 논문을 시스템 프롬프트 앞부분에 두고 캐시 지점을 지정하여,
+    같은 논문을 다른 참고 논문으로 다시 평가할 때 공통 부분은 프롬프트 캐시를 사용합니다.
+    """
+    try:
+        user_part, summaries = pack_evaluation_context(user_text, reference_summaries, budget)
+        titles = titles or [""] * len(summaries)
+        references = "\n\n".join(
+            f"## 참고 논문 {i + 1}: {title}\n{summary}"
+            for i, (title, summary) in enumerate(zip(titles, summaries))
+        )
+        return await get_scheduler().stream(
+            on_text=on_text,
+            model=EVAL_MODEL,
+            max_tokens=800 * len(summaries) + 1500,
+            temperature=0.3,
+            system=[
+                {"type": "text", "text": COMBINED_EVAL_PROMPT},
+                {
+                    "type": "text",
+                    "text": f"# 사용자의 논문\n{user_part}",
+                    "cache_control": {"type": "ephemeral"},
+                },
+            ],
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"# 참고 논문\n{references}\n\n논문을 평가하고 개선 방향을 제안해주세요."
+                }
+            ]
+        )
+
+    except Exception as e:
+        logger.error(f"통합 평가 중 오류 발생: {e}")
+        raise e
+
+@metrics.timed("eval.single")
+async def evaluate_single_paper(user_text, reference_paper, on_text=None):
+    """단일 논문 평가 함수 (요청 한도와 재시도는 공유 스케줄러가 관리)
+
+    `on_text`를 넘기면 생성되는 텍스트 조각을 순서대로 전달합니다.
+    """
     try:
         # 텍스트 길이 제한 (약 4000자)
         if len(user_text) > 4000:
@@ -93,8 +198,9 @@ async def evaluate_single_paper(user_text, reference_paper, attempt=0):
             "{{reference_paper}}", reference_paper
         )
 
-        message = client.messages.create(
-            model="claude-3-5-haiku-20241022",
+        return await get_scheduler().stream(
+            on_text=on_text,
+            model=EVAL_MODEL,
             max_tokens=800,  # 토큰 수 감소
             temperature=0.3,
             system=prompt,
@@ -105,20 +211,17 @@ async def evaluate_single_paper(user_text, reference_paper, attempt=0):
                 }
             ]
         )
-        return message.content[0].text
 
     except Exception as e:
-        if "rate_limit_error" in str(e) and attempt < max_retries - 1:
-            wait_time = retry_delay * (attempt + 1)
-            logger.warning(f"Rate limit 도달. {wait_time}초 후 재시도... (시도 {attempt + 1}/{max_retries})")
-            await asyncio.sleep(wait_time)
-            return await evaluate_single_paper(user_text, reference_paper, attempt + 1)
-        else:
-            logger.error(f"단일 논문 평가 중 오류 발생: {e}")
-            raise e
-
-async def generate_final_evaluation(individual_evaluations):
-    """개별 평가 결과를 종합하여 최종 평가 생성"""
+        logger.error(f"단일 논문 평가 중 오류 발생: {e}")
+        raise e
+
+@metrics.timed("eval.final")
+async def generate_final_evaluation(individual_evaluations, on_text=None):
+    """개별 평가 결과를 종합하여 최종 평가 생성
+
+    `on_text`를 넘기면 생성되는 텍스트 조각을 순서대로 전달합니다.
+    """
     try:
         # 각 평가 결과의 길이 제한
         limited_evaluations = []
@@ -132,8 +235,9 @@ async def generate_final_evaluation(individual_evaluations):
             "{{individual_evaluations}}", "\n\n".join(limited_evaluations)
         )
 
-        message = client.messages.create(
-            model="claude-3-5-haiku-20241022",
+        return await get_scheduler().stream(
+            on_text=on_text,
+            model=EVAL_MODEL,
             max_tokens=1500,  # 토큰 수 감소
             temperature=0.3,
             system=prompt,
@@ -144,33 +248,114 @@ async def generate_final_evaluation(individual_evaluations):
                 }
             ]
         )
-        return message.content[0].text
 
     except Exception as e:
         logger.error(f"최종 평가 생성 중 오류 발생: {e}")
         raise e
 
-async def generate_paper_feedback(user_text, summarized_papers):
-    """논문 평가 및 피드백 생성 메인 함수"""
+async def generate_paper_feedback(user_text, summarized_papers, max_concurrency=EVAL_CONCURRENCY, timings=None,
+                                  on_evaluation_text=None, on_final_text=None, mode=None, titles=None):
+    """논문 평가 및 피드백 생성 메인 함수
+
+    `summarized_papers`에는 요약 문자열 또는 요약을 돌려줄 awaitable(태스크 등)을 넣을 수 있습니다.
+    각 참고 논문은 요약이 준비되는 즉시 최대 `max_concurrency`개까지 동시에 평가됩니다.
+    `timings` 딕셔너리를 넘기면 시작 시점부터 각 단계가 끝날 때까지의 시간(초)을 기록합니다.
+    스트리밍 콜백: 개별 평가는 `on_evaluation_text(i, delta)`, 최종 평가는 `on_final_text(delta)`.
+    `mode`(기본값 EVAL_MODE)가 "combined"이면 요약이 모두 끝난 뒤 한 번의 요청으로 평가하며,
+    이때 개별 평가 콜백은 호출되지 않습니다.
+    (최종 평가, 개별 평가 목록)을 반환하며 combined 모드의 개별 평가 목록은 비어 있습니다.
+    """
     logger.info("논문 평가 및 피드백 생성 시작")
-    
-    try:
-        # 각 논문별 개별 평가 수행
-        individual_evaluations = []
-        for i, paper in enumerate(summarized_papers):
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    if (mode or EVAL_MODE) == "combined":
+        summaries = [await paper if inspect.isawaitable(paper) else paper for paper in summarized_papers]
+        timings["summaries"] = time.perf_counter() - start
+        final_evaluation = await generate_combined_evaluation(user_text, summaries, titles, on_text=on_final_text)
+        timings["evaluations"] = timings["final"] = time.perf_counter() - start
+        logger.info("단계별 완료 시점: " + ", ".join(f"{stage} {elapsed:.1f}초" for stage, elapsed in timings.items()))
+        return final_evaluation, []
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    summaries_done = []
+
+    async def evaluate(i, paper):
+        # 요약이 끝나는 대로 바로 평가 시작
+        if inspect.isawaitable(paper):
+            paper = await paper
+        summaries_done.append(time.perf_counter() - start)
+        async with semaphore:
             logger.info(f"논문 {i+1} 평가 시작")
-            evaluation = await evaluate_single_paper(user_text, paper)
-            individual_evaluations.append(evaluation)
+            on_text = None
+            if on_evaluation_text is not None:
+                on_text = lambda delta: on_evaluation_text(i, delta)
+            evaluation = await evaluate_single_paper(user_text, paper, on_text=on_text)
             logger.info(f"논문 {i+1} 평가 완료")
-            await asyncio.sleep(20)  # API 호출 간 간격을 20초로 증가
+            return evaluation
+
+    try:
+        # 각 논문별 개별 평가 수행
+        individual_evaluations = await asyncio.gather(*(
+            evaluate(i, paper) for i, paper in enumerate(summarized_papers)
+        ))
+        timings["summaries"] = max(summaries_done, default=0.0)
+        timings["evaluations"] = time.perf_counter() - start
         
         # 개별 평가 결과를 종합하여 최종 평가 생성
         logger.info("최종 평가 생성 시작")
-        final_evaluation = await generate_final_evaluation(individual_evaluations)
+        final_evaluation = await generate_final_evaluation(individual_evaluations, on_text=on_final_text)
+        timings["final"] = time.perf_counter() - start
         logger.info("최종 평가 생성 완료")
+        logger.info("단계별 완료 시점: " + ", ".join(f"{stage} {elapsed:.1f}초" for stage, elapsed in timings.items()))
         
-        return final_evaluation
+        return final_evaluation, list(individual_evaluations)
 
     except Exception as e:
         logger.error(f"논문 평가 프로세스 중 오류 발생: {e}")
-        raise e 
\ No newline at end of file
+        raise e
+
+def reference_papers(similar_papers):
+    """원본 PDF가 PAPERS_DIR에 있는 유사 논문만 반환"""
+    return [
+        paper for paper in similar_papers
+        if os.path.exists(os.path.join(PAPERS_DIR, paper['source']))
+    ]
+
+def start_summaries(papers, summary_system_prompt, summary_streams=None):
+    """논문별 요약 태스크를 시작하는 함수 (요청 한도는 공유 스케줄러가 관리)"""
+    async def summarize(paper, on_text):
+        paper_path = os.path.join(PAPERS_DIR, paper['source'])
+        # 수집 시 저장된 텍스트 사용 (없을 때만 PDF 파싱), 파일 읽기가 이벤트 루프를 막지 않도록 스레드에서 실행
+        paper_text = await asyncio.to_thread(get_paper_text, paper['id'], paper_path)
+        return await summarize_with_claude(paper_text, summary_system_prompt, paper['source'], on_text=on_text)
+
+    tasks = []
+    for i, paper in enumerate(papers):
+        on_text = summary_streams[i] if summary_streams else None
+        task = asyncio.ensure_future(summarize(paper, on_text))
+        if hasattr(on_text, "flush"):
+            # 요약이 끝나면 남은 내용까지 바로 표시
+            task.add_done_callback(lambda _, stream=on_text: stream.flush())
+        tasks.append(task)
+    return tasks
+
+@metrics.timed("eval.total")
+async def run_evaluation(user_text, papers, summary_system_prompt,
+                         summary_streams=None, evaluation_streams=None, final_stream=None):
+    """요약과 평가를 파이프라인으로 실행 (요약이 끝난 논문부터 바로 평가)
+
+    스트림 인자를 넘기면 요약, 개별 평가, 최종 평가가 생성되는 대로 표시됩니다.
+    (요약 목록, 개별 평가 목록, 최종 평가, 단계별 완료 시점)을 반환합니다.
+    """
+    summary_tasks = start_summaries(papers, summary_system_prompt, summary_streams)
+    timings = {}
+    on_evaluation_text = None
+    if evaluation_streams:
+        on_evaluation_text = lambda i, delta: evaluation_streams[i](delta)
+    feedback, evaluations = await generate_paper_feedback(
+        user_text, summary_tasks, timings=timings,
+        on_evaluation_text=on_evaluation_text, on_final_text=final_stream,
+        titles=[paper.get('title') or paper['source'] for paper in papers]
+    )
+    summaries = [task.result() for task in summary_tasks]
+    return summaries, evaluations, feedback, timings
@@ -1,87 +1,259 @@
 import os
-import uuid
+import asyncio
+import argparse
+from functools import partial
 from pathlib import Path
-from pdf_utils import extract_text_from_pdf
-from embedding import get_embedding
-from paper_db import add_paper_to_db
-import PyPDF2
-
-def extract_metadata_from_pdf(pdf_path):
-    """PDF 파일에서 메타데이터를 추출합니다."""
-    metadata = {
-        "id": str(uuid.uuid4()),
-        "title": "",
-        "authors": "",
-        "year": "",
-        "abstract": "",
-        "source": os.path.basename(pdf_path)
-    }
-    
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            if pdf_reader.metadata:
-                if pdf_reader.metadata.title:
-                    metadata["title"] = pdf_reader.metadata.title
-                if pdf_reader.metadata.author:
-                    metadata["authors"] = pdf_reader.metadata.author
-                if pdf_reader.metadata.creation_date:
-                    # PDF 생성 날짜에서 연도 추출 시도
-                    try:
-                        year = pdf_reader.metadata.creation_date[2:6]
-                        metadata["year"] = year
-                    except:
-                        pass
-    except Exception as e:
-        print(f"메타데이터 추출 중 오류 발생: {e}")
-    
-    return metadata
+from pdf_utils import extract_document
+from embedding import get_chunk_embeddings, pool_embeddings, get_cache_stats
+import paper_db
+from paper_db import add_papers_to_db, add_paper_chunks_to_db, delete_papers, persist_directory
+from ingest_pipeline import run_pipeline
+from corpus_manifest import CorpusManifest
+from text_store import save_text, delete_texts, get_paper_text
+from summarizer import summarize_with_claude, SUMMARY_SYSTEM_PROMPT, SUMMARY_MODEL
+from summary_store import get_summary
+from clients import setup_logging
+import metrics
 
-def process_pdf(pdf_path):
-    """단일 PDF 파일을 처리합니다."""
-    print(f"\n처리 중인 파일: {pdf_path}")
-    
-    # 텍스트 추출
-    text = extract_text_from_pdf(pdf_path)
-    print("✓ 텍스트 추출 완료")
-    
-    # 임베딩 생성
-    embedding = get_embedding(text)
-    print("✓ 임베딩 생성 완료")
-    
-    # 메타데이터 추출
-    metadata = extract_metadata_from_pdf(pdf_path)
-    print("✓ 메타데이터 추출 완료")
-    
-    # DB에 저장
-    add_paper_to_db(embedding, metadata)
-    print("✓ DB 저장 완료")
-    
-    return True
+# DB에 반영된 파일 목록 (증분 동기화에 사용)
+MANIFEST_PATH = os.path.join(persist_directory, "manifest.sqlite")
+
+def refresh_vector_index():
+    """벡터 인덱스를 쓰는 설정이면 바뀐 컬렉션으로 다시 만듭니다.
+
+    numpy 검색 백엔드와 reduced 모드(재순위화용 전체 벡터 보조 저장소)가 벡터 인덱스를 사용합니다.
+    """
+    if paper_db.SEARCH_BACKEND != "numpy" and paper_db.INDEX_MODE != "reduced":
+        return
+    print("\n벡터 인덱스 갱신 중...")
+    path = paper_db.rebuild_vector_index()
+    print(f"✓ 벡터 인덱스 갱신 완료: {path}")
+
+def embed_documents(docs, manifest=None):
+    """파이프라인 임베딩 단계: 여러 문서의 임베딩을 묶음 요청으로 생성합니다."""
+    chunk_embeddings = get_chunk_embeddings([doc["text"] for doc in docs])
+    embedded = []
+    for doc, matrix in zip(docs, chunk_embeddings):
+        if matrix is None:
+            print(f"임베딩할 텍스트가 없어 건너뜁니다: {doc['path']}")
+            if manifest is not None:
+                manifest.record_failure(doc["path"], "embed", ValueError("임베딩할 텍스트가 없습니다"))
+            continue
+        doc["embedding"] = pool_embeddings(matrix)
+        doc["chunk_embeddings"] = matrix
+        embedded.append(doc)
+    print(f"✓ 임베딩 생성 완료: {len(embedded)}개")
+    return embedded
+
+def write_documents(docs, manifest=None):
+    """파이프라인 저장 단계: 모인 논문들을 DB에 저장하고 매니페스트에 기록합니다."""
+    add_papers_to_db([doc["embedding"] for doc in docs], [doc["metadata"] for doc in docs])
+    if paper_db.INDEX_MODE == "chunk":
+        add_paper_chunks_to_db([doc["chunk_embeddings"] for doc in docs], [doc["metadata"] for doc in docs])
+    # 질의 시 PDF를 다시 파싱하지 않도록 추출된 텍스트 저장
+    for doc in docs:
+        save_text(doc["metadata"]["id"], doc["text"], doc["sha256"])
+    if manifest is not None:
+        # DB 저장이 끝난 묶음을 한 번에 기록 (중단 후 --resume으로 이어할 때의 체크포인트)
+        stale_ids = manifest.record_many(
+            (doc["path"], doc["size"], doc["mtime_ns"], doc["sha256"], doc["metadata"]["id"]) for doc in docs
+        )
+        # 내용이 바뀐 파일의 이전 벡터와 텍스트 삭제
+        delete_papers(stale_ids)
+        delete_texts(stale_ids)
+    print(f"✓ DB 저장 완료: {len(docs)}개")
+
+async def summarize_corpus(manifest, concurrency=4):
+    """DB에 반영된 모든 논문의 요약을 미리 생성합니다 (이미 저장된 요약은 건너뜀).
+
+    최대 `concurrency`개를 동시에 요약하며, 요청 한도는 공유 스케줄러가 관리합니다.
+    """
+    counts = {"created": 0, "skipped": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize(pdf_path, doc_id):
+        async with semaphore:
+            try:
+                text = get_paper_text(doc_id, pdf_path)
+                if get_summary(text, SUMMARY_SYSTEM_PROMPT, SUMMARY_MODEL) is not None:
+                    counts["skipped"] += 1
+                    return
+                await summarize_with_claude(text, SUMMARY_SYSTEM_PROMPT, os.path.basename(pdf_path))
+                counts["created"] += 1
+                print(f"✓ 요약 생성 완료: {os.path.basename(pdf_path)}")
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"요약 생성 중 오류 발생: {pdf_path}")
+                print(f"오류 내용: {e}")
+
+    await asyncio.gather(*(
+        summarize(pdf_path, doc_id)
+        for pdf_path, (_, _, _, doc_id) in sorted(manifest.entries().items())
+    ))
+    print(f"\n요약 생성 {counts['created']}개, 기존 요약 사용 {counts['skipped']}개, 실패 {counts['failed']}개")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="data/papers 디렉토리의 PDF를 임베딩하여 ChromaDB에 저장합니다.")
+    parser.add_argument("--papers-dir", default="data/papers", help="PDF 파일 디렉토리 (기본값: data/papers)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="텍스트 추출 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="동시에 실행할 임베딩 작업 수 (기본값: 4)")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="DB에 한 번에 저장할 논문 수 (기본값: 32)")
+    parser.add_argument("--embed-batch-size", type=int, default=16,
+                        help="임베딩 요청 하나로 묶을 최대 논문 수 (기본값: 16)")
+    parser.add_argument("--sync", action="store_true",
+                        help="추가/변경된 파일만 처리하고 삭제된 파일의 벡터를 DB에서 제거합니다")
+    parser.add_argument("--summarize", action="store_true",
+                        help="처리 후 전체 논문의 요약을 미리 생성하여 평가 시 요약 단계를 건너뜁니다")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help="이전 실행에서 DB 저장까지 끝난 파일과 실패 기록에 남은 파일을 건너뛰고 나머지만 처리합니다")
+    mode.add_argument("--retry-failed", action="store_true",
+                      help="실패 기록에 남은 파일만 다시 처리합니다")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="--retry-failed에서 이 횟수 이상 실패한 파일은 건너뜁니다 (기본값: 3)")
+    args = parser.parse_args()
+    if args.sync and args.retry_failed:
+        # 동기화는 넘겨받은 목록에 없는 파일을 삭제된 것으로 보므로 실패 목록과 함께 쓰면 나머지 논문이 지워짐
+        parser.error("--sync와 --retry-failed는 함께 사용할 수 없습니다")
+    return args
+
+def select_failed(manifest, max_attempts):
+    """실패 기록에서 다시 처리할 파일 목록 (사라진 파일의 기록은 정리)"""
+    failures = manifest.failures()
+    missing = [path for path in failures if not os.path.exists(path)]
+    manifest.clear_failures(missing)
+    retry = [path for path, failure in failures.items()
+             if path not in missing and failure["attempts"] < max_attempts]
+    exhausted = len(failures) - len(missing) - len(retry)
+    print(f"실패 기록 {len(failures)}개: 다시 처리 {len(retry)}개, 시도 횟수 초과 {exhausted}개, "
+          f"파일 없음 {len(missing)}개")
+    return retry
+
+def skip_failed(manifest, pdf_files):
+    """이전 실패 이후 내용이 바뀌지 않은 파일을 목록에서 뺍니다 (그사이 사라진 파일도 뺌)."""
+    failures = manifest.failures()
+    remaining = []
+    for pdf_path in pdf_files:
+        failure = failures.get(pdf_path)
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            continue
+        if failure is not None and (failure["size"], failure["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            continue
+        remaining.append(pdf_path)
+    return remaining
+
+def print_failures(manifest):
+    failures = manifest.failures()
+    if not failures:
+        return
+    print(f"\n실패 기록 {len(failures)}개 ({MANIFEST_PATH})")
+    for path, failure in list(failures.items())[:10]:
+        print(f"  {path}: {failure['stage']} 단계 {failure['error_class']} ({failure['attempts']}회)")
+    if len(failures) > 10:
+        print(f"  ... 외 {len(failures) - 10}개")
+    print("실패한 파일만 다시 처리하려면: python batch_process_pdfs.py --retry-failed")
 
 def main():
+    args = parse_args()
+    setup_logging('batch_process.log')
+    metrics.setup_from_env()
+
     # papers 디렉토리 경로
-    papers_dir = Path("data/papers")
+    papers_dir = Path(args.papers_dir)
     
     # PDF 파일 목록 가져오기
-    pdf_files = list(papers_dir.glob("*.pdf"))
+    pdf_files = [str(pdf_path) for pdf_path in sorted(papers_dir.glob("*.pdf"))]
     
-    if not pdf_files:
+    if not pdf_files and not args.sync and not args.retry_failed:
         print("처리할 PDF 파일이 없습니다. data/papers 디렉토리에 PDF 파일을 넣어주세요.")
         return
+
+    manifest = CorpusManifest(MANIFEST_PATH)
+    if args.retry_failed:
+        pdf_files = select_failed(manifest, args.max_attempts)
+        if not pdf_files:
+            print("\n다시 처리할 파일이 없습니다.")
+            return
+    elif args.resume and not args.sync:
+        # DB 저장까지 끝난 파일(매니페스트)과 이전에 실패한 파일은 건너뜀
+        total = len(pdf_files)
+        pdf_files, unchanged, _ = manifest.scan(pdf_files)
+        changed = len(pdf_files)
+        pdf_files = skip_failed(manifest, pdf_files)
+        print(f"이어하기: 전체 {total}개 중 완료 {unchanged}개, 이전 실패 {changed - len(pdf_files)}개 건너뜀, "
+              f"남은 파일 {len(pdf_files)}개")
+        if not pdf_files:
+            print("\n남은 파일이 없습니다.")
+            print_failures(manifest)
+            return
+    if args.sync:
+        # 크기/수정 시각/내용 해시로 변경 사항만 골라냄
+        pdf_files, unchanged, removed = manifest.scan(pdf_files)
+        print(f"동기화: 추가/변경 {len(pdf_files)}개, 변경 없음 {unchanged}개, 삭제 {len(removed)}개")
+        if args.resume:
+            changed = len(pdf_files)
+            pdf_files = skip_failed(manifest, pdf_files)
+            print(f"이어하기: 이전 실패 {changed - len(pdf_files)}개 건너뜀")
+        stale_ids = manifest.remove(removed)
+        delete_papers(stale_ids)
+        delete_texts(stale_ids)
+        if removed:
+            print(f"✓ 삭제된 파일의 벡터 {len(stale_ids)}개 제거 완료")
+        if not pdf_files:
+            print("\n동기화할 변경 사항이 없습니다.")
+            if removed:
+                refresh_vector_index()
+            if args.summarize:
+                asyncio.run(summarize_corpus(manifest, args.concurrency))
+            return
     
-    print(f"총 {len(pdf_files)}개의 PDF 파일을 처리합니다...")
-    
-    # 각 PDF 파일 처리
-    for pdf_path in pdf_files:
-        try:
-            process_pdf(str(pdf_path))
-        except Exception as e:
-            print(f"파일 처리 중 오류 발생: {pdf_path}")
-            print(f"오류 내용: {e}")
-            continue
+    print(f"총 {len(pdf_files)}개의 PDF 파일을 처리합니다... "
+          f"(추출 프로세스 {args.workers}개, 임베딩 동시 작업 {args.concurrency}개)")
+
+    def on_error(item, stage, exc):
+        print(f"파일 처리 중 오류 발생: {item}")
+        print(f"오류 내용: {exc}")
+        if item is not None:
+            manifest.record_failure(item, stage, exc)
+
+    # 추출 · 임베딩 · 저장 단계를 겹쳐서 처리
+    stats = run_pipeline(
+        pdf_files,
+        extract=extract_document,
+        embed=partial(embed_documents, manifest=manifest),
+        write=partial(write_documents, manifest=manifest),
+        workers=args.workers,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        embed_batch_size=args.embed_batch_size,
+        on_error=on_error,
+    )
+
+    print("\n단계별 처리량")
+    for stage in stats.values():
+        print(f"  {stage.summary()}")
+    cache_stats = get_cache_stats()
+    print(f"  임베딩 캐시: 적중 {cache_stats['hits']}회, 미스 {cache_stats['misses']}회 "
+          f"(저장된 항목 {cache_stats['entries']}개)")
+
+    print_failures(manifest)
+
+    refresh_vector_index()
+
+    if args.summarize:
+        print("\n논문 요약 미리 생성 중...")
+        asyncio.run(summarize_corpus(manifest, args.concurrency))
+
+    if metrics.enabled():
+        print("\n구간별 소요 시간 및 사용량")
+        print(metrics.summary())
     
     print("\n모든 파일 처리가 완료되었습니다!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,186 @@
+"""청크 분할 마이크로 벤치마크
+
+기존 `split_text`(문단 → 문장 → 단어 단위로 반복 토큰화)와 한 번만 인코딩하는
+토큰 위치 기반 청크 분할의 속도를 대용량 문서에서 비교합니다.
+
+    python -m benchmarks.bench_chunking --pages 200
+"""
+import re
+import time
+import random
+import argparse
+import tiktoken
+import embedding
+
+WORDS = (
+    "연구 논문 분석 결과 데이터 모델 학습 실험 방법 제안 성능 평가 기존 대비 향상 "
+    "the model results data analysis method proposed performance evaluation learning"
+).split()
+
+
+def legacy_count_tokens(text):
+    # 기존 구현: 호출할 때마다 인코딩을 가져와 토큰화
+    encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+    return len(encoding.encode(text))
+
+
+def legacy_split_text(text, max_tokens=4000):
+    """기존 embedding.split_text 구현 (비교용)"""
+    count_tokens = legacy_count_tokens
+    # 먼저 문단으로 분할
+    paragraphs = text.split('\n\n')
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+            
+        # 문단이 너무 길면 문장 단위로 더 분할
+        if count_tokens(para) > max_tokens:
+            sentences = re.split(r'[.!?]+', para)
+            for sentence in sentences:
+                sentence = sentence.strip()
+                if not sentence:
+                    continue
+                    
+                # 문장이 너무 길면 단어 단위로 분할
+                if count_tokens(sentence) > max_tokens:
+                    words = sentence.split()
+                    temp_chunk = []
+                    temp_length = 0
+                    
+                    for word in words:
+                        word_tokens = count_tokens(word)
+                        if temp_length + word_tokens > max_tokens:
+                            if temp_chunk:
+                                chunks.append(' '.join(temp_chunk))
+                            temp_chunk = [word]
+                            temp_length = word_tokens
+                        else:
+                            temp_chunk.append(word)
+                            temp_length += word_tokens
+                    
+                    if temp_chunk:
+                        chunks.append(' '.join(temp_chunk))
+                else:
+                    # 문장을 현재 청크에 추가
+                    sentence_tokens = count_tokens(sentence)
+                    if current_length + sentence_tokens > max_tokens:
+                        if current_chunk:
+                            chunks.append(' '.join(current_chunk))
+                        current_chunk = [sentence]
+                        current_length = sentence_tokens
+                    else:
+                        current_chunk.append(sentence)
+                        current_length += sentence_tokens
+        else:
+            # 문단을 현재 청크에 추가
+            para_tokens = count_tokens(para)
+            if current_length + para_tokens > max_tokens:
+                if current_chunk:
+                    chunks.append(' '.join(current_chunk))
+                current_chunk = [para]
+                current_length = para_tokens
+            else:
+                current_chunk.append(para)
+                current_length += para_tokens
+    
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    
+    # 각 청크의 토큰 수 확인 및 필요시 추가 분할
+    final_chunks = []
+    for chunk in chunks:
+        if count_tokens(chunk) > max_tokens:
+            # 청크가 여전히 너무 크면 더 작게 분할
+            words = chunk.split()
+            temp_chunk = []
+            temp_length = 0
+            
+            for word in words:
+                word_tokens = count_tokens(word)
+                if temp_length + word_tokens > max_tokens:
+                    if temp_chunk:
+                        final_chunks.append(' '.join(temp_chunk))
+                    temp_chunk = [word]
+                    temp_length = word_tokens
+                else:
+                    temp_chunk.append(word)
+                    temp_length += word_tokens
+            
+            if temp_chunk:
+                final_chunks.append(' '.join(temp_chunk))
+        else:
+            final_chunks.append(chunk)
+    
+    return final_chunks
+
+
+def make_document(pages, chars_per_page=3000, seed=0):
+    """문단과 문장으로 이루어진 합성 논문 텍스트"""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < pages * chars_per_page:
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(8, 25))) + "." for _ in range(rng.randint(3, 8))]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+def legacy_preprocess_text(text):
+    """기존 embedding.preprocess_text 구현 (비교용)"""
+    text = ' '.join(text.split())
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(label, legacy, new):
+    (legacy_time, legacy_result), (new_time, new_result) = legacy, new
+    counts = ""
+    if isinstance(legacy_result, list):
+        counts = f" (청크 {len(legacy_result)}개 → {len(new_result)}개)"
+    print(f"  {label:<24} 기존 {legacy_time * 1000:10.1f}ms | 개선 {new_time * 1000:9.1f}ms | "
+          f"{legacy_time / new_time:7.1f}배{counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="청크 분할 속도 비교")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    embedding._get_encoding()  # 인코딩 로드 시간은 측정에서 제외
+    for pages in args.pages:
+        text = make_document(pages)
+        # get_embeddings는 전처리된 텍스트(문단/문장 부호 없음)를 분할함
+        preprocessed = embedding._NON_WORD_RE.sub(" ", text).strip()
+        print(f"{pages}쪽 ({len(text):,}자)")
+        report("preprocess_text",
+               timed(lambda: legacy_preprocess_text(text), args.repeat),
+               timed(lambda: embedding._NON_WORD_RE.sub(" ", text).strip(), args.repeat))
+        report("split_text (원문)",
+               timed(lambda: legacy_split_text(text), args.repeat),
+               timed(lambda: embedding.split_text(text), args.repeat))
+        report("split_text (전처리 후)",
+               timed(lambda: legacy_split_text(preprocessed), args.repeat),
+               timed(lambda: embedding.split_text(preprocessed), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""모듈 import(콜드 스타트) 시간 벤치마크
+
+각 모듈을 새 파이썬 프로세스에서 import하여 걸린 시간을 측정합니다.
+클라이언트와 DB 연결을 처음 사용할 때 만들기 때문에 import 자체는 가벼워야 합니다.
+
+    python -m benchmarks.bench_import --repeat 5
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+DEFAULT_MODULES = [
+    "pdf_utils",
+    "embedding",
+    "paper_db",
+    "llm_scheduler",
+    "ai_eval",
+    "batch_process_pdfs",
+]
+
+# 새 프로세스에서 실행할 측정 코드 (인터프리터 시작 시간은 제외)
+_MEASURE = """
+import time, importlib
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module, repeat):
+    """모듈 import 시간(초) 목록"""
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _MEASURE.format(module=module)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{module} import 실패:\n{result.stderr}")
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def heavy_modules(module):
+    """import 후에 함께 로드된 무거운 라이브러리 목록"""
+    code = (
+        f"import sys, importlib; importlib.import_module({module!r}); "
+        "print(','.join(m for m in ('openai', 'anthropic', 'chromadb', 'tiktoken', 'streamlit') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모듈 import 시간 측정")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        times = measure(module, args.repeat)
+        results[module] = {
+            "median_ms": statistics.median(times) * 1000,
+            "min_ms": min(times) * 1000,
+            "heavy_modules": heavy_modules(module),
+        }
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for module, result in results.items():
+        loaded = ", ".join(result["heavy_modules"]) or "-"
+        print(f"  {module:<20} 중앙값 {result['median_ms']:8.1f}ms | 최소 {result['min_ms']:8.1f}ms | "
+              f"로드된 라이브러리: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""OpenAI 임베딩 API와 Anthropic 메시지 API를 흉내 내는 로컬 서버
+
+API 키 없이 벤치마크를 돌리기 위한 것으로, 응답 지연 · 분당 요청 한도(429) ·
+오류(5xx) 비율을 설정할 수 있습니다. 임베딩은 입력 텍스트의 해시로 만든 결정적인
+단위 벡터이고, 메시지 응답은 `stream: true`이면 SSE로 조금씩 보냅니다.
+
+    python -m benchmarks.fake_api --port 8900 --latency 0.2 --rpm 500
+
+SDK는 `OPENAI_BASE_URL=http://127.0.0.1:8900/v1`, `ANTHROPIC_BASE_URL=http://127.0.0.1:8900`을
+따르므로 `FakeAPIServer.env()`를 환경 변수로 넘기면 코드 변경 없이 연결됩니다.
+"""
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+_WORDS = (
+    "논문 연구 방법 결과 분석 모델 데이터 실험 성능 제안 개선 구조 평가 비교 "
+    "기여 한계 향후 관련 배경 가설 검증 설계 지표 정확도 효율"
+).split()
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수 (4글자당 1토큰)"""
+    return max(1, len(text) // 4)
+
+
+class FakeAPIServer:
+    """OpenAI `/v1/embeddings`와 Anthropic `/v1/messages`를 제공하는 테스트 서버
+
+    - `latency`: 요청마다 더하는 기본 지연(초), `latency_jitter`: 지연에 더하는 무작위 비율
+    - `rpm`: 분당 요청 한도 (넘으면 retry-after와 함께 429)
+    - `error_rate`: 무작위로 5xx(OpenAI 500, Anthropic 529)를 돌려줄 확률
+    - `output_tokens`: 메시지 응답 길이(단어 수), `stream_interval`: SSE 조각 사이 지연(초)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, latency_jitter=0.0, rpm=None,
+                 error_rate=0.0, dimensions=1536, output_tokens=200, stream_interval=0.0, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.dimensions = dimensions
+        self.output_tokens = output_tokens
+        self.stream_interval = stream_interval
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._request_times = deque()
+        self._stats = {}
+        self.reset_stats()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """SDK를 이 서버로 연결하는 환경 변수"""
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "fake-openai-key",
+            "ANTHROPIC_BASE_URL": self.base_url,
+            "ANTHROPIC_API_KEY": "fake-anthropic-key",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "embedding_requests": 0,
+                "embedding_inputs": 0,
+                "embedding_tokens": 0,
+                "message_requests": 0,
+                "message_input_tokens": 0,
+                "message_output_tokens": 0,
+                "rate_limited": 0,
+                "errors": 0,
+            }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def _admit(self):
+        """한도와 오류 주입을 적용합니다. (상태 코드, retry-after) 또는 None을 반환"""
+        now = time.monotonic()
+        with self._lock:
+            if self.rpm:
+                while self._request_times and now - self._request_times[0] >= 60.0:
+                    self._request_times.popleft()
+                if len(self._request_times) >= self.rpm:
+                    self._stats["rate_limited"] += 1
+                    return 429, max(1, int(60.0 - (now - self._request_times[0])) + 1)
+                self._request_times.append(now)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self._stats["errors"] += 1
+                return 500, None
+        return None
+
+    def _delay(self):
+        if self.latency:
+            jitter = self._random.uniform(0, self.latency * self.latency_jitter) if self.latency_jitter else 0.0
+            time.sleep(self.latency + jitter)
+
+    def embed(self, text):
+        """텍스트마다 항상 같은 단위 벡터"""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def completion_text(self, prompt, max_tokens):
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = rng.choices(_WORDS, k=max(1, min(self.output_tokens, max_tokens)))
+        return " ".join(words) + "."
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_json(self):
+                length = int(self.headers.get("content-length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, status, retry_after, anthropic_api):
+                headers = {"retry-after": str(retry_after)} if retry_after else {}
+                if anthropic_api:
+                    error_type = "rate_limit_error" if status == 429 else "overloaded_error"
+                    status = 429 if status == 429 else 529
+                    body = {"type": "error", "error": {"type": error_type, "message": "fake error"}}
+                else:
+                    error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+                    body = {"error": {"message": "fake error", "type": error_type, "code": error_type}}
+                self._send_json(status, body, headers)
+
+            def do_POST(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path.endswith("/embeddings"):
+                    self._embeddings(self._read_json())
+                elif path.endswith("/messages"):
+                    self._messages(self._read_json())
+                else:
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            def _embeddings(self, request):
+                inputs = request.get("input", [])
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                server._delay()
+                rejected = server._admit()
+                if rejected:
+                    self._send_error(*rejected, anthropic_api=False)
+                    return
+                tokens = sum(estimate_tokens(text) for text in inputs)
+                server._count(embedding_requests=1, embedding_inputs=len(inputs), embedding_tokens=tokens)
+                data = []
+                for index, text in enumerate(inputs):
+                    vector = server.embed(text)
+                    if request.get("encoding_format") == "base64":
+                        embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+                    else:
+                        embedding = vector.tolist()
+                    data.append({"object": "embedding", "index": index, "embedding": embedding})
+                self._send_json(200, {
+                    "object": "list",
+                    "data": data,
+                    "model": request.get("model", ""),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                })
+
+            def _messages(self, request):
+                prompt = json.dumps(request.get("system", ""), ensure_ascii=False) + json.dumps(
+                    request.get("messages", []), ensure_ascii=False)
+                server._delay()
+                rejected = server._admit()
+                if rejected:
+                    self._send_error(*rejected, anthropic_api=True)
+                    return
+                text = server.completion_text(prompt, request.get("max_tokens", 1024))
+                input_tokens = estimate_tokens(prompt)
+                output_tokens = estimate_tokens(text)
+                server._count(message_requests=1, message_input_tokens=input_tokens,
+                              message_output_tokens=output_tokens)
+                message = {
+                    "id": f"msg_fake_{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": request.get("model", ""),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+                }
+                if request.get("stream"):
+                    self._stream_message(message, text)
+                else:
+                    self._send_json(200, message)
+
+            def _stream_message(self, message, text):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+
+                def send(event, data):
+                    payload = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+                    self.wfile.flush()
+
+                start = dict(message, content=[], stop_reason=None,
+                             usage={"input_tokens": message["usage"]["input_tokens"], "output_tokens": 1})
+                send("message_start", {"type": "message_start", "message": start})
+                send("content_block_start", {"type": "content_block_start", "index": 0,
+                                             "content_block": {"type": "text", "text": ""}})
+                words = text.split(" ")
+                for i in range(0, len(words), 5):
+                    if server.stream_interval:
+                        time.sleep(server.stream_interval)
+                    delta = " ".join(words[i:i + 5]) + (" " if i + 5 < len(words) else "")
+                    send("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                 "delta": {"type": "text_delta", "text": delta}})
+                send("content_block_stop", {"type": "content_block_stop", "index": 0})
+                send("message_delta", {"type": "message_delta",
+                                       "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                       "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+                send("message_stop", {"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI/Anthropic API 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="요청당 지연(초)")
+    parser.add_argument("--rpm", type=int, default=None, help="분당 요청 한도")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="5xx 오류 비율 (0~1)")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--stream-interval", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeAPIServer(args.host, args.port, latency=args.latency, rpm=args.rpm,
+                           error_rate=args.error_rate, dimensions=args.dimensions,
+                           output_tokens=args.output_tokens, stream_interval=args.stream_interval)
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
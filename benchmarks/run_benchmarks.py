@@ -0,0 +1,238 @@
+"""API 키 없이 실행하는 오프라인 벤치마크 모음
+
+로컬 대역 서버(`benchmarks.fake_api`)를 띄우고 임시 작업 디렉토리에 합성 논문을 만든 뒤
+다음 시나리오를 각각 별도 프로세스로 실행하여 결과를 하나의 JSON으로 저장합니다.
+
+- ingest: `batch_process_pdfs.py` 전체 수집 처리량과 변경 없는 `--sync` 재실행 시간
+- search: 논문 1k/10k/100k개에서 `search_similar_papers` 지연 시간 (ChromaDB와 numpy 벡터 인덱스)
+- reduced: 앞쪽 차원으로 후보를 찾고 전체 임베딩으로 재순위화하는 2단계 검색의 재현율과 지연 시간
+- evaluate: 업로드 → 임베딩 → 검색 → 요약/평가 전체 경로 (ingest 결과 사용)
+
+    python -m benchmarks.run_benchmarks --papers 200 --latency 0.2 --output bench.json
+    python -m benchmarks.run_benchmarks --scenarios search --sizes 1000 10000
+    python -m benchmarks.run_benchmarks --scenarios search --sizes 10000 100000 \
+        --search-backends chroma numpy --quantizations float32 float16 int8
+
+토큰 계산에 tiktoken 인코딩 파일이 필요하므로 오프라인 환경에서는 미리 받아 둔 캐시를
+`TIKTOKEN_CACHE_DIR`로 지정해야 합니다.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+from benchmarks.fake_api import FakeAPIServer
+from benchmarks.synthetic_pdfs import generate_corpus, make_paper
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["ingest", "search", "reduced", "evaluate"]
+
+# 자식 프로세스가 작업 디렉토리 밖의 저장소를 쓰지 않도록 지우는 환경 변수
+_ISOLATED_ENV = ["CHROMA_PERSIST_DIR", "EMBEDDING_CACHE_PATH", "SUMMARY_STORE_PATH",
+                 "PAPER_TEXT_STORE_DIR", "LOG_DIR", "VECTOR_INDEX_DIR"]
+
+
+def child_env(server, workdir):
+    env = {key: value for key, value in os.environ.items() if key not in _ISOLATED_ENV}
+    env.update(server.env())
+    env["CHROMA_PERSIST_DIR"] = os.path.join(workdir, "chromadb_data")
+    env["ANONYMIZED_TELEMETRY"] = "False"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    return env
+
+
+def run_child(command, workdir, env):
+    """작업 디렉토리에서 명령을 실행하고 (소요 시간, 표준 출력)을 반환합니다."""
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} 실패 (종료 코드 {result.returncode}):\n{result.stderr[-4000:]}")
+    return elapsed, result.stdout
+
+
+def run_json_child(module, args, workdir, env):
+    _, stdout = run_child([sys.executable, "-m", module, *args], workdir, env)
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def diff_stats(before, after):
+    return {key: after[key] - before.get(key, 0) for key in after}
+
+
+def scenario_ingest(server, workdir, args):
+    papers_dir = os.path.join(workdir, "data", "papers")
+    start = time.perf_counter()
+    paths = generate_corpus(papers_dir, args.papers, pages=args.pages, seed=args.seed)
+    generate_seconds = time.perf_counter() - start
+    corpus_bytes = sum(os.path.getsize(path) for path in paths)
+
+    env = child_env(server, workdir)
+    command = [sys.executable, os.path.join(REPO_ROOT, "batch_process_pdfs.py"),
+               "--concurrency", str(args.concurrency)]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+
+    before = server.stats()
+    full_seconds, _ = run_child(command, workdir, env)
+    full_api = diff_stats(before, server.stats())
+
+    before = server.stats()
+    sync_seconds, _ = run_child(command + ["--sync"], workdir, env)
+    sync_api = diff_stats(before, server.stats())
+
+    return {
+        "papers": len(paths),
+        "pages_per_paper": args.pages,
+        "corpus_mb": corpus_bytes / 1024 / 1024,
+        "generate_seconds": generate_seconds,
+        "full": {
+            "seconds": full_seconds,
+            "papers_per_second": len(paths) / full_seconds,
+            "api": full_api,
+        },
+        "sync_unchanged": {"seconds": sync_seconds, "api": sync_api},
+    }
+
+
+def scenario_search(server, workdir, args):
+    search_dir = os.path.join(workdir, "search")
+    os.makedirs(search_dir, exist_ok=True)
+    env = child_env(server, search_dir)
+    return run_json_child("benchmarks.scenario_search", [
+        "--sizes", *map(str, args.sizes),
+        "--dim", str(args.dim),
+        "--queries", str(args.queries),
+        "--seed", str(args.seed),
+        "--backends", *args.search_backends,
+        "--quantizations", *args.quantizations,
+    ], search_dir, env)
+
+
+def scenario_reduced(server, workdir, args):
+    reduced_dir = os.path.join(workdir, "reduced")
+    os.makedirs(reduced_dir, exist_ok=True)
+    env = child_env(server, reduced_dir)
+    return run_json_child("benchmarks.scenario_reduced", [
+        "--papers", str(args.reduced_papers),
+        "--dim", str(args.dim),
+        "--queries", str(args.queries),
+        "--reduced-dims", *map(str, args.reduced_dims),
+        "--candidates", *map(str, args.candidates),
+        "--seed", str(args.seed),
+    ], reduced_dir, env)
+
+
+def scenario_evaluate(server, workdir, args):
+    upload = os.path.join(workdir, "upload.pdf")
+    with open(upload, "wb") as file:
+        file.write(make_paper(args.papers + 1, pages=args.pages, seed=args.seed + 1))
+    env = child_env(server, workdir)
+    before = server.stats()
+    result = run_json_child("benchmarks.scenario_evaluate", [
+        "--upload", upload, "--repeat", str(args.repeat),
+    ], workdir, env)
+    result["api"] = diff_stats(before, server.stats())
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="오프라인 벤치마크 실행")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="결과 JSON 파일 (생략 시 표준 출력)")
+    parser.add_argument("--workdir", help="작업 디렉토리 (생략 시 임시 디렉토리를 만들고 끝나면 삭제)")
+    parser.add_argument("--seed", type=int, default=0)
+    corpus = parser.add_argument_group("합성 논문")
+    corpus.add_argument("--papers", type=int, default=100, help="수집할 논문 수")
+    corpus.add_argument("--pages", type=int, default=10, help="논문당 페이지 수")
+    ingest = parser.add_argument_group("수집")
+    ingest.add_argument("--workers", type=int, default=None)
+    ingest.add_argument("--concurrency", type=int, default=4)
+    search = parser.add_argument_group("검색")
+    search.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    search.add_argument("--dim", type=int, default=1536)
+    search.add_argument("--queries", type=int, default=100)
+    search.add_argument("--search-backends", nargs="+", choices=["chroma", "numpy"], default=["chroma", "numpy"])
+    search.add_argument("--quantizations", nargs="+", choices=["float32", "float16", "int8"],
+                        default=["float32", "int8"])
+    reduced = parser.add_argument_group("2단계 검색")
+    reduced.add_argument("--reduced-papers", type=int, default=10000)
+    reduced.add_argument("--reduced-dims", type=int, nargs="+", default=[128, 256, 512])
+    reduced.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    evaluate = parser.add_argument_group("평가")
+    evaluate.add_argument("--repeat", type=int, default=2)
+    server = parser.add_argument_group("대역 서버")
+    server.add_argument("--latency", type=float, default=0.05, help="요청당 지연(초)")
+    server.add_argument("--latency-jitter", type=float, default=0.2)
+    server.add_argument("--rpm", type=int, default=None, help="분당 요청 한도")
+    server.add_argument("--error-rate", type=float, default=0.0, help="5xx 오류 비율 (0~1)")
+    server.add_argument("--output-tokens", type=int, default=200)
+    server.add_argument("--stream-interval", type=float, default=0.01)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="paper-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+    server = FakeAPIServer(latency=args.latency, latency_jitter=args.latency_jitter, rpm=args.rpm,
+                           error_rate=args.error_rate, dimensions=args.dim,
+                           output_tokens=args.output_tokens, stream_interval=args.stream_interval,
+                           seed=args.seed)
+    # 평가 시나리오는 수집된 논문을 사용
+    scenarios = list(args.scenarios)
+    if "evaluate" in scenarios and "ingest" not in scenarios:
+        scenarios.insert(0, "ingest")
+    runners = {"ingest": scenario_ingest, "search": scenario_search, "reduced": scenario_reduced,
+               "evaluate": scenario_evaluate}
+
+    try:
+        with server:
+            for name in SCENARIOS:
+                if name not in scenarios:
+                    continue
+                print(f"[{name}] 실행 중...", file=sys.stderr)
+                start = time.perf_counter()
+                report["scenarios"][name] = runners[name](server, workdir, args)
+                print(f"[{name}] 완료 ({time.perf_counter() - start:.1f}초)", file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
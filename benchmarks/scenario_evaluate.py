@@ -0,0 +1,67 @@
+"""업로드부터 최종 평가까지의 전체 평가 경로 시나리오
+
+Streamlit 화면과 같은 순서로 텍스트 추출 → 임베딩 → 유사 논문 검색 → 요약/평가를 실행하고
+단계별 시간을 JSON으로 출력합니다. 현재 디렉토리에 `batch_process_pdfs.py`로 수집된
+`data/papers`와 `chromadb_data`가 있어야 하며, API는 `OPENAI_BASE_URL`/`ANTHROPIC_BASE_URL`의
+대역 서버를 사용합니다.
+
+    python -m benchmarks.scenario_evaluate --upload upload.pdf --repeat 2
+"""
+import json
+import time
+import asyncio
+import argparse
+
+from pdf_utils import extract_text_from_pdf
+from embedding import get_embeddings
+from paper_db import search_similar_papers
+from ai_eval import reference_papers, run_evaluation
+from summarizer import SUMMARY_SYSTEM_PROMPT
+
+
+def evaluate_once(file_bytes, top_n=3):
+    """한 번의 평가 요청을 실행하고 단계별 소요 시간(초)을 반환합니다."""
+    stages = {}
+    start = time.perf_counter()
+
+    user_text = extract_text_from_pdf(file_bytes)
+    stages["extract"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    user_embedding = get_embeddings([user_text])[0]
+    stages["embed"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    results = search_similar_papers(user_embedding, top_n=top_n)
+    stages["search"] = time.perf_counter() - mark
+
+    papers = reference_papers(results["metadatas"][0])
+    mark = time.perf_counter()
+    _, _, feedback, timings = asyncio.run(run_evaluation(user_text, papers, SUMMARY_SYSTEM_PROMPT))
+    stages["evaluation"] = time.perf_counter() - mark
+    stages["total"] = time.perf_counter() - start
+    return {
+        "references": len(papers),
+        "feedback_chars": len(feedback),
+        "seconds": stages,
+        # 평가 시작 시점부터 각 단계가 끝날 때까지의 시간
+        "evaluation_milestones": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전체 평가 경로 소요 시간 측정")
+    parser.add_argument("--upload", required=True, help="평가할 PDF 파일")
+    parser.add_argument("--repeat", type=int, default=2,
+                        help="반복 횟수 (첫 실행은 캐시가 비어 있는 상태)")
+    parser.add_argument("--top-n", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.upload, "rb") as file:
+        file_bytes = file.read()
+    runs = [evaluate_once(file_bytes, args.top_n) for _ in range(args.repeat)]
+    print(json.dumps({"runs": runs}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""2단계 검색(reduced 모드) 재현율/지연 시간 시나리오
+
+현재 디렉토리의 ChromaDB에 앞쪽 차원일수록 분산이 큰 합성 임베딩(text-embedding-3 계열처럼
+잘라 써도 순위가 유지되는 분포)을 채운 뒤, 전체 차원 검색과 후보 차원/후보 수별 reduced 모드를
+정확한 검색(numpy float32) 결과와 비교해 JSON으로 출력합니다.
+
+    python -m benchmarks.scenario_reduced --papers 10000 --reduced-dims 128 256 512 --candidates 20 50 100
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+
+import paper_db
+from embedding import set_embedder
+from embedders import create_embedder
+from benchmarks.scenario_search import fill, measure, recall
+
+
+def matryoshka_vectors(rng, count, dim, clusters=256, decay=0.5, noise=3.0):
+    """군집을 이루고 뒤쪽 차원으로 갈수록 분산이 줄어드는 단위 벡터
+
+    `decay`가 작을수록 뒤쪽 차원에도 정보가 많이 남아 잘라 쓴 검색의 재현율이 떨어집니다.
+    """
+    scale = (1.0 + np.arange(dim) / 32.0) ** -decay
+    # 같은 rng로 만들면 호출마다 군집 중심이 달라지므로 중심은 고정된 시드로 만듦
+    centers = np.random.default_rng(12345).standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + noise * rng.standard_normal((count, dim))
+    vectors = (vectors * scale).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def run(papers, dim=1536, queries=100, top_n=3, reduced_dims=(256,), candidates=(50,), seed=0,
+        decay=0.5, noise=3.0):
+    rng = np.random.default_rng(seed)
+    set_embedder(create_embedder("fake", dimension=dim))
+
+    def generate(rng, count, dim):
+        return matryoshka_vectors(rng, count, dim, decay=decay, noise=noise)
+
+    insert_seconds = fill(papers, dim, rng, generate=generate)
+    query_vectors = generate(rng, queries, dim)
+
+    # 정확한 상위 결과 (전체 행렬 곱)
+    paper_db.rebuild_vector_index("float32")
+    truth = paper_db.get_vector_index().query(query_vectors, n_results=top_n)["ids"]
+
+    paper_db.SEARCH_BACKEND = "chroma"
+    paper_db.INDEX_MODE = "paper"
+    stats, hits = measure(query_vectors, top_n)
+    stats["recall"] = recall(hits, truth)
+    results = {"papers": papers, "dim": dim, "top_n": top_n, "decay": decay, "noise": noise,
+               "insert_seconds": insert_seconds,
+               "full": stats, "reduced": []}
+
+    paper_db.INDEX_MODE = "reduced"
+    for reduced_dim in reduced_dims:
+        paper_db.REDUCED_DIM = reduced_dim
+        start = time.perf_counter()
+        paper_db.sync_reduced_collection()
+        build_seconds = time.perf_counter() - start
+        for count in candidates:
+            paper_db.RERANK_CANDIDATES = count
+            stats, hits = measure(query_vectors, top_n)
+            stats.update({"reduced_dim": reduced_dim, "candidates": count,
+                          "build_seconds": build_seconds, "recall": recall(hits, truth)})
+            results["reduced"].append(stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2단계 검색 재현율/지연 시간 측정")
+    parser.add_argument("--papers", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--reduced-dims", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--decay", type=float, default=0.5, help="차원별 분산 감소 지수")
+    parser.add_argument("--noise", type=float, default=3.0, help="군집 안 흩어짐 정도")
+    args = parser.parse_args()
+    print(json.dumps(run(args.papers, args.dim, args.queries, args.top_n,
+                         args.reduced_dims, args.candidates, args.seed, args.decay, args.noise)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""`search_similar_papers` 지연 시간 시나리오
+
+현재 디렉토리의 ChromaDB(`CHROMA_PERSIST_DIR`)에 무작위 단위 벡터를 논문 수 목록의 크기까지
+차례로 채우면서, 크기마다 검색 백엔드별 지연 시간과 정확한 검색(numpy float32) 대비 재현율을
+측정하고 JSON으로 출력합니다. 보통 `benchmarks.run_benchmarks`가 빈 작업 디렉토리에서 실행합니다.
+
+    python -m benchmarks.scenario_search --sizes 1000 10000 100000
+    python -m benchmarks.scenario_search --sizes 10000 100000 --backends chroma numpy \
+        --quantizations float32 float16 int8
+"""
+import json
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+import paper_db
+from embedding import set_embedder
+from embedders import create_embedder
+from vector_index import QUANTIZATIONS
+
+
+def random_vectors(rng, count, dim):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def fill(target, dim, rng, batch_size=5000, generate=random_vectors):
+    """컬렉션의 논문 수를 `target`까지 늘리고 걸린 시간(초)을 반환합니다."""
+    start = time.perf_counter()
+    count = paper_db.get_paper_count()
+    while count < target:
+        size = min(batch_size, target - count)
+        vectors = generate(rng, size, dim)
+        metadatas = [
+            {
+                "id": f"synthetic-{count + i:08d}",
+                "title": f"Synthetic paper {count + i}",
+                "authors": "",
+                "year": "",
+                "abstract": "",
+                "source": f"paper_{count + i:08d}.pdf",
+            }
+            for i in range(size)
+        ]
+        paper_db.add_papers_to_db(vectors, metadatas)
+        count += size
+    return time.perf_counter() - start
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def measure(queries, top_n, warmup=3):
+    """검색 지연 시간 통계(밀리초)와 질의별 결과 ID"""
+    for vector in queries[:warmup]:
+        paper_db.search_similar_papers(vector, top_n=top_n)
+    latencies = []
+    hits = []
+    for vector in queries:
+        start = time.perf_counter()
+        results = paper_db.search_similar_papers(vector, top_n=top_n)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits.append(results["ids"][0])
+    stats = {
+        "queries": len(queries),
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+    }
+    return stats, hits
+
+
+def recall(hits, truth):
+    """정확한 검색 결과 대비 재현율"""
+    found = sum(len(set(row) & set(expected)) for row, expected in zip(hits, truth))
+    total = sum(len(expected) for expected in truth)
+    return found / total if total else 1.0
+
+
+def measure_backends(queries, top_n, backends, quantizations):
+    """백엔드(와 양자화 방식)별 지연 시간과 재현율"""
+    measured = {}
+    for quantization in quantizations if "numpy" in backends else []:
+        start = time.perf_counter()
+        paper_db.rebuild_vector_index(quantization)
+        build_seconds = time.perf_counter() - start
+        paper_db.SEARCH_BACKEND = "numpy"
+        stats, hits = measure(queries, top_n)
+        index = paper_db.get_vector_index()
+        # 검색할 때마다 전체를 읽는 행렬 크기 (양자화 인덱스는 양자화 행렬만 전부 읽음)
+        scanned = index.codes if index.codes is not None else index.vectors
+        stats.update({"build_seconds": build_seconds, "index_mb": index.nbytes() / 1024 / 1024,
+                      "scan_mb": scanned.nbytes / 1024 / 1024})
+        measured[f"numpy-{quantization}"] = (stats, hits)
+    if "chroma" in backends:
+        paper_db.SEARCH_BACKEND = "chroma"
+        measured["chroma"] = measure(queries, top_n)
+
+    # 양자화 없는 numpy 검색은 전체를 정확히 계산하므로 기준으로 사용
+    truth = measured.get("numpy-float32", (None, None))[1]
+    results = {}
+    for name, (stats, hits) in measured.items():
+        if truth is not None:
+            stats["recall"] = recall(hits, truth)
+        results[name] = stats
+    return results
+
+
+def run(sizes, dim=1536, queries=100, top_n=3, seed=0, backends=("chroma",), quantizations=("float32",)):
+    rng = np.random.default_rng(seed)
+    # 무작위 벡터를 넣으므로 컬렉션에는 같은 차원의 테스트용 백엔드로 기록
+    set_embedder(create_embedder("fake", dimension=dim))
+    results = []
+    for size in sorted(sizes):
+        insert_time = fill(size, dim, rng)
+        result = {"papers": size, "insert_seconds": insert_time, "index_mode": paper_db.INDEX_MODE}
+        result["backends"] = measure_backends(random_vectors(rng, queries, dim), top_n, backends, quantizations)
+        results.append(result)
+    return {"dim": dim, "top_n": top_n, "sizes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="유사 논문 검색 지연 시간 측정")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", choices=["chroma", "numpy"], default=["chroma"])
+    parser.add_argument("--quantizations", nargs="+", choices=list(QUANTIZATIONS), default=["float32"],
+                        help="numpy 백엔드에서 측정할 양자화 방식")
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.dim, args.queries, args.top_n, args.seed,
+                         args.backends, args.quantizations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""벤치마크용 합성 논문 PDF 생성기
+
+외부 라이브러리 없이 PDF 구조를 직접 작성하므로 pypdf로 텍스트와 정보 사전을 그대로
+추출할 수 있습니다. 기본 Type1 글꼴을 쓰기 때문에 본문은 ASCII 단어로 만듭니다.
+
+    python -m benchmarks.synthetic_pdfs --out data/papers --count 100 --pages 12
+"""
+import os
+import random
+import argparse
+
+_VOCABULARY = (
+    "model data learning network neural training evaluation method result analysis "
+    "performance accuracy dataset feature representation attention transformer graph "
+    "optimization gradient loss baseline experiment benchmark inference retrieval "
+    "embedding language vision robust efficient scalable framework approach proposed "
+    "significant improvement compared previous work study system design architecture"
+).split()
+
+_LINE_CHARS = 90
+_LINES_PER_PAGE = 48
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, info=None):
+    """페이지별 텍스트(줄바꿈 포함) 목록으로 PDF 바이트를 만듭니다."""
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(count))}] /Count {count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        lines = " ".join(f"({_escape(line)}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 9 Tf 40 760 Td 11 TL {lines} ET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    if info:
+        entries = " ".join(f"/{key} ({_escape(value)})" for key, value in info.items())
+        objects.append(f"<< {entries} >>".encode("latin-1", "replace"))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    trailer = f"<< /Size {len(objects) + 1} /Root 1 0 R"
+    if info:
+        trailer += f" /Info {len(objects)} 0 R"
+    output += f"trailer\n{trailer} >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(output)
+
+
+def _sentence(rng):
+    words = rng.choices(_VOCABULARY, k=rng.randint(8, 20))
+    return " ".join(words).capitalize() + "."
+
+
+def make_paper(index, pages=10, seed=0, with_info=True):
+    """제목, 저자, 연도와 본문 페이지를 가진 합성 논문 PDF 바이트"""
+    rng = random.Random(f"{seed}:{index}")
+    title = " ".join(rng.choices(_VOCABULARY, k=6)).title() + f" {index}"
+    year = str(rng.randint(2000, 2024))
+    author = f"Author {rng.randint(1, 999)}"
+
+    page_texts = []
+    for page in range(pages):
+        lines = [title, f"{author}, {year}", ""] if page == 0 else []
+        line = ""
+        while len(lines) < _LINES_PER_PAGE:
+            sentence = _sentence(rng)
+            if len(line) + len(sentence) + 1 > _LINE_CHARS:
+                lines.append(line)
+                line = ""
+            line = f"{line} {sentence}".strip()
+        page_texts.append("\n".join(lines))
+
+    info = {"Title": title, "Author": author, "CreationDate": f"D:{year}0101000000"} if with_info else None
+    return make_pdf(page_texts, info)
+
+
+def generate_corpus(out_dir, count, pages=10, seed=0, info_ratio=0.5):
+    """`out_dir`에 합성 논문 `count`개를 만들고 경로 목록을 반환합니다.
+
+    `info_ratio` 비율의 파일에만 정보 사전을 넣어 본문에서 메타데이터를 찾는 경로도 함께 측정합니다.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        path = os.path.join(out_dir, f"paper_{index:05d}.pdf")
+        with open(path, "wb") as file:
+            file.write(make_paper(index, pages=pages, seed=seed, with_info=rng.random() < info_ratio))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 논문 PDF 생성")
+    parser.add_argument("--out", required=True, help="PDF를 저장할 디렉토리")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out, args.count, pages=args.pages, seed=args.seed)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"{len(paths)}개 PDF 생성 완료 ({size / 1024 / 1024:.1f}MB): {args.out}")
+
+
+if __name__ == "__main__":
+    main()
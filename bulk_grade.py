@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from pdf_utils import extract_text_from_pdf, file_sha256
+from embedding import get_embeddings
+from paper_db import search_similar_papers_many
+from ai_eval import reference_papers, start_summaries, generate_paper_feedback, EVAL_CONCURRENCY
+from summarizer import SUMMARY_SYSTEM_PROMPT
+from clients import setup_logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 보고서 JSON 형식 버전 (이어하기 판단에 사용)
+REPORT_VERSION = 1
+
+
+def report_paths(output_dir, pdf_path):
+    """제출 파일별 (Markdown 보고서, JSON 기록) 경로"""
+    stem = Path(pdf_path).stem
+    return os.path.join(output_dir, f"{stem}.md"), os.path.join(output_dir, f"{stem}.json")
+
+
+def load_record(output_dir, pdf_path):
+    """이전 실행에서 남긴 JSON 기록 (없거나 읽을 수 없으면 None)"""
+    _, json_path = report_paths(output_dir, pdf_path)
+    try:
+        with open(json_path, encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_completed(record, sha256, top_n):
+    """같은 파일을 같은 설정으로 이미 평가했는지"""
+    return (
+        record is not None
+        and record.get("version") == REPORT_VERSION
+        and record.get("status") == "done"
+        and record.get("sha256") == sha256
+        and record.get("top_n") == top_n
+    )
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def render_report(record, summaries):
+    """평가 결과를 Markdown 보고서로 만듭니다."""
+    lines = [
+        f"# 논문 평가 보고서: {record['file']}",
+        "",
+        f"- 평가 일시: {record['finished_at']}",
+        f"- 파일 해시: `{record['sha256']}`",
+        "- 참고 논문:",
+    ]
+    for reference in record["references"]:
+        lines.append(f"  - {reference['title']} ({reference['source']}, 거리 {reference['distance']:.4f})")
+    lines += ["", "## 최종 평가", "", record["feedback"], "", "## 참고 논문 요약", ""]
+    for reference, summary in zip(record["references"], summaries):
+        lines += [f"### {reference['title']}", "", summary, ""]
+    return "\n".join(lines)
+
+
+def write_report(output_dir, pdf_path, record, summaries=()):
+    """보고서를 쓰고 마지막에 JSON 기록을 교체합니다 (JSON이 완료 표시 역할)."""
+    markdown_path, json_path = report_paths(output_dir, pdf_path)
+    if record["status"] == "done":
+        _write_atomic(markdown_path, render_report(record, summaries))
+    _write_atomic(json_path, json.dumps(record, ensure_ascii=False, indent=2))
+
+
+def _new_record(pdf_path, sha256, top_n):
+    return {
+        "version": REPORT_VERSION,
+        "file": os.path.basename(pdf_path),
+        "sha256": sha256,
+        "top_n": top_n,
+        "status": "pending",
+        "references": [],
+        "feedback": None,
+        "evaluations": [],
+        "timings": {},
+        "error": None,
+        "finished_at": None,
+    }
+
+
+def _fail(output_dir, submission, error):
+    record = submission["record"]
+    record.update(status="failed", error=f"{type(error).__name__}: {error}",
+                  finished_at=datetime.now().isoformat(timespec="seconds"))
+    write_report(output_dir, submission["path"], record)
+    logger.error(f"평가 실패: {record['file']}: {error}")
+    print(f"✗ {record['file']}: {record['error']}")
+
+
+def extract_submissions(submissions, workers):
+    """제출 파일의 텍스트를 프로세스 풀에서 추출합니다 (실패한 파일은 기록에 남김)."""
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(extract_text_from_pdf, submission["path"]) for submission in submissions]
+        for submission, future in zip(submissions, futures):
+            try:
+                submission["text"] = future.result()
+            except Exception as e:
+                submission["error"] = e
+
+
+async def grade_submissions(submissions, output_dir, concurrency, eval_concurrency=EVAL_CONCURRENCY):
+    """참고 논문 요약을 한 번씩만 만들고, 제출 파일을 최대 `concurrency`개씩 동시에 평가합니다."""
+    # 여러 제출 파일이 공유하는 참고 논문은 한 번만 요약
+    unique_papers = {}
+    for submission in submissions:
+        for paper in submission["papers"]:
+            unique_papers.setdefault(paper["id"], paper)
+    print(f"참고 논문 {sum(len(s['papers']) for s in submissions)}건 중 고유 논문 {len(unique_papers)}개 요약")
+    summary_tasks = dict(zip(unique_papers, start_summaries(list(unique_papers.values()), SUMMARY_SYSTEM_PROMPT)))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def grade(submission):
+        nonlocal done
+        record = submission["record"]
+        async with semaphore:
+            try:
+                tasks = [summary_tasks[paper["id"]] for paper in submission["papers"]]
+                timings = {}
+                feedback, evaluations = await generate_paper_feedback(
+                    submission["text"], tasks, max_concurrency=eval_concurrency, timings=timings,
+                    titles=[paper.get("title") or paper["source"] for paper in submission["papers"]]
+                )
+                record.update(status="done", feedback=feedback, evaluations=evaluations, timings=timings,
+                              finished_at=datetime.now().isoformat(timespec="seconds"))
+                write_report(output_dir, submission["path"], record, [task.result() for task in tasks])
+                done += 1
+                print(f"✓ [{done}/{len(submissions)}] {record['file']}")
+            except Exception as e:
+                _fail(output_dir, submission, e)
+
+    await asyncio.gather(*(grade(submission) for submission in submissions))
+    # 실패한 제출 파일만 참조한 요약의 예외를 회수
+    await asyncio.gather(*summary_tasks.values(), return_exceptions=True)
+
+
+def write_index(output_dir, submissions):
+    """전체 제출 파일의 상태 목록"""
+    index = []
+    for submission in submissions:
+        record = load_record(output_dir, submission["path"]) or {}
+        index.append({
+            "file": os.path.basename(submission["path"]),
+            "status": record.get("status", "pending"),
+            "report": report_paths(output_dir, submission["path"])[0] if record.get("status") == "done" else None,
+            "error": record.get("error"),
+        })
+    _write_atomic(os.path.join(output_dir, "index.json"), json.dumps(index, ensure_ascii=False, indent=2))
+    return index
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="제출된 논문 PDF를 한꺼번에 평가하고 파일별 보고서를 작성")
+    parser.add_argument("submissions_dir", help="평가할 PDF 파일 디렉토리")
+    parser.add_argument("--output-dir", default="reports", help="보고서 디렉토리 (기본값: reports)")
+    parser.add_argument("--top-n", type=int, default=3, help="제출 파일당 참고 논문 수")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="동시에 평가할 제출 파일 수 (API 요청 한도는 공유 스케줄러가 관리)")
+    parser.add_argument("--eval-concurrency", type=int, default=EVAL_CONCURRENCY,
+                        help="제출 파일 하나 안에서 동시에 실행할 개별 평가 수")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="텍스트 추출 프로세스 수")
+    parser.add_argument("--force", action="store_true", help="이미 평가한 파일도 다시 평가")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logging('bulk_grade.log')
+    metrics.setup_from_env()
+
+    pdf_files = [str(path) for path in sorted(Path(args.submissions_dir).glob("*.pdf"))]
+    if not pdf_files:
+        print(f"평가할 PDF 파일이 없습니다: {args.submissions_dir}")
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # 이전 실행에서 끝난 파일은 건너뜀 (파일 내용과 설정이 같을 때)
+    submissions = []
+    for pdf_path in pdf_files:
+        sha256 = file_sha256(pdf_path)
+        if not args.force and is_completed(load_record(args.output_dir, pdf_path), sha256, args.top_n):
+            continue
+        submissions.append({"path": pdf_path, "record": _new_record(pdf_path, sha256, args.top_n)})
+    print(f"제출 파일 {len(pdf_files)}개 중 평가할 파일 {len(submissions)}개 "
+          f"(완료되어 건너뜀 {len(pdf_files) - len(submissions)}개)")
+
+    if submissions:
+        extract_submissions(submissions, args.workers)
+        ready = []
+        for submission in submissions:
+            if "error" in submission:
+                _fail(args.output_dir, submission, submission["error"])
+            else:
+                ready.append(submission)
+        print(f"✓ 텍스트 추출 완료: {len(ready)}개")
+
+        # 임베딩은 다중 입력 요청으로 묶고, 검색은 한 번의 질의로 처리
+        embeddings = get_embeddings([submission["text"] for submission in ready])
+        searchable = []
+        for submission, embedding in zip(ready, embeddings):
+            if embedding is None:
+                _fail(args.output_dir, submission, ValueError("추출된 텍스트가 없습니다"))
+            else:
+                submission["embedding"] = embedding
+                searchable.append(submission)
+        results = search_similar_papers_many([s["embedding"] for s in searchable], top_n=args.top_n)
+        print(f"✓ 임베딩 및 유사 논문 검색 완료: {len(searchable)}개")
+
+        for submission, metadatas, distances in zip(searchable, results["metadatas"], results["distances"]):
+            distance_by_id = {metadata["id"]: distance for metadata, distance in zip(metadatas, distances)}
+            submission["papers"] = reference_papers(metadatas)
+            submission["record"]["references"] = [
+                {
+                    "id": paper["id"],
+                    "title": paper.get("title", ""),
+                    "source": paper["source"],
+                    "distance": float(distance_by_id[paper["id"]]),
+                }
+                for paper in submission["papers"]
+            ]
+
+        asyncio.run(grade_submissions(searchable, args.output_dir, args.concurrency, args.eval_concurrency))
+
+    index = write_index(args.output_dir, [{"path": path} for path in pdf_files])
+    completed = sum(1 for item in index if item["status"] == "done")
+    failed = sum(1 for item in index if item["status"] == "failed")
+    print(f"\n완료 {completed}개, 실패 {failed}개 ({time.perf_counter() - start:.1f}초) - 보고서: {args.output_dir}")
+    if failed:
+        print("실패한 파일은 같은 명령을 다시 실행하면 이어서 평가합니다.")
+
+    if metrics.enabled():
+        print("\n구간별 소요 시간 및 사용량")
+        print(metrics.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import logging
+import threading
+from dotenv import load_dotenv
+
+# 무거운 라이브러리(openai, anthropic, chromadb)는 처음 사용할 때 가져오므로
+# 모듈을 import하는 것만으로는 클라이언트나 DB 연결이 만들어지지 않습니다.
+
+load_dotenv()
+
+LOG_DIR = os.getenv("LOG_DIR", "log")
+# ChromaDB 저장 경로 (매니페스트, 텍스트 저장소 등 수집 데이터도 이 아래에 둠)
+persist_directory = os.getenv("CHROMA_PERSIST_DIR", 'chromadb_data')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_lock = threading.Lock()
+_logging_configured = False
+_openai_client = None
+_chroma_clients = {}
+
+def setup_logging(log_file="app.log", level=logging.INFO):
+    """프로세스 전체의 로깅을 한 번만 설정합니다 (콘솔 + log 디렉토리의 파일).
+
+    진입점(main.py, batch_process_pdfs.py 등)에서 호출하며, 두 번째 호출부터는 무시됩니다.
+    """
+    global _logging_configured
+    with _lock:
+        if _logging_configured:
+            return
+        os.makedirs(LOG_DIR, exist_ok=True)
+        logging.basicConfig(
+            level=level,
+            format=LOG_FORMAT,
+            handlers=[
+                logging.FileHandler(os.path.join(LOG_DIR, log_file)),
+                logging.StreamHandler()
+            ]
+        )
+        _logging_configured = True
+
+def get_openai_client():
+    """프로세스에서 공유하는 OpenAI 클라이언트 (`OPENAI_BASE_URL`을 따름)"""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+def create_async_anthropic_client(**kwargs):
+    """새 비동기 Anthropic 클라이언트
+
+    httpx 비동기 연결은 이벤트 루프에 묶이므로 공유하지 않고 호출한 쪽(LLM 스케줄러)이
+    루프마다 하나씩 보관합니다.
+    """
+    import anthropic
+    return anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), **kwargs)
+
+def get_chroma_client(path):
+    """저장 경로별로 하나씩 만드는 ChromaDB PersistentClient"""
+    client = _chroma_clients.get(path)
+    if client is None:
+        with _lock:
+            client = _chroma_clients.get(path)
+            if client is None:
+                import chromadb
+                os.makedirs(path, exist_ok=True)
+                client = chromadb.PersistentClient(path=path)
+                _chroma_clients[path] = client
+    return client
@@ -0,0 +1,180 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from pdf_utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusManifest:
+    """DB에 반영된 PDF 파일 목록 (경로, 크기, 수정 시각, 내용 해시, 문서 ID)
+
+    크기와 수정 시각이 그대로인 파일은 해시를 다시 계산하지 않으므로
+    변경이 적은 대용량 디렉토리도 빠르게 동기화할 수 있습니다.
+    DB 저장이 끝난 묶음 단위로 기록되므로 중단된 수집을 이어서 할 때의 체크포인트 역할도 하며,
+    처리에 실패한 파일은 실패 기록(`failures` 테이블)에 단계, 오류 종류, 시도 횟수와 함께 남습니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " sha256 TEXT NOT NULL,"
+                " doc_id TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS failures ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER,"
+                " mtime_ns INTEGER,"
+                " stage TEXT NOT NULL,"
+                " error_class TEXT NOT NULL,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL,"
+                " first_failed REAL NOT NULL,"
+                " last_failed REAL NOT NULL)"
+            )
+
+    def entries(self):
+        """경로를 키로 하는 {path: (size, mtime_ns, sha256, doc_id)} 딕셔너리"""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns, sha256, doc_id FROM files").fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def scan(self, pdf_paths):
+        """현재 파일 목록을 매니페스트와 비교합니다.
+
+        (추가/변경된 경로 목록, 변경 없는 파일 수, 삭제된 경로 목록)을 반환합니다.
+        """
+        known = self.entries()
+        changed = []
+        unchanged = 0
+        touched = []
+        seen = set()
+        for pdf_path in pdf_paths:
+            pdf_path = str(pdf_path)
+            try:
+                stat = os.stat(pdf_path)
+            except OSError:
+                # 목록을 만든 뒤 지워진 파일은 삭제된 것으로 취급
+                continue
+            seen.add(pdf_path)
+            entry = known.get(pdf_path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            if entry is not None and entry[2] == file_sha256(pdf_path):
+                # 수정 시각만 바뀐 경우 내용은 그대로이므로 다시 처리하지 않음
+                touched.append((stat.st_size, stat.st_mtime_ns, pdf_path))
+                unchanged += 1
+                continue
+            changed.append(pdf_path)
+
+        if touched:
+            with self._lock, self._conn:
+                self._conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", touched)
+
+        removed = sorted(path for path in known if path not in seen)
+        return changed, unchanged, removed
+
+    def record(self, pdf_path, size, mtime_ns, sha256, doc_id):
+        """처리가 끝난 파일을 기록하고, 더 이상 참조되지 않는 이전 문서 ID를 반환합니다.
+
+        크기와 수정 시각은 텍스트를 추출할 때 읽은 값을 사용해야 처리 도중 바뀐 파일을
+        다음 동기화에서 다시 처리할 수 있습니다.
+        """
+        stale_ids = self.record_many([(pdf_path, size, mtime_ns, sha256, doc_id)])
+        return stale_ids[0] if stale_ids else None
+
+    def record_many(self, entries):
+        """(경로, 크기, 수정 시각, 해시, 문서 ID) 목록을 한 트랜잭션으로 기록합니다.
+
+        기록된 파일의 실패 기록은 지우며, 더 이상 참조되지 않는 이전 문서 ID 목록을 반환합니다.
+        같은 묶음의 다른 파일이 이전 문서 ID를 새로 쓰는 경우(내용이 같은 파일, 이름 변경)도 있으므로
+        묶음 전체를 기록한 뒤에 참조 여부를 확인합니다.
+        """
+        previous_ids = set()
+        with self._lock, self._conn:
+            for pdf_path, size, mtime_ns, sha256, doc_id in entries:
+                pdf_path = str(pdf_path)
+                row = self._conn.execute("SELECT doc_id FROM files WHERE path = ?", (pdf_path,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, doc_id) VALUES (?, ?, ?, ?, ?)",
+                    (pdf_path, size, mtime_ns, sha256, doc_id)
+                )
+                self._conn.execute("DELETE FROM failures WHERE path = ?", (pdf_path,))
+                if row is not None and row[0] != doc_id:
+                    previous_ids.add(row[0])
+            if not previous_ids:
+                return []
+            placeholders = ", ".join("?" for _ in previous_ids)
+            referenced = {
+                row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT doc_id FROM files WHERE doc_id IN ({placeholders})", list(previous_ids)
+                )
+            }
+        return sorted(previous_ids - referenced)
+
+    def record_failure(self, pdf_path, stage, error):
+        """처리에 실패한 파일을 실패 기록에 남기고 누적 시도 횟수를 반환합니다."""
+        pdf_path = str(pdf_path)
+        try:
+            stat = os.stat(pdf_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO failures (path, size, mtime_ns, stage, error_class, error, attempts,"
+                " first_failed, last_failed) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns,"
+                " stage = excluded.stage, error_class = excluded.error_class, error = excluded.error,"
+                " attempts = attempts + 1, last_failed = excluded.last_failed",
+                (pdf_path, size, mtime_ns, stage, type(error).__name__, str(error), now, now)
+            )
+            row = self._conn.execute("SELECT attempts FROM failures WHERE path = ?", (pdf_path,)).fetchone()
+        return row[0]
+
+    def failures(self):
+        """경로를 키로 하는 실패 기록 딕셔너리"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, stage, error_class, error, attempts, first_failed, last_failed"
+                " FROM failures ORDER BY path"
+            ).fetchall()
+        fields = ("size", "mtime_ns", "stage", "error_class", "error", "attempts", "first_failed", "last_failed")
+        return {row[0]: dict(zip(fields, row[1:])) for row in rows}
+
+    def clear_failures(self, pdf_paths):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM failures WHERE path = ?", [(str(path),) for path in pdf_paths])
+
+    def remove(self, pdf_paths):
+        """삭제된 파일을 매니페스트에서 지우고, 더 이상 참조되지 않는 문서 ID 목록을 반환합니다."""
+        stale_ids = []
+        with self._lock, self._conn:
+            for pdf_path in pdf_paths:
+                self._conn.execute("DELETE FROM failures WHERE path = ?", (pdf_path,))
+                row = self._conn.execute("SELECT doc_id FROM files WHERE path = ?", (pdf_path,)).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM files WHERE path = ?", (pdf_path,))
+                doc_id = self._orphaned(row[0])
+                if doc_id is not None:
+                    stale_ids.append(doc_id)
+        return stale_ids
+
+    def _orphaned(self, doc_id):
+        # 내용이 같은 다른 파일이 아직 같은 문서 ID를 쓰고 있으면 삭제하지 않음
+        row = self._conn.execute("SELECT 1 FROM files WHERE doc_id = ? LIMIT 1", (doc_id,)).fetchone()
+        return None if row else doc_id
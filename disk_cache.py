@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """SQLite 기반의 디스크 키-값 캐시
+
+    - 여러 스레드/프로세스가 동시에 읽고 쓸 수 있도록 WAL 모드를 사용합니다.
+    - 전체 크기가 `max_bytes`를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다 (LRU).
+    - `ttl`(초)을 지정하면 저장된 지 그보다 오래된 항목은 없는 것으로 취급합니다.
+    - 전체 크기는 트리거가 `cache_meta`에 누적하므로 저장할 때마다 테이블 전체를 합산하지 않으며,
+      값(BLOB)은 마지막 열에 두어 크기/사용 시각만 읽는 정리 작업이 값 페이지를 읽지 않습니다.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " created REAL NOT NULL DEFAULT 0,"
+                " value BLOB NOT NULL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if columns[-1] != "value":
+                self._migrate(conn, columns)
+            conn.execute("DROP INDEX IF EXISTS entries_accessed")
+            # 정리 순서 조회가 인덱스만 읽도록 키와 크기를 함께 넣음
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed, size, key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_meta ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total_bytes INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (id, total_bytes)"
+                " SELECT 0, COALESCE(SUM(size), 0) FROM entries"
+            )
+            conn.executescript(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN"
+                " UPDATE cache_meta SET total_bytes = total_bytes + NEW.size; END;"
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN"
+                " UPDATE cache_meta SET total_bytes = total_bytes - OLD.size; END;"
+                "CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN"
+                " UPDATE cache_meta SET total_bytes = total_bytes + NEW.size - OLD.size; END;"
+            )
+
+    @staticmethod
+    def _migrate(conn, columns):
+        """값 열이 앞에 있던 이전 형식의 캐시 파일을 새 열 순서로 옮깁니다."""
+        logger.info("캐시 파일을 새 형식으로 변환합니다")
+        created = "created" if "created" in columns else "0"
+        conn.executescript(
+            "BEGIN;"
+            "CREATE TABLE entries_new ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " created REAL NOT NULL DEFAULT 0,"
+            " value BLOB NOT NULL);"
+            f"INSERT INTO entries_new (key, size, accessed, created, value)"
+            f" SELECT key, size, accessed, {created}, value FROM entries;"
+            "DROP TABLE entries;"
+            "ALTER TABLE entries_new RENAME TO entries;"
+            "DROP TABLE IF EXISTS cache_meta;"
+            "COMMIT;"
+        )
+
+    def _connect(self):
+        # sqlite3 연결은 스레드 간에 공유하지 않고 스레드마다 하나씩 사용
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """키에 해당하는 값을 반환합니다. 없으면 None."""
+        conn = self._connect()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+        if self.ttl is not None and row[1] < time.time() - self.ttl:
+            # 만료된 항목
+            self._count(False)
+            self.delete(key)
+            return None
+        self._count(True)
+        try:
+            with conn:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.OperationalError as e:
+            # 사용 시각 갱신 실패는 조회 결과에 영향을 주지 않음
+            logger.warning(f"캐시 사용 시각 갱신 실패: {e}")
+        return row[0]
+
+    def set(self, key, value):
+        """값을 저장하고 크기 한도를 넘으면 오래된 항목을 정리합니다."""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            # REPLACE는 삭제 트리거를 실행하지 않으므로 UPSERT로 갱신해 크기 합계를 맞춤
+            conn.execute(
+                "INSERT INTO entries (key, size, accessed, created, value) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET size = excluded.size, accessed = excluded.accessed,"
+                " created = excluded.created, value = excluded.value",
+                (key, len(value), now, now, value)
+            )
+        self._evict(conn)
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        if self.ttl is not None:
+            with conn:
+                conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        # 한도의 90%까지 줄여 매번 정리가 반복되지 않도록 함
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        logger.info(f"캐시 정리: {len(keys)}개 항목 삭제 ({freed} bytes)")
+
+    @staticmethod
+    def _total_bytes(conn):
+        return conn.execute("SELECT total_bytes FROM cache_meta WHERE id = 0").fetchone()[0]
+
+    def stats(self):
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self._total_bytes(conn)}
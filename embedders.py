@@ -0,0 +1,216 @@
+import os
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 이름 → 임베딩 백엔드 클래스
+EMBEDDERS = {}
+
+def register_embedder(name):
+    """임베딩 백엔드 클래스를 `name`으로 등록하는 데코레이터"""
+    def decorator(cls):
+        cls.name = name
+        EMBEDDERS[name] = cls
+        return cls
+    return decorator
+
+def create_embedder(name, **options):
+    """등록된 이름으로 임베딩 백엔드를 만듭니다."""
+    try:
+        cls = EMBEDDERS[name]
+    except KeyError:
+        raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {name} (사용 가능: {', '.join(sorted(EMBEDDERS))})")
+    return cls(**options)
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    return matrix / norms
+
+class Embedder:
+    """임베딩 백엔드 인터페이스
+
+    - `name`, `model`, `dimension`은 컬렉션 메타데이터에 저장되어 다른 백엔드의 벡터와
+      섞이지 않도록 확인하는 데 사용됩니다.
+    - `split(text)`: 문서를 한 번에 임베딩할 수 있는 (청크, 길이) 목록으로 나눔
+    - `embed(chunks)`: 청크 목록을 (청크 수, dimension) 크기의 float32 행렬로 변환
+    - 한 번의 `embed` 호출에는 최대 `max_batch_inputs`개, 길이 합 `max_batch_length`까지 넘깁니다.
+    """
+
+    name = None
+    model = None
+    dimension = None
+    max_batch_inputs = 256
+    max_batch_length = 2_000_000
+    max_concurrency = 1
+    # 이 길이(글자 수)를 넘는 문서는 나눠서 임베딩
+    max_chunk_chars = 100_000
+
+    @property
+    def signature(self):
+        return f"{self.name}:{self.model}:{self.dimension}"
+
+    @property
+    def cache_namespace(self):
+        """임베딩 캐시 키에 들어가는 백엔드 식별자"""
+        return self.signature
+
+    def collection_metadata(self):
+        return {"embedder": self.name, "embedding_model": self.model, "embedding_dim": self.dimension}
+
+    def split(self, text):
+        if len(text) <= self.max_chunk_chars:
+            return [(text, len(text))] if text else []
+        return [
+            (text[start:start + self.max_chunk_chars], len(text[start:start + self.max_chunk_chars]))
+            for start in range(0, len(text), self.max_chunk_chars)
+        ]
+
+    def embed(self, chunks):
+        raise NotImplementedError
+
+@register_embedder("local")
+class HashingEmbedder(Embedder):
+    """CPU에서 동작하는 해시 n-gram 임베딩 (네트워크/모델 파일 불필요)
+
+    UTF-8 바이트 n-gram을 부호 있는 해시로 `dimension`개 버킷에 모은 뒤 로그 스케일과
+    L2 정규화를 적용합니다. 바이트 단위라 한글도 별도 토크나이저 없이 처리됩니다.
+    `model_path`에 `projection`(해시 차원 × 출력 차원) 행렬을 담은 .npz 파일을 지정하면
+    학습된 투영(예: LSA)을 적용합니다.
+    """
+
+    model = "hashing-ngram"
+    max_batch_inputs = 64
+
+    def __init__(self, dimension=1024, ngram_range=(3, 6), model_path=None, seed=0):
+        self.ngram_range = tuple(ngram_range)
+        self.hash_dimension = int(dimension)
+        self.seed = seed
+        self.projection = None
+        if model_path:
+            with np.load(model_path) as data:
+                self.projection = np.asarray(data["projection"], dtype=np.float32)
+            if self.projection.shape[0] != self.hash_dimension:
+                self.hash_dimension = self.projection.shape[0]
+            self.model = f"hashing-ngram+{os.path.basename(model_path)}"
+        self.dimension = self.projection.shape[1] if self.projection is not None else self.hash_dimension
+        low, high = self.ngram_range
+        self.model = f"{self.model}-{low}-{high}"
+
+    def _hash_features(self, text):
+        data = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        vector = np.zeros(self.hash_dimension, dtype=np.float32)
+        low, high = self.ngram_range
+        if len(data) < low:
+            return vector
+        prime = np.uint64(1099511628211)
+        offset = np.uint64(14695981039346656037 ^ self.seed)
+        with np.errstate(over="ignore"):
+            hashes = np.full(len(data), offset, dtype=np.uint64)
+            for n in range(1, high + 1):
+                # FNV-1a 방식으로 길이 n까지의 n-gram 해시를 한 번에 계산
+                hashes = hashes[:len(data) - n + 1]
+                hashes = (hashes ^ data[n - 1:]) * prime
+                if n >= low:
+                    mixed = hashes ^ (hashes >> np.uint64(29))
+                    buckets = (mixed % np.uint64(self.hash_dimension)).astype(np.int64)
+                    signs = np.where((mixed >> np.uint64(63)) == 0, 1.0, -1.0).astype(np.float32)
+                    vector += np.bincount(buckets, weights=signs, minlength=self.hash_dimension).astype(np.float32)
+        return np.sign(vector) * np.log1p(np.abs(vector))
+
+    def embed(self, chunks):
+        matrix = np.stack([self._hash_features(chunk) for chunk in chunks]) if chunks else \
+            np.zeros((0, self.dimension), dtype=np.float32)
+        if self.projection is not None:
+            matrix = matrix @ self.projection
+        return _normalize_rows(matrix.astype(np.float32, copy=False))
+
+@register_embedder("onnx")
+class OnnxEmbedder(Embedder):
+    """로컬 ONNX 문장 임베딩 모델 (예: all-MiniLM-L6-v2를 ONNX로 내보낸 디렉토리)
+
+    `model_path` 디렉토리에 `model.onnx`와 `tokenizer.json`이 있어야 하며,
+    onnxruntime과 tokenizers 패키지를 사용합니다 (chromadb 설치 시 함께 설치됨).
+    토큰 임베딩을 attention mask로 평균 낸 뒤 L2 정규화합니다.
+    """
+
+    max_batch_inputs = 32
+
+    def __init__(self, model_path=None, max_tokens=256, threads=None):
+        if not model_path:
+            raise ValueError("onnx 백엔드는 EMBEDDING_MODEL_PATH(모델 디렉토리)가 필요합니다")
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("onnx 백엔드를 사용하려면 onnxruntime과 tokenizers를 설치해주세요") from e
+
+        self.max_tokens = max_tokens
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        self._splitter = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self._splitter.no_truncation()
+        self._splitter.no_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self.model = os.path.basename(os.path.normpath(model_path))
+        self.dimension = int(self._run(["dimension probe"]).shape[1])
+        logger.info(f"ONNX 임베딩 모델 로드 완료: {self.model} ({self.dimension}차원)")
+
+    def split(self, text):
+        """모델 입력 길이(토큰)에 맞춰 원문 위치 기준으로 나눕니다."""
+        if not text:
+            return []
+        offsets = self._splitter.encode(text, add_special_tokens=False).offsets
+        # [CLS], [SEP] 자리를 남겨 둠
+        window = self.max_tokens - 2
+        if len(offsets) <= window:
+            return [(text, len(offsets))]
+        chunks = []
+        for start in range(0, len(offsets), window):
+            piece = offsets[start:start + window]
+            chunks.append((text[piece[0][0]:piece[-1][1]], len(piece)))
+        return chunks
+
+    def _run(self, chunks):
+        encoded = self.tokenizer.encode_batch(chunks)
+        input_ids = np.array([item.ids for item in encoded], dtype=np.int64)
+        attention_mask = np.array([item.attention_mask for item in encoded], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return _normalize_rows(pooled.astype(np.float32))
+
+    def embed(self, chunks):
+        return self._run(list(chunks))
+
+@register_embedder("fake")
+class FakeEmbedder(Embedder):
+    """테스트용 결정적 임베딩 (같은 텍스트는 항상 같은 단위 벡터, 네트워크 사용 안 함)"""
+
+    model = "fake"
+    max_batch_inputs = 1024
+
+    def __init__(self, dimension=64):
+        self.dimension = int(dimension)
+
+    def embed(self, chunks):
+        vectors = []
+        for chunk in chunks:
+            seed = int.from_bytes(hashlib.sha256(chunk.encode("utf-8")).digest()[:8], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dimension))
+        if not vectors:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
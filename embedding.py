@@ -1,182 +1,390 @@
 import os
 import re
+import time
+import struct
+import random
+import hashlib
 import logging
-from dotenv import load_dotenv
-from openai import OpenAI
-import tiktoken
-
-# log 디렉토리 생성
-log_dir = "log"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, 'embedding.log')),
-        logging.StreamHandler()
-    ]
-)
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from disk_cache import DiskCache
+from clients import get_openai_client
+from embedders import Embedder, register_embedder, create_embedder
+import metrics
+
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# 다중 입력 요청 한도 (OpenAI 제한: 요청당 입력 2048개, 토큰 300,000개)
+MAX_REQUEST_INPUTS = 2048
+MAX_REQUEST_TOKENS = 250000
+
+# 재시도 설정
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# 임베딩 백엔드 설정
+# - EMBEDDING_BACKEND: "openai"(기본값), "local"(CPU 해시 n-gram), "onnx"(로컬 ONNX 모델), "fake"(테스트용)
+# - EMBEDDING_MODEL: OpenAI 임베딩 모델
+# - EMBEDDING_MODEL_PATH: local 백엔드의 투영 행렬(.npz) 또는 onnx 백엔드의 모델 디렉토리
+# - EMBEDDING_DIM: local/fake 백엔드의 벡터 차원
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+EMBEDDING_DIM = os.getenv("EMBEDDING_DIM")
+
+# 청크 분할 설정 (캐시 키에 포함됨)
+CHUNK_MAX_TOKENS = 4000
+CHUNK_OVERLAP = 0
+CHUNKER_VERSION = "token-offset-1"
+
+# 임베딩 캐시 설정
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """프로세스당 하나의 임베딩 캐시를 반환합니다."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES)
+        return _cache
+
+def get_cache_stats():
+    """임베딩 캐시의 적중/미스 횟수와 크기를 반환합니다."""
+    return get_embedding_cache().stats()
+
+def _cache_key(text, model):
+    """전처리된 텍스트, 모델, 청크 분할 설정으로 캐시 키를 만듭니다."""
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{CHUNKER_VERSION}\0{CHUNK_MAX_TOKENS}\0{CHUNK_OVERLAP}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+def _encode_vectors(vectors):
+    """청크 임베딩 목록을 float32 행렬 바이트로 직렬화"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return struct.pack("<II", *matrix.shape) + matrix.tobytes()
+
+def _decode_vectors(blob):
+    rows, dim = struct.unpack_from("<II", blob)
+    return np.frombuffer(blob, dtype=np.float32, offset=8).reshape(rows, dim)
+
+# 전처리: 단어 문자가 아닌 연속 구간(공백, 특수문자)을 공백 하나로 치환
+_NON_WORD_RE = re.compile(r'\W+')
+
+# 문장 경계로 취급하는 토큰 끝 바이트
+_SENTENCE_END_BYTES = (b'.', b'!', b'?', b'\n', '。'.encode('utf-8'))
+
+@lru_cache(maxsize=None)
+def _get_encoding(model="text-embedding-3-small"):
+    """모델별 tiktoken 인코딩 (프로세스당 한 번만 로드)
 
-# OpenAI 클라이언트 초기화
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    tiktoken이 모르는 모델/배포 이름이면 OpenAI 임베딩 모델과 같은 cl100k_base를 사용합니다.
+    """
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning(f"tiktoken이 모르는 모델입니다: {model} (cl100k_base 인코딩 사용)")
+        return tiktoken.get_encoding("cl100k_base")
 
-def count_tokens(text):
+def count_tokens(text, model="text-embedding-3-small"):
     """정확한 토큰 수 계산"""
-    encoding = tiktoken.encoding_for_model("text-embedding-3-small")
-    return len(encoding.encode(text))
+    return len(_get_encoding(model).encode_ordinary(text))
+
+def truncate_to_tokens(text, max_tokens, model="text-embedding-3-small", suffix="..."):
+    """텍스트를 앞에서부터 `max_tokens` 토큰까지 남깁니다 (UTF-8 문자 중간에서 자르지 않음)."""
+    if max_tokens <= 0:
+        return ""
+    tokens = _get_encoding(model).encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    head = _get_encoding(model).decode_bytes(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+    return head.rstrip() + suffix
 
 def preprocess_text(text):
-    """텍스트 전처리 함수"""
+    """텍스트 전처리 함수 (특수문자와 연속된 공백을 공백 하나로 치환)"""
     logger.info("텍스트 전처리 시작")
-    # 불필요한 공백 제거
-    text = ' '.join(text.split())
-    # 특수문자 제거
-    text = re.sub(r'[^\w\s]', ' ', text)
-    # 연속된 공백 제거
-    text = re.sub(r'\s+', ' ', text)
+    text = _NON_WORD_RE.sub(' ', text).strip()
     logger.info("텍스트 전처리 완료")
-    return text.strip()
+    return text
+
+def _split_tokens(text, max_tokens=CHUNK_MAX_TOKENS, overlap=0, snap_to_sentence=False,
+                  model="text-embedding-3-small"):
+    """텍스트를 한 번만 인코딩하고 토큰 위치에서 바로 잘라 (청크, 토큰 수) 목록을 반환
+
+    - `overlap`: 이웃한 청크가 겹치는 토큰 수
+    - `snap_to_sentence`: 청크 끝 1/4 구간에 문장 경계가 있으면 그 뒤에서 자름
+    청크 경계는 UTF-8 문자 중간이 되지 않도록 조정되므로 한글이 깨지지 않습니다.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap은 max_tokens보다 작아야 합니다")
+    tokens = _get_encoding(model).encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return [(text, len(tokens))] if tokens else []
+
+    token_bytes = _get_encoding(model).decode_tokens_bytes(tokens)
+
+    def is_char_boundary(index):
+        # 다음 토큰이 UTF-8 연속 바이트(10xxxxxx)로 시작하면 문자 중간
+        return index >= len(token_bytes) or not token_bytes[index] or (token_bytes[index][0] & 0xC0) != 0x80
 
-def split_text(text, max_tokens=4000):  # 더 작은 청크 크기로 설정
-    """텍스트를 토큰 제한에 맞게 분할하는 함수"""
-    # 먼저 문단으로 분할
-    paragraphs = text.split('\n\n')
     chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
-            
-        # 문단이 너무 길면 문장 단위로 더 분할
-        if count_tokens(para) > max_tokens:
-            sentences = re.split(r'[.!?]+', para)
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if not sentence:
-                    continue
-                    
-                # 문장이 너무 길면 단어 단위로 분할
-                if count_tokens(sentence) > max_tokens:
-                    words = sentence.split()
-                    temp_chunk = []
-                    temp_length = 0
-                    
-                    for word in words:
-                        word_tokens = count_tokens(word)
-                        if temp_length + word_tokens > max_tokens:
-                            if temp_chunk:
-                                chunks.append(' '.join(temp_chunk))
-                            temp_chunk = [word]
-                            temp_length = word_tokens
-                        else:
-                            temp_chunk.append(word)
-                            temp_length += word_tokens
-                    
-                    if temp_chunk:
-                        chunks.append(' '.join(temp_chunk))
-                else:
-                    # 문장을 현재 청크에 추가
-                    sentence_tokens = count_tokens(sentence)
-                    if current_length + sentence_tokens > max_tokens:
-                        if current_chunk:
-                            chunks.append(' '.join(current_chunk))
-                        current_chunk = [sentence]
-                        current_length = sentence_tokens
-                    else:
-                        current_chunk.append(sentence)
-                        current_length += sentence_tokens
-        else:
-            # 문단을 현재 청크에 추가
-            para_tokens = count_tokens(para)
-            if current_length + para_tokens > max_tokens:
-                if current_chunk:
-                    chunks.append(' '.join(current_chunk))
-                current_chunk = [para]
-                current_length = para_tokens
-            else:
-                current_chunk.append(para)
-                current_length += para_tokens
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    # 각 청크의 토큰 수 확인 및 필요시 추가 분할
-    final_chunks = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        if end < len(tokens):
+            if snap_to_sentence:
+                for index in range(end - 1, end - max_tokens // 4, -1):
+                    if token_bytes[index].rstrip(b' ').endswith(_SENTENCE_END_BYTES):
+                        end = index + 1
+                        break
+            boundary = end
+            while boundary > start + 1 and not is_char_boundary(boundary):
+                boundary -= 1
+            end = boundary
+        chunk = b"".join(token_bytes[start:end]).decode("utf-8", errors="replace").strip()
+        if chunk:
+            chunks.append((chunk, end - start))
+        if end >= len(tokens):
+            break
+        next_start = max(end - overlap, start + 1)
+        while next_start < end and not is_char_boundary(next_start):
+            next_start += 1
+        start = next_start
+    return chunks
+
+def split_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap=0, snap_to_sentence=False):
+    """텍스트를 토큰 제한에 맞게 분할하는 함수"""
+    return [chunk for chunk, _ in _split_tokens(text, max_tokens, overlap, snap_to_sentence)]
+
+def _retry_after(error):
+    """API 오류 응답의 retry-after 헤더(초)를 읽어옵니다."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+@lru_cache(maxsize=None)
+def _retryable_errors():
+    """재시도할 OpenAI 오류 (openai 패키지는 처음 요청할 때 가져옴)"""
+    from openai import RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+def _create_embeddings(inputs, model, max_retries=MAX_RETRIES):
+    """여러 입력을 한 번의 요청으로 임베딩하고, 속도 제한 시 백오프 후 재시도"""
+    for attempt in range(max_retries + 1):
+        try:
+            metrics.incr("api_calls", api="openai")
+            with metrics.span("openai.embeddings", model=model):
+                response = get_openai_client().embeddings.create(model=model, input=inputs)
+            if response.usage is not None:
+                metrics.record_usage("openai", model, response.usage.prompt_tokens)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            if not isinstance(e, _retryable_errors()):
+                metrics.incr("api_errors", api="openai", error=type(e).__name__)
+                raise
+            if attempt == max_retries:
+                metrics.incr("api_errors", api="openai", error=type(e).__name__)
+                logger.error(f"임베딩 요청 재시도 횟수 초과: {e}")
+                raise
+            wait_time = _retry_after(e) or min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+            wait_time += random.uniform(0, wait_time * 0.1)
+            metrics.incr("api_retries", api="openai", error=type(e).__name__)
+            logger.warning(f"임베딩 API 오류 발생. {wait_time:.1f}초 후 재시도... "
+                           f"(시도 {attempt + 1}/{max_retries}): {e}")
+            time.sleep(wait_time)
+
+def _pack_requests(chunks, max_tokens=MAX_REQUEST_TOKENS, max_inputs=MAX_REQUEST_INPUTS):
+    """(문서 번호, 청크, 토큰 수) 목록을 요청당 토큰/입력 수 한도에 맞춰 묶습니다."""
+    batches = []
+    current = []
+    current_tokens = 0
     for chunk in chunks:
-        if count_tokens(chunk) > max_tokens:
-            # 청크가 여전히 너무 크면 더 작게 분할
-            words = chunk.split()
-            temp_chunk = []
-            temp_length = 0
-            
-            for word in words:
-                word_tokens = count_tokens(word)
-                if temp_length + word_tokens > max_tokens:
-                    if temp_chunk:
-                        final_chunks.append(' '.join(temp_chunk))
-                    temp_chunk = [word]
-                    temp_length = word_tokens
-                else:
-                    temp_chunk.append(word)
-                    temp_length += word_tokens
-            
-            if temp_chunk:
-                final_chunks.append(' '.join(temp_chunk))
-        else:
-            final_chunks.append(chunk)
-    
-    return final_chunks
-
-def get_embedding(text, model="text-embedding-3-small"):
+        tokens = chunk[2]
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(chunk)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+@register_embedder("openai")
+class OpenAIEmbedder(Embedder):
+    """OpenAI 임베딩 API (토큰 단위로 청크를 나누고 다중 입력 요청으로 묶음)"""
+
+    # 모델별 기본 차원
+    DIMENSIONS = {
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+        "text-embedding-ada-002": 1536,
+    }
+    max_batch_inputs = MAX_REQUEST_INPUTS
+    max_batch_length = MAX_REQUEST_TOKENS
+    max_concurrency = 4
+
+    def __init__(self, model="text-embedding-3-small", max_retries=MAX_RETRIES):
+        self.model = model
+        self.dimension = self.DIMENSIONS.get(model)
+        self.max_retries = max_retries
+
+    @property
+    def cache_namespace(self):
+        # 백엔드를 도입하기 전의 캐시 키를 그대로 사용
+        return self.model
+
+    def split(self, text):
+        return _split_tokens(text, CHUNK_MAX_TOKENS, CHUNK_OVERLAP, model=self.model)
+
+    def embed(self, chunks):
+        matrix = np.asarray(_create_embeddings(list(chunks), self.model, self.max_retries), dtype=np.float32)
+        if self.dimension is None and len(matrix):
+            self.dimension = matrix.shape[1]
+        return matrix
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def _embedder_options(name):
+    options = {}
+    if name == "openai":
+        options["model"] = EMBEDDING_MODEL
+    if EMBEDDING_MODEL_PATH and name in ("local", "onnx"):
+        options["model_path"] = EMBEDDING_MODEL_PATH
+    if EMBEDDING_DIM and name in ("local", "fake"):
+        options["dimension"] = int(EMBEDDING_DIM)
+    return options
+
+def get_embedder():
+    """환경 변수(EMBEDDING_BACKEND 등)로 설정한 임베딩 백엔드 (프로세스당 하나)"""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = create_embedder(EMBEDDING_BACKEND, **_embedder_options(EMBEDDING_BACKEND))
+            logger.info(f"임베딩 백엔드: {_embedder.signature}")
+        return _embedder
+
+def set_embedder(embedder):
+    """기본 임베딩 백엔드를 바꿉니다. 이름(str)이나 Embedder 객체를 받습니다."""
+    global _embedder
+    if isinstance(embedder, str):
+        embedder = create_embedder(embedder, **_embedder_options(embedder))
+    with _embedder_lock:
+        _embedder = embedder
+    return embedder
+
+def _resolve_embedder(embedder=None, model=None):
+    if embedder is not None:
+        return embedder
+    if model is not None:
+        return OpenAIEmbedder(model)
+    return get_embedder()
+
+@metrics.timed("embedding.documents")
+def get_chunk_embeddings(texts, model=None, max_concurrency=None,
+                         use_cache=EMBEDDING_CACHE_ENABLED, embedder=None):
+    """여러 문서의 청크별 임베딩을 한꺼번에 생성하는 함수
+
+    캐시에 없는 문서의 청크만 백엔드의 입력 한도에 맞춘 묶음으로 나누어 최대
+    `max_concurrency`개씩 동시에 임베딩합니다. 입력과 같은 순서로 문서마다
+    (청크 수, 차원) 크기의 float32 행렬을 반환하며, 내용이 없는 문서는 None입니다.
+    `embedder`와 `model`을 모두 생략하면 `get_embedder()`를 사용하고,
+    `model`만 지정하면 해당 OpenAI 모델을 사용합니다.
+    """
+    embedder = _resolve_embedder(embedder, model)
+    if max_concurrency is None:
+        max_concurrency = embedder.max_concurrency
+    logger.info(f"임베딩 생성 시작: 문서 {len(texts)}개 ({embedder.name})")
+    cache = get_embedding_cache() if use_cache else None
+
+    results = [None] * len(texts)
+    # 캐시 키별로 같은 내용의 문서 번호를 모아 한 번만 임베딩
+    pending = {}
+    cache_hits = 0
+    for doc_index, text in enumerate(texts):
+        text = preprocess_text(text)
+        if not text:
+            logger.warning(f"문서 {doc_index + 1}: 임베딩할 텍스트가 없습니다")
+            continue
+        key = _cache_key(text, embedder.cache_namespace)
+        if key in pending:
+            pending[key][1].append(doc_index)
+            continue
+        blob = cache.get(key) if cache is not None else None
+        if blob is not None:
+            results[doc_index] = _decode_vectors(blob)
+            cache_hits += 1
+            continue
+        pending[key] = (text, [doc_index])
+
+    # 캐시에 없는 문서의 청크 분할 (문서당 한 번만 인코딩)
+    chunks = []
+    for key, (text, _) in pending.items():
+        doc_chunks = embedder.split(text)
+        if len(doc_chunks) > 1:
+            logger.info(f"텍스트가 너무 길어 {len(doc_chunks)}개 청크로 분할 처리")
+        for chunk, length in doc_chunks:
+            chunks.append((key, chunk, length))
+
+    batches = _pack_requests(chunks, embedder.max_batch_length, embedder.max_batch_inputs)
+    if cache is not None:
+        metrics.incr("cache_hits", cache_hits, cache="embedding")
+        metrics.incr("cache_misses", len(pending), cache="embedding")
+    logger.info(f"캐시 적중 {cache_hits}개, 미스 {len(pending)}개 - "
+                f"청크 {len(chunks)}개를 묶음 {len(batches)}개로 나누어 처리")
+
+    # 묶음을 동시에 임베딩
+    vectors_by_key = {key: [] for key in pending}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches) or 1))) as executor:
+        futures = [
+            executor.submit(embedder.embed, [chunk for _, chunk, _ in batch])
+            for batch in batches
+        ]
+        for batch, future in zip(batches, futures):
+            for (key, _, _), vector in zip(batch, future.result()):
+                vectors_by_key[key].append(vector)
+
+    for key, vectors in vectors_by_key.items():
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if cache is not None:
+            cache.set(key, _encode_vectors(matrix))
+        for doc_index in pending[key][1]:
+            results[doc_index] = matrix
+
+    logger.info("임베딩 생성 완료")
+    return results
+
+def pool_embeddings(chunk_embeddings):
+    """청크 임베딩 행렬을 평균내어 문서 하나의 float32 벡터로 만듭니다."""
+    if chunk_embeddings is None:
+        return None
+    return np.asarray(chunk_embeddings, dtype=np.float32).mean(axis=0, dtype=np.float32)
+
+def get_embeddings(texts, model=None, max_concurrency=None,
+                   use_cache=EMBEDDING_CACHE_ENABLED, embedder=None):
+    """여러 문서의 임베딩을 한꺼번에 생성하는 함수
+
+    문서별 청크 임베딩의 평균(float32 벡터)을 입력과 같은 순서로 반환하며,
+    내용이 없는 문서는 None입니다.
+    """
+    chunk_embeddings = get_chunk_embeddings(texts, model=model, max_concurrency=max_concurrency,
+                                            use_cache=use_cache, embedder=embedder)
+    return [pool_embeddings(matrix) for matrix in chunk_embeddings]
+
+def get_embedding(text, model=None, embedder=None):
     """텍스트의 임베딩을 생성하는 함수"""
-    logger.info("임베딩 생성 시작")
-    # 텍스트 전처리
-    text = preprocess_text(text)
-    
-    # 토큰 수 확인
-    token_count = count_tokens(text)
-    logger.info(f"전체 토큰 수: {token_count}")
-    
-    # 텍스트가 너무 길면 분할
-    if token_count > 4000:  # 더 작은 임계값으로 설정
-        logger.info("텍스트가 너무 길어 분할 처리 시작")
-        chunks = split_text(text)
-        embeddings = []
-        for i, chunk in enumerate(chunks):
-            try:
-                chunk_tokens = count_tokens(chunk)
-                logger.info(f"청크 {i+1}/{len(chunks)} 처리 중: {chunk_tokens} 토큰")
-                
-                response = client.embeddings.create(
-                    model=model,
-                    input=chunk
-                )
-                embeddings.append(response.data[0].embedding)
-                logger.info(f"청크 {i+1} 임베딩 생성 완료")
-            except Exception as e:
-                logger.error(f"청크 {i+1} 처리 중 오류 발생: {str(e)}")
-                logger.error(f"청크 길이: {len(chunk)} 문자, 토큰 수: {count_tokens(chunk)}")
-                raise e
-                
-        # 모든 청크의 임베딩 평균 계산
-        logger.info("모든 청크의 임베딩 평균 계산 중")
-        result = [sum(x) / len(x) for x in zip(*embeddings)]
-        logger.info("임베딩 생성 완료")
-        return result
-    else:
-        logger.info("단일 청크 임베딩 생성 중")
-        response = client.embeddings.create(
-            model=model,
-            input=text
-        )
-        logger.info("임베딩 생성 완료")
-        return response.data[0].embedding 
+    return get_embeddings([text], model=model, embedder=embedder)[0]
@@ -0,0 +1,178 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import threading
+import multiprocessing
+from job_queue import JobQueue, JOB_DB_PATH
+from ai_eval import run_evaluation
+from summarizer import SUMMARY_SYSTEM_PROMPT
+from clients import setup_logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 작업 종류
+EVALUATION_JOB = "evaluation"
+
+# 대기 작업이 없을 때 다시 확인하는 간격 (초)
+POLL_INTERVAL = 1.0
+# 스트리밍 중 진행 상황을 DB에 저장하는 최소 간격 (초)
+PROGRESS_INTERVAL = 0.5
+# 텍스트가 오지 않는 동안(요청 한도 대기 등)에도 작업자가 살아 있음을 알리는 간격 (초)
+HEARTBEAT_INTERVAL = 30
+
+
+class JobProgress:
+    """요약, 개별 평가, 최종 평가 텍스트를 모아 일정 간격으로 작업 진행 상황에 저장
+
+    `summary_stream(i)`, `evaluation_stream(i)`, `final_stream()`이 돌려주는 스트림은
+    main.py의 `StreamingMarkdown`과 같은 인터페이스(`stream(delta)`, `stream.flush()`)입니다.
+    """
+
+    def __init__(self, queue, job_id, worker, count):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.state = {
+            "stage": "summaries",
+            "summaries": [""] * count,
+            "summaries_done": 0,
+            "evaluations": [""] * count,
+            "final": "",
+        }
+        self._saved_at = 0.0
+
+    def _append(self, section, index, delta):
+        if section == "final":
+            self.state["final"] += delta
+            self.state["stage"] = "final"
+        else:
+            self.state[section][index] += delta
+            if section == "evaluations" and self.state["stage"] == "summaries":
+                self.state["stage"] = "evaluations"
+        if time.monotonic() - self._saved_at >= PROGRESS_INTERVAL:
+            self.save()
+
+    def save(self):
+        self.queue.update_progress(self.job_id, self.worker, self.state)
+        self._saved_at = time.monotonic()
+
+    def summary_stream(self, i):
+        progress = self
+
+        class SummaryStream:
+            def __call__(self, delta):
+                progress._append("summaries", i, delta)
+
+            def flush(self):
+                # 요약 태스크가 끝나면 호출됨
+                progress.state["summaries_done"] += 1
+                progress.save()
+
+        return SummaryStream()
+
+    def evaluation_stream(self, i):
+        return lambda delta: self._append("evaluations", i, delta)
+
+    def final_stream(self):
+        return lambda delta: self._append("final", None, delta)
+
+
+def run_evaluation_job(queue, job):
+    """평가 작업 하나를 실행하고 결과를 저장합니다."""
+    payload = job["payload"]
+    papers = payload["papers"]
+    progress = JobProgress(queue, job["id"], job["worker"], len(papers))
+    progress.save()
+    stopped = threading.Event()
+
+    def heartbeat():
+        heartbeat_queue = JobQueue(queue.path)
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            heartbeat_queue.touch(job["id"], job["worker"])
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        summaries, evaluations, feedback, timings = asyncio.run(run_evaluation(
+            payload["user_text"], papers, SUMMARY_SYSTEM_PROMPT,
+            [progress.summary_stream(i) for i in range(len(papers))],
+            [progress.evaluation_stream(i) for i in range(len(papers))],
+            progress.final_stream(),
+        ))
+    finally:
+        stopped.set()
+    progress.save()
+    queue.complete(job["id"], job["worker"], {
+        "summaries": summaries,
+        "evaluations": evaluations,
+        "feedback": feedback,
+        "timings": timings,
+    })
+
+
+def run_worker(queue_path=JOB_DB_PATH, max_jobs=None, stop_event=None):
+    """대기열에서 평가 작업을 하나씩 가져와 실행하는 작업자 루프
+
+    `max_jobs`개를 처리하거나 `stop_event`가 설정되면 종료합니다.
+    """
+    setup_logging('eval_worker.log')
+    metrics.setup_from_env()
+    queue = JobQueue(queue_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"평가 작업자 시작: {worker}")
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        if stop_event is not None and stop_event.is_set():
+            break
+        job = queue.claim(worker, kinds=[EVALUATION_JOB])
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        logger.info(f"작업 시작: {job['id']} ({job['attempts']}번째 시도)")
+        try:
+            run_evaluation_job(queue, job)
+        except Exception as e:
+            queue.fail(job["id"], worker, f"{type(e).__name__}: {e}")
+        processed += 1
+    logger.info(f"평가 작업자 종료: {worker} (처리 {processed}개)")
+
+
+def start_workers(count, queue_path=JOB_DB_PATH):
+    """작업자 프로세스 `count`개를 시작하고 프로세스 목록을 반환합니다.
+
+    Streamlit처럼 스레드가 있는 프로세스에서 호출해도 안전하도록 spawn 방식으로 시작합니다.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        process = context.Process(target=run_worker, args=(queue_path,), daemon=True)
+        process.start()
+        processes.append(process)
+    logger.info(f"평가 작업자 프로세스 {count}개 시작")
+    return processes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="대기열의 논문 평가 작업을 처리하는 작업자 프로세스 실행")
+    parser.add_argument("--workers", type=int, default=2, help="작업자 프로세스 수")
+    parser.add_argument("--queue", default=JOB_DB_PATH, help=f"작업 대기열 DB 경로 (기본값: {JOB_DB_PATH})")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logging('eval_worker.log')
+    processes = start_workers(args.workers, args.queue)
+    print(f"평가 작업자 {args.workers}개 실행 중 (대기열: {args.queue}) - 종료하려면 Ctrl+C")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("작업자를 종료합니다. 실행 중이던 작업은 다음 작업자가 다시 처리합니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# 단계 종료를 알리는 센티널
+_DONE = object()
+
+
+class StageStats:
+    """파이프라인 단계별 처리량 통계"""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, busy_time, processed=0, failed=0):
+        now = time.perf_counter()
+        with self._lock:
+            if self.started_at is None or now - busy_time < self.started_at:
+                self.started_at = now - busy_time
+            self.finished_at = now
+            self.busy_time += busy_time
+            self.processed += processed
+            self.failed += failed
+
+    @property
+    def wall_time(self):
+        if self.started_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self):
+        wall_time = self.wall_time
+        return self.processed / wall_time if wall_time > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.name:<8} 완료 {self.processed:>6}개 | 실패 {self.failed:>4}개 | "
+            f"경과 {self.wall_time:8.1f}초 | 작업 시간 {self.busy_time:8.1f}초 | "
+            f"처리량 {self.throughput:7.2f}개/초"
+        )
+
+
+def _timed_call(fn, item):
+    """프로세스 풀 안에서 실행되어 결과와 소요 시간을 함께 반환"""
+    start = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - start
+
+
+def run_pipeline(items, extract, embed, write, workers=None, concurrency=4,
+                 batch_size=32, embed_batch_size=16, queue_size=None,
+                 flush_interval=1.0, on_error=None):
+    """추출 → 임베딩 → DB 저장 3단계를 겹쳐서 실행하는 수집 파이프라인
+
+    - 추출: `workers`개의 프로세스 풀에서 `extract(item)` 실행 (CPU 바운드)
+    - 임베딩: `concurrency`개의 스레드가 대기 중인 문서를 최대 `embed_batch_size`개씩
+      모아 `embed(docs)` 실행 (네트워크 바운드)
+    - 저장: 단일 스레드가 최대 `batch_size`개씩 모아 `write(docs)` 호출
+
+    단계 사이의 큐는 크기가 제한되어 있어 뒤 단계가 밀리면 앞 단계가 대기합니다.
+    실패한 항목은 `on_error(item, stage, exc)`로 전달되고 파이프라인은 계속 진행됩니다.
+    단계 이름을 키로 하는 `StageStats` 딕셔너리를 반환합니다.
+    """
+    workers = workers or os.cpu_count() or 1
+    concurrency = max(1, concurrency)
+    queue_size = queue_size or concurrency * max(1, embed_batch_size)
+    max_in_flight = workers * 2
+
+    stats = {
+        "extract": StageStats("추출"),
+        "embed": StageStats("임베딩"),
+        "write": StageStats("DB 저장"),
+    }
+    extracted = queue.Queue(maxsize=queue_size)
+    embedded = queue.Queue(maxsize=max(queue_size, batch_size))
+
+    def report_error(item, stage, exc):
+        logger.error(f"{stats[stage].name} 단계 처리 중 오류 발생: {item} - {exc}")
+        if on_error is not None:
+            on_error(item, stage, exc)
+
+    def extract_stage():
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def drain(return_when):
+                done, _ = wait(list(pending), return_when=return_when)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        doc, elapsed = future.result()
+                    except Exception as e:
+                        stats["extract"].record(0.0, failed=1)
+                        report_error(item, "extract", e)
+                        continue
+                    stats["extract"].record(elapsed, processed=1)
+                    # 임베딩 단계가 밀려 있으면 여기서 대기 (backpressure)
+                    extracted.put(doc)
+
+            try:
+                for item in items:
+                    pending[executor.submit(_timed_call, extract, item)] = item
+                    if len(pending) >= max_in_flight:
+                        drain(FIRST_COMPLETED)
+                while pending:
+                    drain(FIRST_COMPLETED)
+            finally:
+                for _ in range(concurrency):
+                    extracted.put(_DONE)
+
+    def embed_stage():
+        finished = False
+        while not finished:
+            doc = extracted.get()
+            if doc is _DONE:
+                break
+            # 이미 대기 중인 문서를 함께 묶어 한 번에 임베딩
+            docs = [doc]
+            while len(docs) < embed_batch_size:
+                try:
+                    doc = extracted.get_nowait()
+                except queue.Empty:
+                    break
+                if doc is _DONE:
+                    finished = True
+                    break
+                docs.append(doc)
+
+            start = time.perf_counter()
+            try:
+                docs = embed(docs)
+            except Exception as e:
+                stats["embed"].record(time.perf_counter() - start, failed=len(docs))
+                for doc in docs:
+                    report_error(doc.get("path"), "embed", e)
+                continue
+            stats["embed"].record(time.perf_counter() - start, processed=len(docs))
+            for doc in docs:
+                embedded.put(doc)
+
+    def write_batch(batch):
+        start = time.perf_counter()
+        try:
+            write(batch)
+        except Exception as e:
+            stats["write"].record(time.perf_counter() - start, failed=len(batch))
+            for doc in batch:
+                report_error(doc.get("path"), "write", e)
+            return
+        stats["write"].record(time.perf_counter() - start, processed=len(batch))
+
+    def write_stage():
+        batch = []
+        while True:
+            try:
+                doc = embedded.get(timeout=flush_interval)
+            except queue.Empty:
+                # 입력이 뜸하면 모인 만큼 먼저 저장
+                if batch:
+                    write_batch(batch)
+                    batch = []
+                continue
+            if doc is _DONE:
+                break
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                write_batch(batch)
+                batch = []
+        if batch:
+            write_batch(batch)
+
+    extract_thread = threading.Thread(target=extract_stage, name="extract", daemon=True)
+    embed_threads = [
+        threading.Thread(target=embed_stage, name=f"embed-{i}", daemon=True)
+        for i in range(concurrency)
+    ]
+    write_thread = threading.Thread(target=write_stage, name="write", daemon=True)
+
+    extract_thread.start()
+    for thread in embed_threads:
+        thread.start()
+    write_thread.start()
+
+    extract_thread.join()
+    for thread in embed_threads:
+        thread.join()
+    embedded.put(_DONE)
+    write_thread.join()
+
+    return stats
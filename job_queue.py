@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv("EVAL_JOB_DB", os.path.join("cache", "jobs.sqlite"))
+
+# 작업 상태: queued → running → done / failed
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# 이 시간(초) 동안 진행 상황 갱신이 없는 running 작업은 작업자가 죽은 것으로 보고 다시 대기열에 넣음
+STALE_AFTER = int(os.getenv("EVAL_JOB_STALE_SECONDS", "300"))
+# 작업자가 죽어 다시 시도하는 최대 횟수 (넘으면 failed)
+MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    """SQLite 기반 작업 대기열
+
+    - 여러 프로세스(UI, 작업자)가 같은 파일을 열어 사용하며 WAL 모드로 읽기와 쓰기가 서로 막지 않습니다.
+    - 작업자는 `claim()`으로 가장 오래된 대기 작업을 하나씩 가져가며, 가져가기는 쓰기 잠금
+      (`BEGIN IMMEDIATE`) 안에서 이루어지므로 같은 작업을 두 작업자가 가져가지 않습니다.
+    - 진행 상황과 결과는 JSON으로 저장되어 UI가 새로고침되거나 다시 접속해도 이어서 볼 수 있습니다.
+    """
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " key TEXT,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " progress TEXT,"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " worker TEXT,"
+                " created REAL NOT NULL,"
+                " started REAL,"
+                " updated REAL,"
+                " finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created)")
+
+    def _connect(self):
+        # sqlite3 연결은 스레드 간에 공유하지 않고 스레드마다 하나씩 사용
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connect())
+
+    def submit(self, kind, payload, key=None):
+        """작업을 대기열에 넣고 작업 ID를 반환합니다.
+
+        `key`가 같은 작업이 대기 중이거나 실행 중이거나 이미 끝났으면 새로 만들지 않고 그 ID를 반환합니다
+        (실패한 작업만 다시 제출됨).
+        """
+        with self._transaction() as conn:
+            if key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status != 'failed' ORDER BY created DESC LIMIT 1",
+                    (key,)
+                ).fetchone()
+                if row is not None:
+                    return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, key, status, payload, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, key, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        logger.info(f"작업 등록: {kind} {job_id}")
+        return job_id
+
+    def get(self, job_id):
+        """작업 정보 딕셔너리 (없으면 None). payload, progress, result는 JSON을 풀어서 반환합니다."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode(row)
+
+    def find(self, key):
+        """`key`로 등록된 가장 최근 작업 (없으면 None)"""
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE key = ? ORDER BY created DESC LIMIT 1", (key,)
+        ).fetchone()
+        return _decode(row)
+
+    def position(self, job_id):
+        """대기 중인 작업 앞에 남은 대기 작업 수 (대기 중이 아니면 None)"""
+        conn = self._connect()
+        row = conn.execute("SELECT created FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (row["created"],)
+        ).fetchone()[0]
+
+    def claim(self, worker, kinds=None):
+        """가장 오래된 대기 작업 하나를 running으로 바꾸고 반환합니다 (없으면 None)."""
+        self.requeue_stale()
+        with self._transaction() as conn:
+            query = "SELECT * FROM jobs WHERE status = 'queued'"
+            params = []
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+                params.extend(kinds)
+            row = conn.execute(query + " ORDER BY created LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,"
+                " started = ?, updated = ? WHERE id = ?",
+                (worker, now, now, row["id"])
+            )
+        job = _decode(row)
+        job.update(status="running", worker=worker, attempts=row["attempts"] + 1)
+        return job
+
+    # 아래 갱신 메서드는 작업을 가져간 작업자(`worker`)가 아직 실행 중일 때만 반영되며, 반영 여부를 반환합니다.
+    # 응답이 없어 다른 작업자에게 넘어간 작업을 원래 작업자가 뒤늦게 덮어쓰지 않도록 하기 위함입니다.
+
+    def _update_owned(self, job_id, worker, assignments, params):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+                (*params, job_id, worker)
+            )
+        return cursor.rowcount > 0
+
+    def update_progress(self, job_id, worker, progress):
+        """진행 상황을 저장합니다 (작업자가 살아 있다는 표시도 겸함)."""
+        return self._update_owned(job_id, worker, "progress = ?, updated = ?",
+                                  (json.dumps(progress, ensure_ascii=False), time.time()))
+
+    def touch(self, job_id, worker):
+        """진행 상황은 그대로 두고 작업자가 살아 있다는 표시만 갱신합니다."""
+        return self._update_owned(job_id, worker, "updated = ?", (time.time(),))
+
+    def complete(self, job_id, worker, result):
+        now = time.time()
+        if not self._update_owned(job_id, worker, "status = 'done', result = ?, error = NULL, updated = ?, finished = ?",
+                                  (json.dumps(result, ensure_ascii=False), now, now)):
+            logger.warning(f"다른 작업자에게 넘어간 작업이라 결과를 저장하지 않습니다: {job_id}")
+            return False
+        logger.info(f"작업 완료: {job_id}")
+        return True
+
+    def fail(self, job_id, worker, error):
+        now = time.time()
+        if not self._update_owned(job_id, worker, "status = 'failed', error = ?, updated = ?, finished = ?",
+                                  (error, now, now)):
+            logger.warning(f"다른 작업자에게 넘어간 작업이라 실패로 기록하지 않습니다: {job_id}: {error}")
+            return False
+        logger.error(f"작업 실패: {job_id}: {error}")
+        return True
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        """진행 상황 갱신이 끊긴 running 작업을 다시 대기열에 넣거나, 재시도 한도를 넘었으면 실패 처리합니다."""
+        deadline = time.time() - stale_after
+        with self._transaction() as conn:
+            stale = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = 'running' AND updated < ?", (deadline,)
+            ).fetchall()
+            for row in stale:
+                if row["attempts"] >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+                        (f"작업자 응답 없음 ({row['attempts']}회 시도)", time.time(), row["id"])
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker = NULL, progress = NULL WHERE id = ?",
+                        (row["id"],)
+                    )
+        if stale:
+            logger.warning(f"응답 없는 작업 {len(stale)}개를 다시 처리합니다")
+        return len(stale)
+
+    def purge(self, older_than):
+        """끝난 지 `older_than`초가 지난 작업을 삭제합니다."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    def stats(self):
+        """상태별 작업 수"""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+
+class _ImmediateTransaction:
+    """쓰기 잠금을 먼저 잡는 트랜잭션 (읽은 뒤 갱신하는 사이에 다른 프로세스가 끼어들지 않음)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _decode(row):
+    if row is None:
+        return None
+    job = dict(row)
+    for field in ("payload", "progress", "result"):
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    return job
@@ -0,0 +1,228 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from clients import create_async_anthropic_client
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 요청 한도 (분당 요청 수, 분당 토큰 수)
+ANTHROPIC_RPM = int(os.getenv("ANTHROPIC_RPM", "50"))
+ANTHROPIC_TPM = int(os.getenv("ANTHROPIC_TPM", "60000"))
+
+# 재시도 설정
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 60.0
+
+
+class TokenBucket:
+    """분당 한도를 초당 속도로 채우는 토큰 버킷
+
+    여러 스레드의 이벤트 루프가 함께 쓰므로 상태 변경은 threading.Lock으로 보호하고,
+    기다리는 동안에는 잠금을 잡지 않습니다.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount):
+        """토큰을 가져오면 0, 부족하면 기다려야 하는 시간(초)을 반환합니다."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def _content_chars(content):
+    """문자열 또는 텍스트 블록 목록의 글자 수"""
+    if isinstance(content, str):
+        return len(content)
+    return sum(len(block.get("text", "")) if isinstance(block, dict) else len(str(block)) for block in content or [])
+
+
+def estimate_tokens(system, messages, max_tokens):
+    """요청 토큰 수 추정 (한국어는 대략 글자당 1토큰에 가까워 2글자당 1토큰으로 보수적으로 계산)"""
+    chars = _content_chars(system)
+    for message in messages:
+        chars += _content_chars(message.get("content", ""))
+    return chars // 2 + max_tokens
+
+
+def _retry_after(error):
+    """API 오류 응답의 retry-after 헤더(초)를 읽어옵니다."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    import anthropic
+    if isinstance(error, (anthropic.RateLimitError, anthropic.APIConnectionError)):
+        return True
+    # 529 overloaded_error 및 5xx 서버 오류
+    return isinstance(error, anthropic.APIStatusError) and error.status_code >= 500
+
+
+def _record_usage(model, message):
+    usage = getattr(message, "usage", None)
+    if usage is not None:
+        metrics.record_usage("anthropic", model, usage.input_tokens, usage.output_tokens,
+                             getattr(usage, "cache_read_input_tokens", 0),
+                             getattr(usage, "cache_creation_input_tokens", 0))
+
+
+class LLMScheduler:
+    """Claude API 호출을 분당 요청/토큰 한도 안에서 동시에 실행하는 스케줄러
+
+    - 요청 전에 요청 수/토큰 버킷에서 한도를 확보합니다 (한도 안에서는 대기 없음).
+    - 429 응답의 retry-after 동안은 모든 호출을 멈춥니다.
+    - 실제로 실패한 경우에만 지터를 준 지수 백오프로 재시도합니다.
+    """
+
+    def __init__(self, rpm=ANTHROPIC_RPM, tpm=ANTHROPIC_TPM, max_retries=MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self._paused_until = 0.0
+        self._clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    def _client(self):
+        # httpx 비동기 연결은 이벤트 루프에 묶이므로 루프마다 클라이언트를 만듦
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                # 재시도는 스케줄러가 담당
+                client = create_async_anthropic_client(max_retries=0)
+                self._clients[loop] = client
+            return client
+
+    async def _acquire(self, token_estimate):
+        start = time.perf_counter()
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            wait_time = self.requests.try_acquire(1)
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+            wait_time = self.tokens.try_acquire(token_estimate)
+            if wait_time > 0:
+                self.requests.refund(1)
+                await asyncio.sleep(wait_time)
+                continue
+            waited = time.perf_counter() - start
+            if waited > 0.001:
+                metrics.observe("anthropic.rate_limit_wait", waited)
+            return
+
+    def _backoff(self, error, attempt):
+        import anthropic
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            if isinstance(error, anthropic.RateLimitError):
+                # 다른 호출도 같은 한도에 걸리므로 함께 멈춤
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after
+        delay = min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+        return delay * random.uniform(0.5, 1.5)
+
+    async def create(self, **kwargs):
+        """messages.create와 같은 인자로 호출하고 응답 메시지를 반환합니다."""
+        token_estimate = estimate_tokens(kwargs.get("system"), kwargs.get("messages", []),
+                                         kwargs.get("max_tokens", 0))
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(token_estimate)
+            metrics.incr("api_calls", api="anthropic")
+            try:
+                with metrics.span("anthropic.messages", model=kwargs.get("model")):
+                    message = await self._client().messages.create(**kwargs)
+                _record_usage(kwargs.get("model"), message)
+                return message
+            except Exception as e:
+                if not _is_retryable(e) or attempt == self.max_retries:
+                    metrics.incr("api_errors", api="anthropic", error=type(e).__name__)
+                    logger.error(f"Claude API 호출 중 오류 발생: {e}")
+                    raise
+                metrics.incr("api_retries", api="anthropic", error=type(e).__name__)
+                wait_time = self._backoff(e, attempt)
+                logger.warning(f"API 오류 발생. {wait_time:.1f}초 후 재시도... "
+                               f"(시도 {attempt + 1}/{self.max_retries}): {e}")
+                await asyncio.sleep(wait_time)
+
+    async def stream(self, on_text=None, **kwargs):
+        """messages.stream으로 호출하여 생성되는 텍스트 조각을 `on_text(delta)`로 넘기고
+        전체 텍스트를 반환합니다.
+
+        아직 아무 텍스트도 넘기지 않은 상태에서 실패한 경우에만 재시도합니다.
+        """
+        token_estimate = estimate_tokens(kwargs.get("system"), kwargs.get("messages", []),
+                                         kwargs.get("max_tokens", 0))
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(token_estimate)
+            started = time.perf_counter()
+            parts = []
+            metrics.incr("api_calls", api="anthropic")
+            try:
+                with metrics.span("anthropic.stream", model=kwargs.get("model")):
+                    async with self._client().messages.stream(**kwargs) as stream:
+                        async for text in stream.text_stream:
+                            if not parts:
+                                metrics.observe("anthropic.first_token", time.perf_counter() - started,
+                                                model=kwargs.get("model"))
+                            parts.append(text)
+                            if on_text is not None:
+                                on_text(text)
+                        if metrics.enabled():
+                            _record_usage(kwargs.get("model"), await stream.get_final_message())
+                return "".join(parts)
+            except Exception as e:
+                if parts or not _is_retryable(e) or attempt == self.max_retries:
+                    metrics.incr("api_errors", api="anthropic", error=type(e).__name__)
+                    logger.error(f"Claude API 스트리밍 중 오류 발생: {e}")
+                    raise
+                metrics.incr("api_retries", api="anthropic", error=type(e).__name__)
+                wait_time = self._backoff(e, attempt)
+                logger.warning(f"API 오류 발생. {wait_time:.1f}초 후 재시도... "
+                               f"(시도 {attempt + 1}/{self.max_retries}): {e}")
+                await asyncio.sleep(wait_time)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """프로세스 전체에서 공유하는 LLM 스케줄러"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
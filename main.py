@@ -1,98 +1,201 @@
 import streamlit as st
 import os
-import uuid
 import logging
 import asyncio
 import time
-from dotenv import load_dotenv
+import hashlib
+import threading
+from collections import OrderedDict
 from pdf_utils import extract_text_from_pdf
-from embedding import get_embedding
+from embedding import get_embeddings
 from paper_db import search_similar_papers, get_paper_count
-from ai_eval import generate_paper_feedback
-import anthropic
-
-# log 디렉토리 생성
-log_dir = "log"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, 'app.log')),
-        logging.StreamHandler()
-    ]
-)
+from ai_eval import reference_papers, run_evaluation, EVAL_MODE
+from summarizer import SUMMARY_SYSTEM_PROMPT
+from clients import setup_logging
+from job_queue import JobQueue
+from eval_worker import EVALUATION_JOB, start_workers
+import metrics
+
+# 로깅 설정 (앱 전체에서 한 번)
+setup_logging('app.log')
+metrics.setup_from_env()
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-# Anthropic Claude API 설정
-client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-
-# 요약 결과를 캐싱하기 위한 딕셔너리
-summary_cache = {}
-
-async def summarize_with_claude(text, system_prompt, paper_id):
-    """비동기로 텍스트를 요약하는 함수"""
-    # 캐시된 결과가 있으면 반환
-    if paper_id in summary_cache:
-        logger.info(f"캐시된 요약 결과 사용: {paper_id}")
-        return summary_cache[paper_id]
-
-    logger.info(f"Claude API를 사용하여 텍스트 요약 시작: {paper_id}")
-    max_retries = 3
-    retry_delay = 5  # 초기 대기 시간 5초
-
-    for attempt in range(max_retries):
-        try:
-            # API 호출 전 딜레이 추가 (점진적으로 증가)
-            await asyncio.sleep(retry_delay * (attempt + 1))
-            
-            message = client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1000,
-                temperature=0.3,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"논문 내용:\n{text}"
-                    }
-                ]
-            )
-            
-            # 결과를 캐시에 저장
-            summary_cache[paper_id] = message.content[0].text
-            logger.info(f"텍스트 요약 완료: {paper_id}")
-            return message.content[0].text
-
-        except Exception as e:
-            if attempt < max_retries - 1:
-                if "overloaded_error" in str(e) or "rate_limit_error" in str(e):
-                    wait_time = retry_delay * (attempt + 1) * 2  # 대기 시간을 2배로 증가
-                    logger.warning(f"API 오류 발생. {wait_time}초 후 재시도... (시도 {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                    continue
-            logger.error(f"Claude API 호출 중 오류 발생: {e}")
-            raise e
-
-async def process_papers(similar_papers, summary_system_prompt):
-    """여러 논문을 순차적으로 처리하는 함수"""
-    results = []
-    for paper in similar_papers:
-        paper_path = os.path.join("data/papers", paper['source'])
-        if os.path.exists(paper_path):
-            paper_text = extract_text_from_pdf(paper_path)
-            # 각 논문을 순차적으로 처리
-            result = await summarize_with_claude(paper_text, summary_system_prompt, paper['source'])
-            results.append(result)
-            # 논문 간 처리 간격 추가
-            await asyncio.sleep(5)
-    
-    return results
+class StreamingMarkdown:
+    """스트리밍되는 텍스트 조각을 Streamlit 플레이스홀더에 이어 붙여 표시
+
+    너무 잦은 갱신을 피하기 위해 `min_interval`초마다 다시 그리며, 마지막 내용은 `flush()`로 표시합니다.
+    """
+
+    def __init__(self, placeholder, min_interval=0.05, **markdown_kwargs):
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.markdown_kwargs = markdown_kwargs
+        self.text = ""
+        self._rendered_at = 0.0
+
+    def __call__(self, delta):
+        self.text += delta
+        if time.monotonic() - self._rendered_at >= self.min_interval:
+            self.flush()
+
+    def flush(self):
+        self.placeholder.markdown(self.text, **self.markdown_kwargs)
+        self._rendered_at = time.monotonic()
+
+# 업로드 파일 해시별로 분석/평가 결과를 보관할 최대 개수
+UPLOAD_CACHE_SIZE = int(os.getenv("UPLOAD_CACHE_SIZE", "32"))
+
+# 평가 실행 방식
+# - "inline": 스크립트 실행 중에 바로 평가 (세션이 끝날 때까지 대기)
+# - "queue": 작업 대기열에 넣고 작업자 프로세스가 처리 (UI는 진행 상황만 주기적으로 조회)
+EVAL_JOB_MODE = os.getenv("EVAL_JOB_MODE", "inline")
+# queue 모드에서 앱이 직접 띄우는 작업자 프로세스 수 (0이면 `python eval_worker.py`로 따로 실행)
+EVAL_JOB_WORKERS = int(os.getenv("EVAL_JOB_WORKERS", "2"))
+# 작업 진행 상황 조회 간격 (초)
+JOB_POLL_INTERVAL = 1.0
+
+class BoundedCache:
+    """최근 사용한 항목을 최대 `max_entries`개까지 보관하는 LRU 캐시 (여러 세션이 공유)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+@st.cache_resource
+def get_evaluation_cache():
+    """업로드 파일 해시와 참고 논문 ID별 평가 결과 캐시"""
+    return BoundedCache(UPLOAD_CACHE_SIZE)
+
+@st.cache_resource
+def get_job_queue():
+    """평가 작업 대기열 (앱 서버 프로세스에서 한 번만 작업자 프로세스를 시작)"""
+    queue = JobQueue()
+    if EVAL_JOB_WORKERS > 0:
+        start_workers(EVAL_JOB_WORKERS, queue.path)
+    return queue
+
+@st.cache_data(max_entries=UPLOAD_CACHE_SIZE, show_spinner="업로드한 논문 분석 중...")
+def analyze_upload(file_hash, paper_count, _file_bytes):
+    """업로드된 PDF의 텍스트 추출 → 임베딩 → 유사 논문 검색 결과를 반환
+
+    결과는 `file_hash`와 `paper_count`를 키로 캐시되므로 Streamlit이 스크립트를 다시
+    실행하거나 같은 파일을 다시 올려도 파싱과 임베딩 API 호출을 반복하지 않습니다.
+    텍스트를 추출할 수 없으면 None을 반환합니다.
+    """
+    # 임시 파일 없이 메모리의 bytes에서 바로 추출
+    logger.info("PDF에서 텍스트 추출 시작")
+    with metrics.span("upload.extract"):
+        user_text = extract_text_from_pdf(_file_bytes)
+    logger.info("텍스트 추출 완료")
+
+    logger.info("텍스트 임베딩 생성 시작")
+    with metrics.span("upload.embed"):
+        user_embedding = get_embeddings([user_text])[0]
+    if user_embedding is None:
+        return None
+    logger.info("임베딩 생성 완료")
+
+    logger.info("유사 논문 검색 시작")
+    with metrics.span("upload.search"):
+        results = search_similar_papers(user_embedding, top_n=3)
+    logger.info("유사 논문 검색 완료")
+
+    return {
+        "text": user_text,
+        "embedding": user_embedding,
+        "similar_papers": list(results["metadatas"][0]),
+        "distances": list(results["distances"][0]),
+    }
+
+def evaluation_layout(papers):
+    """요약, 참고 논문별 개선 제안, 최종 평가가 채워질 영역을 만들고 스트림을 반환"""
+    st.subheader("유사 논문 요약")
+    summary_streams = []
+    for i, paper in enumerate(papers):
+        with st.expander(f"논문 {i+1} 요약", expanded=True):
+            summary_streams.append(StreamingMarkdown(st.empty()))
+
+    evaluation_streams = []
+    # 통합 평가는 참고 논문별 제안이 최종 결과 안에 함께 나옴
+    if EVAL_MODE != "combined":
+        st.subheader("참고 논문별 개선 제안")
+        for i, paper in enumerate(papers):
+            with st.expander(f"논문 {i+1} 기반 개선 제안"):
+                evaluation_streams.append(StreamingMarkdown(st.empty()))
+
+    st.subheader("AI 평가 및 개선 제안 결과")
+    final_stream = StreamingMarkdown(st.empty(), unsafe_allow_html=True)
+    return summary_streams, evaluation_streams, final_stream
+
+def show_texts(streams, texts):
+    """스트림 영역의 내용을 `texts`로 바꿔 표시"""
+    for stream, text in zip(streams, texts):
+        if text != stream.text:
+            stream.text = text
+            stream.flush()
+
+def job_status_text(queue, job, count):
+    if job["status"] == "queued":
+        return f"대기 중 (앞에 {queue.position(job['id']) or 0}개 작업)"
+    progress = job["progress"] or {}
+    stage = progress.get("stage", "summaries")
+    if stage == "summaries":
+        return f"요약 생성 중 ({progress.get('summaries_done', 0)}/{count})"
+    if stage == "evaluations":
+        return "참고 논문별 평가 중"
+    return "최종 평가 생성 중"
+
+def follow_job(queue, job, papers):
+    """작업이 끝날 때까지 진행 상황을 주기적으로 조회해 표시하고 마지막 작업 정보를 반환
+
+    평가는 작업자 프로세스에서 실행되므로 페이지를 새로고침하거나 다시 접속해도 작업은 계속됩니다.
+    """
+    status = st.empty()
+    summary_streams, evaluation_streams, final_stream = evaluation_layout(papers)
+    while True:
+        job = queue.get(job["id"])
+        if job["status"] == "done":
+            result = job["result"]
+            show_texts(summary_streams, result["summaries"])
+            show_texts(evaluation_streams, result["evaluations"])
+            show_texts([final_stream], [result["feedback"]])
+            status.empty()
+            return job
+        if job["status"] == "failed":
+            status.error(f"평가 작업이 실패했습니다: {job['error']}")
+            return job
+        progress = job["progress"] or {}
+        show_texts(summary_streams, progress.get("summaries", []))
+        show_texts(evaluation_streams, progress.get("evaluations", []))
+        show_texts([final_stream], [progress.get("final", "")])
+        status.info(f"⏳ {job_status_text(queue, job, len(papers))}")
+        time.sleep(JOB_POLL_INTERVAL)
+
+def evaluation_caption(timings):
+    st.caption(
+        f"요약 {timings['summaries']:.1f}초 · 개별 평가 {timings['evaluations']:.1f}초 · "
+        f"최종 평가 {timings['final']:.1f}초 (시작 시점 기준 완료 시각)"
+    )
 
 st.set_page_config(page_title="논문 RAG 평가", page_icon=":books:")
 st.title("논문 PDF 임베딩 및 유사 논문 검색")
@@ -119,69 +222,82 @@ else:
 st.header("1. 유사 논문 검색 및 AI 평가")
 search_file = st.file_uploader("유사도 검색 및 평가용 논문 PDF 업로드", type=["pdf"], key="search")
 if search_file is not None:
-    logger.info("새로운 PDF 파일 업로드 감지")
-    temp_path = f"temp_{uuid.uuid4()}.pdf"
-    with open(temp_path, "wb") as f:
-        f.write(search_file.read())
-    logger.info(f"임시 파일 생성 완료: {temp_path}")
-    
-    logger.info("PDF에서 텍스트 추출 시작")
-    user_text = extract_text_from_pdf(temp_path)
-    logger.info("텍스트 추출 완료")
-    
-    logger.info("텍스트 임베딩 생성 시작")
-    user_embedding = get_embedding(user_text)
-    logger.info("임베딩 생성 완료")
-    
-    logger.info("유사 논문 검색 시작")
-    results = search_similar_papers(user_embedding, top_n=3)
-    logger.info("유사 논문 검색 완료")
-    
-    similar_papers = []
+    file_bytes = search_file.getvalue()
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    logger.info(f"PDF 파일 업로드: {search_file.name} ({file_hash[:12]})")
+
+    # 같은 파일은 다시 파싱/임베딩하지 않음 (DB 논문 수가 바뀌면 다시 검색)
+    analysis = analyze_upload(file_hash, paper_count, file_bytes)
+    if analysis is None:
+        st.error("PDF에서 텍스트를 추출할 수 없습니다. 텍스트가 포함된 PDF를 업로드해주세요.")
+        st.stop()
+    user_text = analysis["text"]
+    similar_papers = analysis["similar_papers"]
+
     st.markdown("# 유사 논문 상위 3개")
-    file_list = []
-    for i, (meta, dist) in enumerate(zip(results["metadatas"][0], results["distances"][0])):
-        logger.info(f"유사 논문 {i+1} 처리 중: {meta['title']}")
-        file_list.append(meta['source'])
-        similar_papers.append(meta)
-    
-    for file in file_list:
-        st.markdown(f"- {file}")
-    
+    for paper in similar_papers:
+        st.markdown(f"- {paper['source']}")
+
     st.markdown("---")
-    
-    os.remove(temp_path)
-    logger.info(f"임시 파일 삭제 완료: {temp_path}")
 
     st.header("2. 생성형 AI 논문 평가 및 개선 제안")
-    if st.button("AI 평가 및 개선 제안 받기"):
+    papers = reference_papers(similar_papers)
+    evaluation_cache = get_evaluation_cache()
+    evaluation_key = (file_hash, tuple(paper['id'] for paper in papers))
+    evaluation = evaluation_cache.get(evaluation_key)
+
+    if EVAL_JOB_MODE == "queue":
+        job_queue = get_job_queue()
+        job_key = f"{file_hash}:{','.join(evaluation_key[1])}"
+        job = job_queue.find(job_key)
+        if job is not None and job["status"] == "failed":
+            st.error(f"이전 평가 작업이 실패했습니다: {job['error']}")
+            job = None
+        if job is None and st.button("AI 평가 및 개선 제안 받기"):
+            logger.info("AI 평가 작업 등록")
+            job_id = job_queue.submit(EVALUATION_JOB, {"user_text": user_text, "papers": papers}, key=job_key)
+            job = job_queue.get(job_id)
+        if job is not None:
+            job = follow_job(job_queue, job, papers)
+            if job["status"] == "done":
+                evaluation_caption(job["result"]["timings"])
+    elif evaluation is not None:
+        logger.info("저장된 평가 결과 사용")
+        summary_streams, evaluation_streams, final_stream = evaluation_layout(papers)
+        for stream, text in zip(summary_streams, evaluation["summaries"]):
+            stream(text)
+        for stream, text in zip(evaluation_streams, evaluation["evaluations"]):
+            stream(text)
+        final_stream(evaluation["feedback"])
+        for stream in summary_streams + evaluation_streams + [final_stream]:
+            stream.flush()
+        st.caption("이전에 생성된 평가 결과입니다.")
+        if st.button("다시 평가"):
+            logger.info("저장된 평가 결과 삭제 후 다시 평가")
+            evaluation_cache.delete(evaluation_key)
+            # 다시 실행된 스크립트에서 버튼을 한 번 더 누르지 않아도 바로 평가 시작
+            st.session_state["reevaluate"] = evaluation_key
+            st.rerun()
+    elif st.session_state.pop("reevaluate", None) == evaluation_key or st.button("AI 평가 및 개선 제안 받기"):
         logger.info("AI 평가 프로세스 시작")
+        summary_streams, evaluation_streams, final_stream = evaluation_layout(papers)
+
         with st.spinner("생성형 AI 평가 중..."):
-            similar_papers_text = []
-            summarized_papers = []
-            
-            # 요약을 위한 시스템 프롬프트
-            summary_system_prompt = """
-            # 지시문
-            제시되는 학위 논문의 내용과 구조를 **짧게요약**하여 핵심만 추출하는것이 너의 역할이다. 
-
-            # 제약조건
-            - 논문의 구조를 파악하여, 전체 카테고리, 각 카테고리의 주된 서술을 추출한다..
-            - 마크다운을 적극활용하며 **질문과 답변의 핵심 내용만 짧게 추출한다**
-            - 내용 추출 시, 부가 설명은 최소화하고, 학위 논문의 핵심 요소를 드러낼 수 있도록 한다.
-            - 부연설명은하지않는다.
-            """
-            
-            # 비동기로 논문 처리
-            summarized_papers = asyncio.run(process_papers(similar_papers, summary_system_prompt))
-            
-            # 각 논문에 대한 요약 표시
-            st.subheader("유사 논문 요약")
-            for i, summary in enumerate(summarized_papers):
-                with st.expander(f"논문 {i+1} 요약"):
-                    st.markdown(summary)
-            
-            # AI 평가 및 개선 제안
-            feedback = asyncio.run(generate_paper_feedback(user_text, summarized_papers))
-            st.subheader("AI 평가 및 개선 제안 결과")
-            st.markdown(feedback, unsafe_allow_html=True) 
\ No newline at end of file
+            # 요약 → 개별 평가 → 최종 평가를 하나의 이벤트 루프에서 처리
+            summarized_papers, evaluations, feedback, timings = asyncio.run(
+                run_evaluation(user_text, papers, SUMMARY_SYSTEM_PROMPT,
+                               summary_streams, evaluation_streams, final_stream)
+            )
+
+        for stream in summary_streams + evaluation_streams + [final_stream]:
+            stream.flush()
+        evaluation_caption(timings)
+        evaluation_cache.set(evaluation_key, {
+            "summaries": summarized_papers,
+            "evaluations": evaluations,
+            "feedback": feedback,
+        })
+
+if metrics.enabled():
+    with st.sidebar.expander("구간별 소요 시간 및 사용량"):
+        st.code(metrics.summary() or "아직 기록된 항목이 없습니다.")
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import functools
+
+logger = logging.getLogger(__name__)
+
+# 계측 설정
+# - PAPER_METRICS=1: 계측 사용 (기본값: 사용 안 함, 이때 span/incr는 거의 비용이 없음)
+# - PAPER_METRICS_JSONL: 구간/카운터 이벤트를 JSON Lines로 기록할 파일 (지정하면 계측 사용)
+# - PAPER_METRICS_PORT: Prometheus 텍스트 형식(/metrics)을 제공할 포트
+METRICS_JSONL_PATH = os.getenv("PAPER_METRICS_JSONL")
+METRICS_PORT = os.getenv("PAPER_METRICS_PORT")
+
+# 모델별 100만 토큰당 가격 (USD, 입력/출력)
+MODEL_PRICES = {
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+_enabled = os.getenv("PAPER_METRICS", "0") not in ("", "0") or bool(METRICS_JSONL_PATH)
+_lock = threading.Lock()
+# (이름, 레이블) → [호출 수, 합계(초), 최대(초)]
+_spans = {}
+# (이름, 레이블) → 누적값
+_counters = {}
+_jsonl_file = None
+_http_server = None
+
+
+def enabled():
+    return _enabled
+
+
+def enable(jsonl_path=None):
+    """계측을 켭니다. `jsonl_path`를 지정하면 이벤트를 파일에도 기록합니다."""
+    global _enabled, METRICS_JSONL_PATH, _jsonl_file
+    with _lock:
+        _enabled = True
+        if jsonl_path and jsonl_path != METRICS_JSONL_PATH:
+            if _jsonl_file is not None:
+                _jsonl_file.close()
+                _jsonl_file = None
+            METRICS_JSONL_PATH = jsonl_path
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _write_event(event):
+    global _jsonl_file
+    if not METRICS_JSONL_PATH:
+        return
+    line = json.dumps(event, ensure_ascii=False) + "\n"
+    with _lock:
+        if _jsonl_file is None:
+            os.makedirs(os.path.dirname(METRICS_JSONL_PATH) or ".", exist_ok=True)
+            # 여러 프로세스(추출 프로세스 풀 등)가 같은 파일에 줄 단위로 덧붙임
+            _jsonl_file = open(METRICS_JSONL_PATH, "a", encoding="utf-8", buffering=1)
+        _jsonl_file.write(line)
+
+
+def observe(name, seconds, **labels):
+    """이미 측정한 소요 시간을 구간 통계에 더합니다."""
+    if not _enabled:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        stat = _spans.get(key)
+        if stat is None:
+            _spans[key] = [1, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+    _write_event({"ts": time.time(), "type": "span", "name": name, "seconds": seconds,
+                  "labels": labels, "pid": os.getpid()})
+
+
+def incr(name, value=1, **labels):
+    """카운터를 `value`만큼 증가시킵니다."""
+    if not _enabled or not value:
+        return
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    _write_event({"ts": time.time(), "type": "counter", "name": name, "value": value,
+                  "labels": labels, "pid": os.getpid()})
+
+
+def record_usage(api, model, input_tokens=0, output_tokens=0, cache_read_tokens=0, cache_write_tokens=0):
+    """API 호출 한 번의 토큰 사용량과 예상 비용을 기록합니다.
+
+    프롬프트 캐시에서 읽은 토큰은 입력 가격의 10%, 캐시에 쓴 토큰은 125%로 계산합니다.
+    """
+    if not _enabled:
+        return
+    incr("tokens_in", input_tokens or 0, api=api, model=model)
+    incr("tokens_out", output_tokens or 0, api=api, model=model)
+    incr("tokens_cache_read", cache_read_tokens or 0, api=api, model=model)
+    incr("tokens_cache_write", cache_write_tokens or 0, api=api, model=model)
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    billed_input = (input_tokens or 0) + 0.1 * (cache_read_tokens or 0) + 1.25 * (cache_write_tokens or 0)
+    incr("cost_usd", (billed_input * input_price + (output_tokens or 0) * output_price) / 1_000_000,
+         api=api, model=model)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = self.labels
+        if exc_type is not None:
+            labels = dict(labels, error=exc_type.__name__)
+        observe(self.name, time.perf_counter() - self.start, **labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **labels):
+    """`with span("embedding.request"):` 형태로 구간 소요 시간을 기록합니다."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+
+def timed(name, **labels):
+    """함수 전체를 구간으로 기록하는 데코레이터 (async 함수도 지원)"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with _Span(name, labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """현재까지의 구간 통계와 카운터"""
+    with _lock:
+        spans = [
+            {"name": name, "labels": dict(labels), "count": count, "seconds": total, "max_seconds": peak}
+            for (name, labels), (count, total, peak) in _spans.items()
+        ]
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in _counters.items()
+        ]
+    return {"spans": spans, "counters": counters}
+
+
+def summary():
+    """구간별 호출 수와 소요 시간, 카운터를 사람이 읽기 좋은 여러 줄 문자열로 반환"""
+    data = snapshot()
+    lines = []
+    for item in sorted(data["spans"], key=lambda item: -item["seconds"]):
+        labels = ",".join(f"{k}={v}" for k, v in item["labels"].items())
+        lines.append(f"{item['name']:<24} {labels:<28} {item['count']:>6}회 | 합계 {item['seconds']:8.2f}초 | "
+                     f"평균 {item['seconds'] / item['count'] * 1000:8.1f}ms | 최대 {item['max_seconds'] * 1000:8.1f}ms")
+    for item in sorted(data["counters"], key=lambda item: item["name"]):
+        labels = ",".join(f"{k}={v}" for k, v in item["labels"].items())
+        value = f"{item['value']:.4f}" if isinstance(item["value"], float) else str(item["value"])
+        lines.append(f"{item['name']:<24} {labels:<28} {value}")
+    return "\n".join(lines)
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _prometheus_name(name):
+    return "paper_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def render_prometheus():
+    """Prometheus 텍스트 노출 형식"""
+    data = snapshot()
+    lines = ["# TYPE paper_span_seconds summary"]
+    for item in data["spans"]:
+        labels = _prometheus_labels({"span": item["name"], **item["labels"]})
+        lines.append(f"paper_span_seconds_count{labels} {item['count']}")
+        lines.append(f"paper_span_seconds_sum{labels} {item['seconds']}")
+    lines.append("# TYPE paper_span_seconds_max gauge")
+    for item in data["spans"]:
+        labels = _prometheus_labels({"span": item["name"], **item["labels"]})
+        lines.append(f"paper_span_seconds_max{labels} {item['max_seconds']}")
+    declared = set()
+    for item in sorted(data["counters"], key=lambda item: item["name"]):
+        name = _prometheus_name(item["name"]) + "_total"
+        if name not in declared:
+            lines.append(f"# TYPE {name} counter")
+            declared.add(name)
+        lines.append(f"{name}{_prometheus_labels(item['labels'])} {item['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """`/metrics`로 Prometheus 형식을 제공하는 서버를 백그라운드 스레드에서 시작합니다 (프로세스당 한 번)."""
+    global _http_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("content-type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with _lock:
+        if _http_server is not None:
+            return _http_server
+        _http_server = ThreadingHTTPServer((host, int(port)), Handler)
+        _http_server.daemon_threads = True
+    threading.Thread(target=_http_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Prometheus 메트릭 제공 시작: http://{host}:{port}/metrics")
+    return _http_server
+
+
+def setup_from_env():
+    """환경 변수에 따라 Prometheus 엔드포인트를 시작합니다 (진입점에서 호출)."""
+    if METRICS_PORT:
+        enable()
+        try:
+            start_http_server(METRICS_PORT)
+        except OSError as e:
+            logger.warning(f"메트릭 서버 시작 실패 (포트 {METRICS_PORT}): {e}")
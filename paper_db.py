@@ -1,59 +1,474 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import os
+import uuid
 import logging
+import threading
+import numpy as np
+from clients import get_chroma_client, persist_directory
+from embedding import get_embedder
+from vector_index import VectorIndex, VectorIndexWriter, current_generation, space_distances
+import metrics
 
-# log 디렉토리 생성
-log_dir = "log"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, 'paper_db.log')),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-persist_directory = 'chromadb_data'
-os.makedirs(persist_directory, exist_ok=True)
+COLLECTION_NAME = "papers"
+CHUNK_COLLECTION_NAME = "paper_chunks"
+REDUCED_COLLECTION_NAME = "papers_reduced"
 
-# OpenAI 임베딩 함수 설정
-embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model_name="text-embedding-3-small"
-)
+# 인덱스 모드
+# - "paper": 논문당 평균 임베딩 하나로 검색
+# - "chunk": 청크 임베딩을 따로 저장하고 검색 결과를 논문 단위로 묶음
+# - "reduced": 앞쪽 차원만 남긴 임베딩으로 후보를 찾고 papers 컬렉션의 전체 임베딩으로 재순위화
+INDEX_MODE = os.getenv("PAPER_INDEX_MODE", "paper")
 
-client = chromadb.PersistentClient(path=persist_directory)
+# reduced 모드 설정: 후보 검색에 쓰는 차원 수와 재순위화할 후보 수
+REDUCED_DIM = int(os.getenv("PAPER_REDUCED_DIM", "256"))
+RERANK_CANDIDATES = int(os.getenv("PAPER_RERANK_CANDIDATES", "50"))
 
-COLLECTION_NAME = "papers"
+# 청크 모드에서 논문 점수를 내는 방법 ("max" 또는 "mean": 상위 k개 청크 유사도 평균)
+CHUNK_AGGREGATE = os.getenv("PAPER_CHUNK_AGGREGATE", "max")
+CHUNK_TOP_K = 3
+# 논문 top_n개를 찾기 위해 조회하는 청크 수 배율
+CHUNK_OVERSAMPLE = 10
+
+# 검색 백엔드 (논문 모드에만 적용, 청크 모드는 항상 ChromaDB)
+# - "chroma": ChromaDB 컬렉션에 질의
+# - "numpy": papers 컬렉션을 내보낸 메모리 매핑 벡터 인덱스(vector_index.py)에서 검색
+SEARCH_BACKEND = os.getenv("PAPER_SEARCH_BACKEND", "chroma")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+# 후보 검색에 쓰는 행렬 형식 ("float32", "float16", "int8")
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "float32")
+# 양자화 인덱스에서 float32 원본으로 다시 계산하는 후보 수 배율
+VECTOR_INDEX_RERANK = 10
+
+# 한 번에 DB에 쓰는 최대 논문 수
+WRITE_BATCH_SIZE = 256
+
+# 프로세스당 한 번만 만드는 컬렉션 핸들
+_collections = {}
+_collection_lock = threading.Lock()
+
+# (세대 이름, VectorIndex)
+_vector_index = None
+_vector_index_lock = threading.Lock()
+
+def get_client():
+    """ChromaDB 클라이언트 (처음 사용할 때 연결)"""
+    return get_chroma_client(persist_directory)
+
+def _stored_dimension(collection):
+    """컬렉션에 저장된 임베딩의 차원 (비어 있으면 None)"""
+    result = collection.get(limit=1, include=["embeddings"])
+    embeddings = result.get("embeddings")
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    return len(embeddings[0])
+
+def _embedder_mismatch(name, metadata, embedder):
+    """저장된 백엔드 정보가 현재 임베딩 백엔드와 다르면 ValueError를 냅니다."""
+    expected = {key: value for key, value in embedder.collection_metadata().items() if value is not None}
+    stored = {key: metadata.get(key) for key in expected}
+    if stored != expected:
+        raise ValueError(
+            f"'{name}'은 다른 임베딩 백엔드로 만들어졌습니다 "
+            f"(저장됨: {metadata.get('embedder')}:{metadata.get('embedding_model')}:"
+            f"{metadata.get('embedding_dim')}, 현재: {embedder.signature}). "
+            f"EMBEDDING_BACKEND 설정을 확인하거나 CHROMA_PERSIST_DIR을 따로 지정해주세요."
+        )
+
+def _check_embedder(collection):
+    """컬렉션이 현재 임베딩 백엔드로 만든 것인지 확인하고, 처음 쓰는 컬렉션에는 백엔드 정보를 기록합니다.
+
+    다른 백엔드/모델/차원의 벡터가 섞이면 검색 결과가 의미 없어지므로 ValueError를 냅니다.
+    백엔드 정보가 없는 기존 컬렉션은 비어 있거나 OpenAI 임베딩(도입 이전 기본값)이면 그대로 사용합니다.
+    """
+    embedder = get_embedder()
+    metadata = dict(collection.metadata or {})
+    if "embedder" in metadata:
+        _embedder_mismatch(f"컬렉션 {collection.name}", metadata, embedder)
+        return
+    if collection.count():
+        dimension = _stored_dimension(collection)
+        if embedder.name != "openai" or (embedder.dimension and dimension != embedder.dimension):
+            raise ValueError(
+                f"컬렉션 '{collection.name}'에는 OpenAI 임베딩이 저장되어 있습니다 ({dimension}차원, "
+                f"현재: {embedder.signature}). 다른 백엔드를 쓰려면 CHROMA_PERSIST_DIR을 따로 지정해주세요."
+            )
+    # hnsw:space는 생성 후 바꿀 수 없으므로 빼고 기록 (거리 설정은 그대로 유지됨)
+    metadata.pop("hnsw:space", None)
+    metadata.update({key: value for key, value in embedder.collection_metadata().items() if value is not None})
+    collection.modify(metadata=metadata)
+    logger.info(f"컬렉션 '{collection.name}'에 임베딩 백엔드 기록: {embedder.signature}")
+
+def _get_cached_collection(name, **kwargs):
+    collection = _collections.get(name)
+    if collection is not None:
+        return collection
+    with _collection_lock:
+        if name not in _collections:
+            logger.info(f"ChromaDB 컬렉션 접근 시도: {name}")
+            # 저장/검색 모두 미리 계산한 임베딩을 사용하므로 임베딩 함수를 연결하지 않음
+            collection = get_client().get_or_create_collection(name, embedding_function=None, **kwargs)
+            _check_embedder(collection)
+            _collections[name] = collection
+            logger.info(f"컬렉션 '{name}' 사용")
+    return _collections[name]
+
+def _collection_exists(name):
+    """컬렉션이 이미 있는지 (없어도 새로 만들지 않음)"""
+    if name in _collections:
+        return True
+    return any(getattr(collection, "name", collection) == name for collection in get_client().list_collections())
 
 def get_collection():
-    logger.info("ChromaDB 컬렉션 접근 시도")
-    if COLLECTION_NAME in [c.name for c in client.list_collections()]:
-        logger.info(f"기존 컬렉션 '{COLLECTION_NAME}' 사용")
-        return client.get_collection(COLLECTION_NAME, embedding_function=embedding_function)
-    else:
-        logger.info(f"새로운 컬렉션 '{COLLECTION_NAME}' 생성")
-        return client.create_collection(COLLECTION_NAME, embedding_function=embedding_function)
+    return _get_cached_collection(COLLECTION_NAME)
+
+def get_chunk_collection():
+    """청크 임베딩 컬렉션 (코사인 거리 사용)"""
+    return _get_cached_collection(CHUNK_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+
+def reduce_embeddings(embeddings, dim=None):
+    """앞쪽 `dim`개 차원만 남기고 다시 L2 정규화합니다.
+
+    text-embedding-3 계열은 앞쪽 차원에 정보가 몰리도록 학습되어 잘라 써도 순위가 크게 바뀌지 않습니다.
+    """
+    matrix = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))[:, :dim or REDUCED_DIM]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def get_reduced_collection():
+    """reduced 모드의 후보 검색 컬렉션 (코사인 거리, 차원 설정이 바뀌면 비우고 다시 만듦)"""
+    collection = _get_cached_collection(REDUCED_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    if (collection.metadata or {}).get("reduced_dim") == REDUCED_DIM:
+        return collection
+    with _collection_lock:
+        stored = (collection.metadata or {}).get("reduced_dim")
+        if stored is not None and stored != REDUCED_DIM and collection.count():
+            logger.warning(f"후보 검색 차원이 바뀌어 컬렉션을 다시 만듭니다 ({stored} → {REDUCED_DIM})")
+            get_client().delete_collection(REDUCED_COLLECTION_NAME)
+            _collections.pop(REDUCED_COLLECTION_NAME, None)
+    collection = _get_cached_collection(REDUCED_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    metadata = dict(collection.metadata or {})
+    metadata.pop("hnsw:space", None)
+    metadata["reduced_dim"] = REDUCED_DIM
+    collection.modify(metadata=metadata)
+    return collection
+
+def _stored_metadata(name):
+    """다른 프로세스가 바꾼 내용도 보이도록 캐시된 핸들 대신 DB에서 컬렉션 메타데이터를 다시 읽음"""
+    return dict(get_client().get_collection(name, embedding_function=None).metadata or {})
+
+def _update_metadata(name, **values):
+    metadata = _stored_metadata(name)
+    metadata.pop("hnsw:space", None)
+    metadata.update(values)
+    get_client().get_collection(name, embedding_function=None).modify(metadata=metadata)
+
+def _mark_papers_changed():
+    """papers 컬렉션이 바뀌었음을 새 변경 표시로 기록하고 그 값을 반환합니다.
+
+    개수가 같은 교체(삭제 후 추가)도 reduced 컬렉션이 다음 검색 때 알아챌 수 있도록
+    논문을 추가하거나 삭제한 뒤에 호출합니다.
+    """
+    revision = uuid.uuid4().hex
+    _update_metadata(COLLECTION_NAME, revision=revision)
+    return revision
+
+@metrics.timed("chroma.sync_reduced")
+def sync_reduced_collection(batch_size=5000):
+    """papers 컬렉션에 맞춰 reduced 컬렉션에 빠진 논문을 넣고 없어진 논문을 지웁니다.
+
+    papers 컬렉션의 변경 표시가 마지막 동기화 때와 같으면 아무것도 하지 않으며, 추가한 논문 수를 반환합니다.
+    """
+    collection = get_collection()
+    reduced = get_reduced_collection()
+    # 변경 표시를 먼저 읽어 두므로, 비교 도중에 추가된 논문은 표시가 다시 바뀌어 다음 검색 때 반영됨
+    revision = _stored_metadata(COLLECTION_NAME).get("revision") or _mark_papers_changed()
+    if _stored_metadata(REDUCED_COLLECTION_NAME).get("synced_revision") == revision:
+        return 0
+    paper_ids = set(collection.get(include=[])["ids"])
+    reduced_ids = set(reduced.get(include=[])["ids"])
+    stale = list(reduced_ids - paper_ids)
+    if stale:
+        reduced.delete(ids=stale)
+    missing = sorted(paper_ids - reduced_ids)
+    logger.info(f"후보 검색 컬렉션 동기화: 추가 {len(missing)}개, 삭제 {len(stale)}개")
+    for start in range(0, len(missing), batch_size):
+        batch = collection.get(ids=missing[start:start + batch_size], include=["embeddings", "metadatas"])
+        reduced.upsert(
+            embeddings=reduce_embeddings(batch["embeddings"]),
+            metadatas=batch["metadatas"],
+            ids=batch["ids"]
+        )
+    _update_metadata(REDUCED_COLLECTION_NAME, synced_revision=revision)
+    return len(missing)
 
 def add_paper_to_db(embedding, metadata):
     logger.info(f"논문 추가 시작: {metadata.get('title', 'Unknown')}")
+    add_papers_to_db([embedding], [metadata])
+    logger.info(f"논문 추가 완료: {metadata.get('title', 'Unknown')}")
+
+@metrics.timed("chroma.upsert")
+def add_papers_to_db(embeddings, metadatas, ids=None, batch_size=WRITE_BATCH_SIZE):
+    """여러 논문을 `batch_size`개씩 나누어 한 번에 저장합니다.
+
+    문서 ID가 내용 해시이므로 같은 논문을 다시 넣으면 덮어씁니다 (upsert).
+    `ids`를 생략하면 각 메타데이터의 "id"를 사용합니다.
+    """
+    if ids is None:
+        ids = [metadata.get("id") for metadata in metadatas]
+    if not (len(embeddings) == len(metadatas) == len(ids)):
+        raise ValueError("embeddings, metadatas, ids의 길이가 같아야 합니다")
     collection = get_collection()
-    doc_id = metadata.get("id")
-    collection.add(
-        embeddings=[embedding],
-        metadatas=[metadata],
-        ids=[doc_id]
+    reduced = get_reduced_collection() if INDEX_MODE == "reduced" else None
+    # ChromaDB가 허용하는 최대 배치 크기를 넘지 않도록 제한
+    batch_size = max(1, min(batch_size, get_client().get_max_batch_size()))
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            embeddings=embeddings[start:end],
+            metadatas=metadatas[start:end],
+            ids=ids[start:end]
+        )
+        if reduced is not None:
+            reduced.upsert(
+                embeddings=reduce_embeddings(embeddings[start:end]),
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+    _mark_papers_changed()
+    logger.info(f"논문 {len(ids)}개 저장 완료")
+
+@metrics.timed("chroma.upsert_chunks")
+def add_paper_chunks_to_db(chunk_embeddings, metadatas, batch_size=WRITE_BATCH_SIZE):
+    """논문별 청크 임베딩 행렬을 부모 논문 ID와 함께 청크 컬렉션에 저장합니다.
+
+    이미 저장된 청크는 먼저 지우므로 청크 수가 줄어든 논문도 남는 청크가 없습니다.
+    """
+    paper_ids = [metadata.get("id") for metadata in metadatas]
+    if not paper_ids:
+        return
+    collection = get_chunk_collection()
+    collection.delete(where={"paper_id": {"$in": paper_ids}})
+
+    ids = []
+    embeddings = []
+    chunk_metadatas = []
+    for paper_id, matrix, metadata in zip(paper_ids, chunk_embeddings, metadatas):
+        for chunk_index, vector in enumerate(matrix):
+            ids.append(f"{paper_id}#{chunk_index}")
+            embeddings.append(vector)
+            chunk_metadatas.append({**metadata, "paper_id": paper_id, "chunk_index": chunk_index})
+
+    batch_size = max(1, min(batch_size, get_client().get_max_batch_size()))
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            embeddings=embeddings[start:end],
+            metadatas=chunk_metadatas[start:end],
+            ids=ids[start:end]
+        )
+    logger.info(f"논문 {len(paper_ids)}개의 청크 {len(ids)}개 저장 완료")
+
+def delete_papers(ids):
+    """문서 ID 목록에 해당하는 논문을 DB에서 삭제합니다."""
+    if not ids:
+        return
+    logger.info(f"논문 삭제 시작: {len(ids)}개")
+    collection = get_collection()
+    collection.delete(ids=list(ids))
+    # 청크 모드를 쓴 적이 없으면 빈 청크 컬렉션을 만들지 않음
+    if _collection_exists(CHUNK_COLLECTION_NAME):
+        get_chunk_collection().delete(where={"paper_id": {"$in": list(ids)}})
+    if INDEX_MODE == "reduced":
+        get_reduced_collection().delete(ids=list(ids))
+    # 다른 모드의 프로세스가 지운 논문은 reduced 모드 검색 때 변경 표시를 보고 정리됨
+    _mark_papers_changed()
+    logger.info(f"논문 삭제 완료: {len(ids)}개")
+
+def _aggregate_chunk_hits(metadatas, distances, top_n, aggregate=CHUNK_AGGREGATE, top_k=CHUNK_TOP_K):
+    """청크 검색 결과를 논문 단위로 묶어 상위 top_n개 논문을 고릅니다.
+
+    코사인 거리를 유사도로 바꾼 뒤 논문별 최대값("max") 또는 상위 k개 청크의
+    평균("mean")으로 점수를 매깁니다. (논문 메타데이터 목록, 거리 목록)을 반환합니다.
+    """
+    if not metadatas:
+        return [], []
+    paper_ids = np.array([metadata["paper_id"] for metadata in metadatas])
+    similarities = 1.0 - np.asarray(distances, dtype=np.float32)
+    unique_ids, groups = np.unique(paper_ids, return_inverse=True)
+
+    if aggregate == "max":
+        scores = np.full(len(unique_ids), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, groups, similarities)
+    elif aggregate == "mean":
+        # 논문별로 유사도 내림차순 정렬 후 각 논문 안에서의 순위 계산
+        order = np.lexsort((-similarities, groups))
+        sorted_groups = groups[order]
+        group_starts = np.searchsorted(sorted_groups, np.arange(len(unique_ids)))
+        ranks = np.arange(len(order)) - group_starts[sorted_groups]
+        keep = order[ranks < top_k]
+        scores = (np.bincount(groups[keep], weights=similarities[keep], minlength=len(unique_ids))
+                  / np.bincount(groups[keep], minlength=len(unique_ids)))
+    else:
+        raise ValueError(f"지원하지 않는 집계 방식입니다: {aggregate}")
+
+    top = np.argsort(-scores, kind="stable")[:top_n]
+    # 각 논문에서 가장 유사한 청크의 메타데이터를 논문 메타데이터로 사용
+    best_chunk = {}
+    for index in np.argsort(-similarities, kind="stable"):
+        best_chunk.setdefault(groups[index], index)
+    paper_metadatas = []
+    for group in top:
+        metadata = dict(metadatas[best_chunk[group]])
+        metadata.pop("paper_id", None)
+        metadata.pop("chunk_index", None)
+        paper_metadatas.append(metadata)
+    return paper_metadatas, [float(1.0 - scores[group]) for group in top]
+
+def _search_chunks(embedding, top_n):
+    """청크를 검색해 논문 top_n개를 고릅니다.
+
+    청크가 많은 긴 논문이 조회한 청크를 모두 차지하면 논문 수가 모자라므로,
+    서로 다른 논문이 top_n개 나오거나 컬렉션 전체를 볼 때까지 조회 수를 두 배씩 늘립니다.
+    """
+    collection = get_chunk_collection()
+    count = collection.count()
+    n_results = min(top_n * CHUNK_OVERSAMPLE, count)
+    if n_results == 0:
+        return {"ids": [[]], "metadatas": [[]], "distances": [[]]}
+    while True:
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["metadatas", "distances"]
+        )
+        metadatas, distances = _aggregate_chunk_hits(results["metadatas"][0], results["distances"][0], top_n)
+        if len(metadatas) >= top_n or n_results >= count:
+            break
+        n_results = min(n_results * 2, count)
+        logger.info(f"청크 검색 결과의 논문 수가 부족해 조회 범위를 넓힙니다 ({len(metadatas)}/{top_n}, 청크 {n_results}개)")
+    return {
+        "ids": [[metadata.get("id") for metadata in metadatas]],
+        "metadatas": [metadatas],
+        "distances": [distances],
+    }
+
+def _search_reduced(embedding, top_n, candidates=None):
+    """앞쪽 차원만으로 후보를 찾고, 후보의 전체 임베딩으로 거리를 다시 계산해 top_n개를 고릅니다."""
+    # 다른 프로세스(reduced 모드가 아닌 일괄 처리 등)가 바꾼 논문도 반영되도록 검색마다 변경 표시를 비교
+    sync_reduced_collection()
+    reduced = get_reduced_collection()
+    n_results = min(max(candidates or RERANK_CANDIDATES, top_n), reduced.count())
+    if n_results == 0:
+        return {"ids": [[]], "metadatas": [[]], "distances": [[]]}
+    hits = reduced.query(
+        query_embeddings=reduce_embeddings([embedding]),
+        n_results=n_results,
+        include=[]
     )
-    logger.info(f"논문 추가 완료: {metadata.get('title', 'Unknown')}")
 
+    with metrics.span("search.rerank"):
+        candidate_ids, vectors, metadatas = _full_vectors(hits["ids"][0])
+        query = np.asarray(embedding, dtype=np.float32)[None, :]
+        distances = space_distances(_collection_space(get_collection()), vectors @ query.T,
+                                    np.linalg.norm(vectors, axis=1), query)[:, 0]
+        order = np.argsort(distances, kind="stable")[:top_n]
+    return {
+        "ids": [[candidate_ids[i] for i in order]],
+        "metadatas": [[metadatas[i] for i in order]],
+        "distances": [[float(distances[i]) for i in order]],
+    }
+
+def _full_vectors(ids):
+    """재순위화할 후보의 전체 임베딩과 메타데이터 (ID 목록, 행렬, 메타데이터 목록)
+
+    벡터 인덱스(float32 메모리 매핑 행렬)를 보조 저장소로 사용하고, 인덱스를 만든 뒤에
+    추가되어 없는 논문만 papers 컬렉션에서 읽습니다.
+    """
+    index = get_vector_index()
+    found, matrix = index.get_vectors(ids)
+    metadatas = index.get_metadatas(found)
+    if len(found) < len(ids):
+        found_set = set(found)
+        rest = get_collection().get(ids=[paper_id for paper_id in ids if paper_id not in found_set],
+                                    include=["embeddings", "metadatas"])
+        found = found + list(rest["ids"])
+        matrix = np.vstack([matrix, np.asarray(rest["embeddings"], dtype=np.float32).reshape(-1, matrix.shape[1])])
+        metadatas = metadatas + list(rest["metadatas"])
+    return found, matrix, metadatas
+
+def _collection_space(collection):
+    configuration = getattr(collection, "configuration_json", None) or {}
+    space = (configuration.get("hnsw") or {}).get("space")
+    return space or (collection.metadata or {}).get("hnsw:space", "l2")
+
+@metrics.timed("vector_index.build")
+def rebuild_vector_index(quantization=None, directory=None, batch_size=5000):
+    """papers 컬렉션 전체를 메모리 매핑 벡터 인덱스로 내보냅니다 (새 세대로 원자적 교체).
+
+    이미 인덱스를 연 프로세스는 다음 검색에서 새 세대를 다시 엽니다.
+    """
+    quantization = quantization or VECTOR_INDEX_QUANTIZATION
+    directory = directory or VECTOR_INDEX_DIR
+    collection = get_collection()
+    count = collection.count()
+    metadata = collection.metadata or {}
+    # 검색할 때 현재 임베딩 백엔드와 비교하도록 컬렉션의 백엔드 정보를 함께 저장
+    info = {key: metadata.get(key) for key in ("embedder", "embedding_model", "embedding_dim")}
+    logger.info(f"벡터 인덱스 생성 시작: 논문 {count}개 ({quantization})")
+    os.makedirs(directory, exist_ok=True)
+
+    writer = None
+    if count == 0:
+        writer = VectorIndexWriter(directory, 0, get_embedder().dimension or 1, quantization,
+                                   _collection_space(collection), info)
+    for offset in range(0, count, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "metadatas"])
+        embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+        if writer is None:
+            writer = VectorIndexWriter(directory, count, embeddings.shape[1], quantization,
+                                       _collection_space(collection), info)
+        writer.add(batch["ids"], embeddings, batch["metadatas"])
+    return writer.commit()
+
+def get_vector_index():
+    """현재 세대의 벡터 인덱스 (없으면 ChromaDB에서 만들고, 세대가 바뀌면 다시 엶)"""
+    global _vector_index
+    generation = current_generation(VECTOR_INDEX_DIR)
+    cached = _vector_index
+    if cached is not None and generation == cached[0]:
+        return cached[1]
+    with _vector_index_lock:
+        if generation is None:
+            logger.warning(f"벡터 인덱스가 없어 ChromaDB에서 생성합니다: {VECTOR_INDEX_DIR}")
+            rebuild_vector_index()
+            generation = current_generation(VECTOR_INDEX_DIR)
+        try:
+            index = VectorIndex(os.path.join(VECTOR_INDEX_DIR, generation))
+        except FileNotFoundError:
+            # 세대 이름을 읽은 뒤 인덱스가 두 번 이상 교체되어 지워진 경우 현재 세대로 한 번 더 시도
+            generation = current_generation(VECTOR_INDEX_DIR)
+            index = VectorIndex(os.path.join(VECTOR_INDEX_DIR, generation))
+        _embedder_mismatch(f"벡터 인덱스 {VECTOR_INDEX_DIR}", index.info, get_embedder())
+        _vector_index = (generation, index)
+        logger.info(f"벡터 인덱스 열기: 논문 {len(index)}개, {index.dim}차원, {index.quantization}")
+    return index
+
+@metrics.timed("chroma.search")
 def search_similar_papers(embedding, top_n=3):
-    logger.info(f"유사 논문 검색 시작 (top_n={top_n})")
+    logger.info(f"유사 논문 검색 시작 (top_n={top_n}, 모드={INDEX_MODE}, 백엔드={SEARCH_BACKEND})")
+    if INDEX_MODE == "chunk":
+        results = _search_chunks(embedding, top_n)
+        logger.info("유사 논문 검색 완료")
+        return results
+    if INDEX_MODE == "reduced":
+        results = _search_reduced(embedding, top_n)
+        logger.info("유사 논문 검색 완료")
+        return results
+    if SEARCH_BACKEND == "numpy":
+        results = get_vector_index().query([embedding], n_results=top_n, rerank=VECTOR_INDEX_RERANK)
+        logger.info("유사 논문 검색 완료")
+        return results
     collection = get_collection()
     results = collection.query(
         query_embeddings=[embedding],
@@ -63,6 +478,32 @@ def search_similar_papers(embedding, top_n=3):
     logger.info("유사 논문 검색 완료")
     return results
 
+@metrics.timed("chroma.search_many")
+def search_similar_papers_many(embeddings, top_n=3):
+    """여러 질의 임베딩의 유사 논문을 한 번에 검색합니다.
+
+    결과 형식은 `collection.query`와 같으며 질의마다 한 줄씩입니다.
+    논문 모드에서는 질의 전체를 한 번의 요청(또는 한 번의 행렬 곱)으로 처리합니다.
+    """
+    embeddings = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+    if not embeddings:
+        return {"ids": [], "metadatas": [], "distances": []}
+    logger.info(f"유사 논문 일괄 검색 시작 (질의 {len(embeddings)}개, top_n={top_n})")
+    if INDEX_MODE == "paper" and SEARCH_BACKEND == "numpy":
+        results = get_vector_index().query(np.vstack(embeddings), n_results=top_n, rerank=VECTOR_INDEX_RERANK)
+    elif INDEX_MODE == "paper":
+        results = get_collection().query(
+            query_embeddings=embeddings,
+            n_results=top_n,
+            include=["metadatas", "distances"]
+        )
+    else:
+        # 청크/reduced 모드는 질의마다 후처리가 달라 하나씩 검색
+        rows = [search_similar_papers(embedding, top_n) for embedding in embeddings]
+        results = {key: [row[key][0] for row in rows] for key in ("ids", "metadatas", "distances")}
+    logger.info("유사 논문 일괄 검색 완료")
+    return results
+
 def get_paper_count():
     """ChromaDB에 저장된 논문의 수를 반환합니다."""
     logger.info("저장된 논문 수 확인 시작")
@@ -1,8 +1,150 @@
+import io
+import os
+import re
+import hashlib
+import unicodedata
+import logging
 import pypdf
+import metrics
 
-def extract_text_from_pdf(pdf_path):
-    reader = pypdf.PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text 
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+def _open_pdf(source):
+    """경로, bytes, 파일 객체 중 무엇이든 PdfReader로 엽니다."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return pypdf.PdfReader(source)
+
+def iter_pdf_pages(source, max_pages=None, max_chars=None):
+    """PDF의 페이지 텍스트를 앞에서부터 하나씩 추출해 돌려주는 제너레이터
+
+    `source`는 파일 경로, bytes 또는 읽기 가능한 파일 객체입니다.
+    `max_pages`개의 페이지를 읽었거나 누적 글자 수가 `max_chars`에 도달하면
+    나머지 페이지는 파싱하지 않고 멈춥니다 (마지막 페이지는 `max_chars`에 맞게 자름).
+    """
+    reader = _open_pdf(source)
+    remaining = max_chars
+    for index, page in enumerate(reader.pages):
+        if max_pages is not None and index >= max_pages:
+            return
+        text = page.extract_text() or ""
+        if remaining is not None:
+            if len(text) >= remaining:
+                yield text[:remaining]
+                return
+            remaining -= len(text)
+        yield text
+
+@metrics.timed("pdf.extract")
+def extract_text_from_pdf(source, max_pages=None, max_chars=None):
+    """PDF 전체(또는 앞부분) 텍스트를 하나의 문자열로 반환합니다."""
+    return "".join(iter_pdf_pages(source, max_pages=max_pages, max_chars=max_chars))
+
+# 줄바꿈을 제외한 연속 공백
+_SPACES_RE = re.compile(r'[^\S\n]+')
+# 세 줄 이상 연속된 빈 줄
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+def normalize_text(text):
+    """추출된 텍스트 정규화 (NFC, 제어 문자 제거, 연속 공백/빈 줄 정리)"""
+    text = unicodedata.normalize("NFC", text).replace("\x00", "")
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+def file_sha256(pdf_path):
+    """파일 내용의 SHA-256 해시 (문서 ID로 사용)"""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# 정보 사전의 날짜 형식 ("D:20210315...")
+_PDF_DATE_RE = re.compile(r'(?:D:)?(\d{4})')
+# 본문에서 연도로 보이는 네 자리 숫자
+_YEAR_RE = re.compile(r'(?<!\d)(19[5-9]\d|20\d\d)(?!\d)')
+# 본문 첫 줄로 제목을 추정할 때 허용하는 길이
+_TITLE_MIN_CHARS = 4
+_TITLE_MAX_CHARS = 200
+
+def _info_value(info, key):
+    value = info.get(key) if info else None
+    return str(value).strip() if value else ""
+
+def _guess_title(first_page_text):
+    """첫 페이지에서 제목으로 보이는 첫 번째 줄을 찾습니다."""
+    for line in first_page_text.splitlines():
+        line = line.strip()
+        if _TITLE_MIN_CHARS <= len(line) <= _TITLE_MAX_CHARS and not line.isdigit():
+            return line
+    return ""
+
+def _guess_year(text):
+    match = _YEAR_RE.search(text or "")
+    return match.group(1) if match else ""
+
+def _normalize_metadata(info, first_page_text, sha256, source):
+    """PDF 정보 사전을 정규화하고 비어 있는 제목/연도는 첫 페이지 텍스트에서 보완합니다."""
+    title = _info_value(info, "/Title")
+    date = _PDF_DATE_RE.match(_info_value(info, "/CreationDate"))
+    year = date.group(1) if date else ""
+    return {
+        # 같은 내용이면 항상 같은 ID가 되도록 내용 해시를 사용
+        "id": sha256,
+        "title": title or _guess_title(first_page_text),
+        "authors": _info_value(info, "/Author"),
+        "year": year or _guess_year(first_page_text),
+        "abstract": "",
+        "source": source,
+    }
+
+@metrics.timed("pdf.load")
+def load_pdf_document(pdf_path):
+    """PDF를 한 번만 읽고 파싱해 텍스트, 페이지 수, 메타데이터를 함께 반환합니다.
+
+    파일 내용을 한 번 읽어 해시 계산과 파싱에 함께 사용합니다.
+    반환값: {"text", "page_count", "metadata"}
+    """
+    with open(pdf_path, 'rb') as file:
+        data = file.read()
+    reader = _open_pdf(data)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    metrics.incr("pdf_pages", len(pages))
+
+    try:
+        info = reader.metadata
+    except Exception as e:
+        # 손상된 정보 사전은 무시하고 본문에서 보완
+        logger.warning(f"메타데이터 추출 중 오류 발생: {pdf_path} - {e}")
+        info = None
+
+    return {
+        "text": "".join(pages),
+        "page_count": len(pages),
+        "metadata": _normalize_metadata(info, pages[0] if pages else "",
+                                        hashlib.sha256(data).hexdigest(),
+                                        os.path.basename(pdf_path)),
+    }
+
+def extract_metadata_from_pdf(pdf_path):
+    """PDF 파일에서 메타데이터를 추출합니다."""
+    return load_pdf_document(pdf_path)["metadata"]
+
+def extract_document(pdf_path):
+    """PDF 파일의 텍스트와 메타데이터를 함께 추출합니다.
+
+    프로세스 풀에서 실행되므로 무거운 API 클라이언트를 가져오지 않는 이 모듈에 둡니다.
+    """
+    stat = os.stat(pdf_path)
+    document = load_pdf_document(pdf_path)
+    metadata = document["metadata"]
+    return {
+        "path": pdf_path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": metadata["id"],
+        "text": normalize_text(document["text"]),
+        "page_count": document["page_count"],
+        "metadata": metadata,
+    }
@@ -0,0 +1,57 @@
+import logging
+from llm_scheduler import get_scheduler
+from summary_store import get_summary, save_summary
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = "claude-3-5-haiku-20241022"
+
+# 요약을 위한 시스템 프롬프트
+SUMMARY_SYSTEM_PROMPT = """
+            # 지시문
+            제시되는 학위 논문의 내용과 구조를 **짧게요약**하여 핵심만 추출하는것이 너의 역할이다. 
+
+            # 제약조건
+            - 논문의 구조를 파악하여, 전체 카테고리, 각 카테고리의 주된 서술을 추출한다..
+            - 마크다운을 적극활용하며 **질문과 답변의 핵심 내용만 짧게 추출한다**
+            - 내용 추출 시, 부가 설명은 최소화하고, 학위 논문의 핵심 요소를 드러낼 수 있도록 한다.
+            - 부연설명은하지않는다.
+            """
+
+@metrics.timed("summary")
+async def summarize_with_claude(text, system_prompt, paper_id, on_text=None):
+    """비동기로 텍스트를 요약하는 함수
+
+    `on_text`를 넘기면 생성되는 텍스트 조각을 순서대로 전달합니다 (저장된 요약은 한 번에 전달).
+    """
+    # 저장된 요약이 있으면 반환
+    cached = get_summary(text, system_prompt, SUMMARY_MODEL)
+    if cached is not None:
+        metrics.incr("cache_hits", cache="summary")
+        logger.info(f"저장된 요약 결과 사용: {paper_id}")
+        if on_text is not None:
+            on_text(cached)
+        return cached
+
+    metrics.incr("cache_misses", cache="summary")
+    logger.info(f"Claude API를 사용하여 텍스트 요약 시작: {paper_id}")
+    # 요청 한도와 재시도는 공유 스케줄러가 관리
+    summary = await get_scheduler().stream(
+        on_text=on_text,
+        model=SUMMARY_MODEL,
+        max_tokens=1000,
+        temperature=0.3,
+        system=system_prompt,
+        messages=[
+            {
+                "role": "user",
+                "content": f"논문 내용:\n{text}"
+            }
+        ]
+    )
+
+    # 결과를 요약 저장소에 저장
+    save_summary(text, system_prompt, SUMMARY_MODEL, summary)
+    logger.info(f"텍스트 요약 완료: {paper_id}")
+    return summary
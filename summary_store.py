@@ -0,0 +1,43 @@
+import os
+import hashlib
+import logging
+import threading
+from disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# 요약 저장소 설정
+SUMMARY_STORE_PATH = os.getenv("SUMMARY_STORE_PATH", os.path.join("cache", "summaries.sqlite"))
+SUMMARY_STORE_MAX_BYTES = int(os.getenv("SUMMARY_STORE_MAX_MB", "256")) * 1024 * 1024
+SUMMARY_TTL = int(os.getenv("SUMMARY_TTL_DAYS", "30")) * 24 * 60 * 60
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_summary_store():
+    """프로세스당 하나의 요약 저장소를 반환합니다."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DiskCache(SUMMARY_STORE_PATH, max_bytes=SUMMARY_STORE_MAX_BYTES, ttl=SUMMARY_TTL)
+        return _store
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def summary_key(text, system_prompt, model):
+    """(논문 내용 해시, 시스템 프롬프트 해시, 모델)로 만든 요약 키"""
+    return f"{_hash(text)}:{_hash(system_prompt)}:{model}"
+
+
+def get_summary(text, system_prompt, model):
+    """저장된 요약을 반환합니다. 없거나 만료되었으면 None."""
+    value = get_summary_store().get(summary_key(text, system_prompt, model))
+    return value.decode("utf-8") if value is not None else None
+
+
+def save_summary(text, system_prompt, model, summary):
+    get_summary_store().set(summary_key(text, system_prompt, model), summary.encode("utf-8"))
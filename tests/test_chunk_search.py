@@ -0,0 +1,44 @@
+import numpy as np
+import paper_db
+
+
+class FakeChunkCollection:
+    """거리 순으로 정렬된 청크 목록을 돌려주는 컬렉션 대역"""
+
+    def __init__(self, chunks):
+        self.chunks = sorted(chunks, key=lambda chunk: chunk[1])
+        self.queries = []
+
+    def count(self):
+        return len(self.chunks)
+
+    def query(self, query_embeddings, n_results, include):
+        self.queries.append(n_results)
+        hits = self.chunks[:n_results]
+        return {
+            "metadatas": [[{"paper_id": paper_id, "id": paper_id, "chunk_index": i} for i, (paper_id, _) in enumerate(hits)]],
+            "distances": [[distance for _, distance in hits]],
+        }
+
+
+def test_search_chunks_widens_until_top_n_papers(monkeypatch):
+    # 긴 논문 하나의 청크 40개가 가장 가까워서 처음 조회(30개)에는 논문이 하나뿐임
+    chunks = [("long", 0.1 + i * 0.001) for i in range(40)]
+    chunks += [(f"paper{i}", 0.5 + i * 0.01) for i in range(5)]
+    collection = FakeChunkCollection(chunks)
+    monkeypatch.setattr(paper_db, "get_chunk_collection", lambda: collection)
+
+    results = paper_db._search_chunks(np.zeros(4), top_n=3)
+
+    assert [metadata["id"] for metadata in results["metadatas"][0]] == ["long", "paper0", "paper1"]
+    assert collection.queries == [30, 45]
+
+
+def test_search_chunks_stops_when_collection_exhausted(monkeypatch):
+    collection = FakeChunkCollection([("only", 0.1 + i * 0.01) for i in range(50)])
+    monkeypatch.setattr(paper_db, "get_chunk_collection", lambda: collection)
+
+    results = paper_db._search_chunks(np.zeros(4), top_n=3)
+
+    assert [metadata["id"] for metadata in results["metadatas"][0]] == ["only"]
+    assert collection.queries == [30, 50]
@@ -0,0 +1,36 @@
+from corpus_manifest import CorpusManifest
+
+
+def make_manifest(tmp_path):
+    return CorpusManifest(str(tmp_path / "manifest.sqlite"))
+
+
+def test_record_many_keeps_doc_id_reused_in_same_batch(tmp_path):
+    manifest = make_manifest(tmp_path)
+    manifest.record("a.pdf", 1, 1, "X", "X")
+
+    # a.pdf 내용이 X → Y로 바뀌고, 같은 묶음에서 새 파일 b.pdf가 X 내용을 가짐 (이름 변경/복사)
+    stale_ids = manifest.record_many([
+        ("a.pdf", 2, 2, "Y", "Y"),
+        ("b.pdf", 1, 1, "X", "X"),
+    ])
+
+    assert stale_ids == []
+    assert {path: entry[3] for path, entry in manifest.entries().items()} == {"a.pdf": "Y", "b.pdf": "X"}
+
+
+def test_record_many_returns_orphaned_doc_ids(tmp_path):
+    manifest = make_manifest(tmp_path)
+    manifest.record_many([("a.pdf", 1, 1, "X", "X"), ("b.pdf", 1, 1, "Z", "Z")])
+
+    stale_ids = manifest.record_many([("a.pdf", 2, 2, "Y", "Y"), ("b.pdf", 2, 2, "W", "W")])
+
+    assert stale_ids == ["X", "Z"]
+
+
+def test_record_keeps_doc_id_shared_with_other_file(tmp_path):
+    manifest = make_manifest(tmp_path)
+    manifest.record_many([("a.pdf", 1, 1, "X", "X"), ("copy.pdf", 1, 1, "X", "X")])
+
+    assert manifest.record("a.pdf", 2, 2, "Y", "Y") is None
+    assert manifest.remove(["copy.pdf"]) == ["X"]
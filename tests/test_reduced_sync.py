@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import paper_db
+
+
+@pytest.fixture
+def chroma_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(paper_db, "persist_directory", str(tmp_path))
+    monkeypatch.setattr(paper_db, "_collections", {})
+    monkeypatch.setattr(paper_db, "REDUCED_DIM", 4)
+    return tmp_path
+
+
+def _add(paper_id, seed):
+    vector = np.random.default_rng(seed).normal(size=8).astype(np.float32)
+    paper_db.add_papers_to_db([vector], [{"id": paper_id, "title": paper_id, "source": f"{paper_id}.pdf"}])
+
+
+def _reduced_ids():
+    return sorted(paper_db.get_reduced_collection().get(include=[])["ids"])
+
+
+def test_sync_reduced_detects_same_count_replacement(chroma_dir, monkeypatch):
+    monkeypatch.setattr(paper_db, "INDEX_MODE", "reduced")
+    for seed, paper_id in enumerate(["a", "b", "c"]):
+        _add(paper_id, seed)
+    assert paper_db.sync_reduced_collection() == 0
+
+    # reduced 모드가 아닌 수집(--sync 등)이 바뀐 논문 b를 d로 교체해 논문 수는 그대로임
+    monkeypatch.setattr(paper_db, "INDEX_MODE", "paper")
+    paper_db.delete_papers(["b"])
+    _add("d", 3)
+    monkeypatch.setattr(paper_db, "INDEX_MODE", "reduced")
+    assert paper_db.get_collection().count() == paper_db.get_reduced_collection().count()
+
+    assert paper_db.sync_reduced_collection() == 1
+    assert _reduced_ids() == ["a", "c", "d"]
+    # 변경이 없으면 다시 비교하지 않음
+    assert paper_db.sync_reduced_collection() == 0
@@ -0,0 +1,101 @@
+import os
+import mmap
+import zlib
+import logging
+import tempfile
+from pdf_utils import extract_text_from_pdf, file_sha256, normalize_text
+from clients import persist_directory
+
+logger = logging.getLogger(__name__)
+
+# 문서 ID별로 추출된 텍스트를 압축해 저장하는 디렉토리
+TEXT_STORE_DIR = os.getenv("PAPER_TEXT_STORE_DIR", os.path.join(persist_directory, "texts"))
+
+# 이 크기 이상인 파일은 메모리 매핑으로 읽음
+MMAP_THRESHOLD = 1024 * 1024
+
+# 파일 형식: MAGIC(4) + 원본 PDF SHA-256(64, hex) + zlib 압축 텍스트
+_MAGIC = b"PTX1"
+_HASH_SIZE = 64
+_HEADER_SIZE = len(_MAGIC) + _HASH_SIZE
+
+
+def _text_path(doc_id):
+    return os.path.join(TEXT_STORE_DIR, f"{doc_id}.txt.z")
+
+
+def save_text(doc_id, text, source_hash):
+    """추출된 텍스트를 원본 PDF 해시와 함께 압축 저장합니다.
+
+    임시 파일에 쓴 뒤 교체하므로 동시에 읽는 프로세스가 깨진 파일을 보지 않습니다.
+    """
+    os.makedirs(TEXT_STORE_DIR, exist_ok=True)
+    payload = zlib.compress(text.encode("utf-8"), 6)
+    fd, temp_path = tempfile.mkstemp(dir=TEXT_STORE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(_MAGIC)
+            file.write(source_hash.encode("ascii").ljust(_HASH_SIZE, b"0")[:_HASH_SIZE])
+            file.write(payload)
+        os.replace(temp_path, _text_path(doc_id))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_text(doc_id, source_hash=None):
+    """저장된 텍스트를 반환합니다.
+
+    저장된 적이 없거나 `source_hash`가 저장 당시의 원본 해시와 다르면 None을 반환합니다.
+    큰 파일은 메모리 매핑한 뒤 복사 없이 압축을 풉니다.
+    """
+    path = _text_path(doc_id)
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _HEADER_SIZE:
+            logger.warning(f"손상된 텍스트 파일: {path}")
+            return None
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    return _decode(view, source_hash, path)
+        return _decode(file.read(), source_hash, path)
+
+
+def _decode(data, source_hash, path):
+    if bytes(data[:len(_MAGIC)]) != _MAGIC:
+        logger.warning(f"손상된 텍스트 파일: {path}")
+        return None
+    stored_hash = bytes(data[len(_MAGIC):_HEADER_SIZE]).decode("ascii")
+    if source_hash is not None and stored_hash != source_hash:
+        return None
+    return zlib.decompress(data[_HEADER_SIZE:]).decode("utf-8")
+
+
+def delete_texts(doc_ids):
+    """문서 ID 목록에 해당하는 저장된 텍스트를 삭제합니다."""
+    for doc_id in doc_ids:
+        try:
+            os.remove(_text_path(doc_id))
+        except FileNotFoundError:
+            pass
+
+
+def get_paper_text(doc_id, pdf_path):
+    """논문 텍스트를 저장소에서 읽고, 없을 때만 PDF에서 추출해 저장합니다."""
+    text = load_text(doc_id)
+    if text is not None:
+        logger.info(f"저장된 텍스트 사용: {doc_id}")
+        return text
+    logger.info(f"저장된 텍스트가 없어 PDF에서 추출: {pdf_path}")
+    text = normalize_text(extract_text_from_pdf(pdf_path))
+    source_hash = file_sha256(pdf_path)
+    # 문서 ID가 내용 해시와 같을 때만 저장 (DB에 반영되지 않은 변경 파일은 저장하지 않음)
+    if source_hash == doc_id:
+        save_text(doc_id, text, source_hash)
+    return text
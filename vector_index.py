@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import shutil
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 인덱스 디렉토리 구조
+# - CURRENT: 현재 세대 디렉토리 이름 (원자적으로 교체하므로 읽는 쪽은 잠금이 필요 없음)
+#   교체 직전에 이전 이름을 읽은 쪽이 열 수 있도록 바로 이전 세대 하나는 남겨 둠
+# - <세대>/vectors.npy: 원본 float32 행렬 (재순위화에 사용)
+# - <세대>/codes.npy, scales.npy: 양자화한 행렬과 int8 행별 배율 (후보 검색에 사용)
+# - <세대>/norms.npy: 행별 L2 노름
+# - <세대>/metadatas.json, index.json: 문서 ID/메타데이터와 인덱스 정보
+CURRENT_FILE = "CURRENT"
+QUANTIZATIONS = ("float32", "float16", "int8")
+FORMAT_VERSION = 1
+
+# 양자화 행렬을 float32로 바꿔 곱할 때 한 번에 처리하는 행 수 (변환 버퍼가 CPU 캐시에 남도록 작게 유지)
+BLOCK_ROWS = 256
+
+
+class VectorIndexWriter:
+    """float32 원본과 양자화 행렬을 새 세대 디렉토리에 쓰고, `commit()`에서 현재 세대로 교체합니다.
+
+    `add()`로 나누어 넣을 수 있으며 전체 행 수(`count`)는 미리 알아야 합니다.
+    """
+
+    def __init__(self, directory, count, dim, quantization="float32", space="l2", info=None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"지원하지 않는 양자화 방식입니다: {quantization} (사용 가능: {', '.join(QUANTIZATIONS)})")
+        if space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"지원하지 않는 거리 방식입니다: {space}")
+        self.directory = directory
+        self.count = count
+        self.dim = dim
+        self.quantization = quantization
+        self.space = space
+        self.info = dict(info or {})
+        self.generation = f"gen-{time.time_ns()}-{os.getpid()}"
+        self.path = os.path.join(directory, self.generation)
+        os.makedirs(self.path)
+
+        self.vectors = np.lib.format.open_memmap(
+            os.path.join(self.path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dim))
+        self.norms = np.zeros(count, dtype=np.float32)
+        self.codes = None
+        self.scales = None
+        if quantization != "float32":
+            self.codes = np.lib.format.open_memmap(
+                os.path.join(self.path, "codes.npy"), mode="w+",
+                dtype=np.float16 if quantization == "float16" else np.int8, shape=(count, dim))
+        if quantization == "int8":
+            self.scales = np.zeros(count, dtype=np.float32)
+        self.ids = []
+        self.metadatas = []
+
+    def add(self, ids, embeddings, metadatas):
+        start = len(self.ids)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        end = start + len(matrix)
+        if end > self.count:
+            raise ValueError("인덱스에 지정한 행 수보다 많은 벡터를 추가했습니다")
+        self.vectors[start:end] = matrix
+        self.norms[start:end] = np.linalg.norm(matrix, axis=1)
+        if self.quantization == "float16":
+            self.codes[start:end] = matrix.astype(np.float16)
+        elif self.quantization == "int8":
+            # 행마다 최대 절댓값이 127이 되도록 대칭 양자화
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.codes[start:end] = np.round(matrix / scales[:, None]).astype(np.int8)
+            self.scales[start:end] = scales
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas)
+
+    def commit(self):
+        if len(self.ids) != self.count:
+            raise ValueError(f"인덱스 행 수가 맞지 않습니다 (예상 {self.count}, 실제 {len(self.ids)})")
+        self.vectors.flush()
+        del self.vectors
+        if self.codes is not None:
+            self.codes.flush()
+            del self.codes
+        np.save(os.path.join(self.path, "norms.npy"), self.norms)
+        if self.scales is not None:
+            np.save(os.path.join(self.path, "scales.npy"), self.scales)
+        with open(os.path.join(self.path, "metadatas.json"), "w", encoding="utf-8") as file:
+            json.dump({"ids": self.ids, "metadatas": self.metadatas}, file, ensure_ascii=False)
+        with open(os.path.join(self.path, "index.json"), "w", encoding="utf-8") as file:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "count": self.count,
+                "dim": self.dim,
+                "quantization": self.quantization,
+                "space": self.space,
+                "created": time.time(),
+                **self.info,
+            }, file, ensure_ascii=False)
+
+        previous = current_generation(self.directory)
+        current = os.path.join(self.directory, CURRENT_FILE)
+        temp = f"{current}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(self.generation)
+        os.replace(temp, current)
+        _remove_old_generations(self.directory, {self.generation, previous})
+        logger.info(f"벡터 인덱스 저장 완료: {self.count}개, {self.dim}차원, {self.quantization} ({self.path})")
+        return self.path
+
+
+def _remove_old_generations(directory, keep):
+    """`keep`에 없는 세대를 삭제합니다.
+
+    이미 열려 있는 매핑은 파일을 지워도 유지되므로 읽는 프로세스에 영향이 없습니다.
+    """
+    for name in os.listdir(directory):
+        if name.startswith("gen-") and name not in keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def current_generation(directory):
+    """현재 세대 이름 (인덱스가 없으면 None)"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def space_distances(space, products, norms, queries):
+    """내적(행 수, 질의 수)을 ChromaDB와 같은 방식의 거리로 바꿉니다.
+
+    `norms`는 행별 L2 노름, `queries`는 (질의 수, 차원) 행렬입니다.
+    """
+    if space == "l2":
+        # Chroma의 l2 거리와 같은 제곱 거리
+        return norms[:, None] ** 2 - 2.0 * products + np.einsum("ij,ij->i", queries, queries)[None, :]
+    if space == "cosine":
+        query_norms = np.linalg.norm(queries, axis=1)
+        return 1.0 - products / np.maximum(norms[:, None] * query_norms[None, :], 1e-12)
+    return 1.0 - products
+
+
+class VectorIndex:
+    """메모리 매핑한 벡터 행렬에서 행렬 곱과 argpartition으로 상위 k개를 찾는 읽기 전용 인덱스
+
+    행렬은 읽기 전용 공유 매핑(`np.load(mmap_mode="r")`)으로 열기 때문에 같은 인덱스를 여는
+    여러 프로세스가 OS 페이지 캐시를 함께 사용합니다. 양자화 인덱스는 양자화 행렬로 후보를
+    고른 뒤 float32 원본으로 거리를 다시 계산하므로, 검색 중에 주로 읽는 페이지는 양자화 행렬뿐입니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as file:
+            self.info = json.load(file)
+        if self.info.get("version") != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 벡터 인덱스 형식입니다: {path}")
+        self.quantization = self.info["quantization"]
+        self.space = self.info["space"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "norms.npy"))
+        self.codes = None
+        self.scales = None
+        if self.quantization != "float32":
+            self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        if self.quantization == "int8":
+            self.scales = np.load(os.path.join(path, "scales.npy"))
+        with open(os.path.join(path, "metadatas.json"), encoding="utf-8") as file:
+            data = json.load(file)
+        self.ids = data["ids"]
+        self.metadatas = data["metadatas"]
+        self._rows = None
+
+    @classmethod
+    def open(cls, directory):
+        """디렉토리의 현재 세대를 엽니다. 인덱스가 없으면 None."""
+        generation = current_generation(directory)
+        if generation is None:
+            return None
+        return cls(os.path.join(directory, generation))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.info["dim"]
+
+    def nbytes(self):
+        """디스크에 저장된 행렬 크기 (바이트)"""
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+    def _row_of(self):
+        if self._rows is None:
+            self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return self._rows
+
+    def get_metadatas(self, ids):
+        rows = self._row_of()
+        return [self.metadatas[rows[doc_id]] for doc_id in ids]
+
+    def get_vectors(self, ids):
+        """문서 ID 목록의 float32 원본 벡터 (찾은 ID 목록, 행렬)
+
+        인덱스를 만든 뒤에 추가된 ID는 결과에서 빠집니다.
+        """
+        self._row_of()
+        found = [doc_id for doc_id in ids if doc_id in self._rows]
+        rows = np.array([self._rows[doc_id] for doc_id in found], dtype=np.int64)
+        order = np.argsort(rows)
+        matrix = np.empty((len(rows), self.dim), dtype=np.float32)
+        # 파일 순서대로 읽도록 정렬해서 가져옴
+        matrix[order] = self.vectors[rows[order]]
+        return found, matrix
+
+    def _dot(self, queries):
+        """모든 행과 질의의 내적 (행 수, 질의 수)"""
+        if self.codes is None:
+            return np.asarray(self.vectors @ queries.T, dtype=np.float32)
+        products = np.empty((len(self), len(queries)), dtype=np.float32)
+        buffer = np.empty((BLOCK_ROWS, self.dim), dtype=np.float32)
+        transposed = np.ascontiguousarray(queries.T)
+        for start in range(0, len(self), BLOCK_ROWS):
+            codes = self.codes[start:start + BLOCK_ROWS]
+            block = buffer[:len(codes)]
+            np.copyto(block, codes, casting="unsafe")
+            np.matmul(block, transposed, out=products[start:start + len(codes)])
+        if self.scales is not None:
+            products *= self.scales[:, None]
+        return products
+
+    def search(self, queries, top_n=3, rerank=10):
+        """질의 행렬의 각 행에 대해 (행 번호 목록, 거리 목록)을 반환합니다.
+
+        양자화 인덱스에서는 `top_n * rerank`개 후보를 float32 원본으로 다시 계산합니다.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"질의 벡터 차원({queries.shape[1]})이 인덱스 차원({self.dim})과 다릅니다")
+        count = len(self)
+        top_n = min(top_n, count)
+        if top_n == 0:
+            return [[] for _ in queries], [[] for _ in queries]
+
+        distances = space_distances(self.space, self._dot(queries), self.norms, queries).T
+        exact = self.codes is None
+        candidates = top_n if exact else min(count, top_n * rerank)
+        if candidates < count:
+            indices = np.argpartition(distances, candidates - 1, axis=1)[:, :candidates]
+        else:
+            indices = np.broadcast_to(np.arange(count), (len(queries), count))
+
+        result_indices = []
+        result_distances = []
+        for row, query in enumerate(queries):
+            candidate = np.sort(indices[row])
+            if exact:
+                candidate_distances = distances[row, candidate]
+            else:
+                # 후보 행만 float32 원본에서 읽어 정확한 거리로 재순위화
+                products = np.asarray(self.vectors[candidate] @ query, dtype=np.float32)[:, None]
+                candidate_distances = space_distances(
+                    self.space, products, self.norms[candidate], query[None, :])[:, 0]
+            order = np.argsort(candidate_distances, kind="stable")[:top_n]
+            result_indices.append(candidate[order].tolist())
+            result_distances.append(candidate_distances[order].astype(float).tolist())
+        return result_indices, result_distances
+
+    def query(self, query_embeddings, n_results=3, rerank=10):
+        """Chroma `collection.query`와 같은 형식의 결과"""
+        indices, distances = self.search(query_embeddings, n_results, rerank)
+        return {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+            "distances": distances,
+        }